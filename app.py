@@ -1,61 +1,204 @@
-import streamlit as st
-import pandas as pd
-import google.generativeai as genai
+import instrumentacao # Primeiro import: marca o início do perfil de inicialização
+import os
 import time
-import joblib
-import utils
 import json
-import shap
-import matplotlib.pyplot as plt
-import numpy as np # Importado para cálculos matemáticos
+st = instrumentacao.importar('streamlit')
+pd = instrumentacao.importar('pandas')
+np = instrumentacao.importar('numpy') # Importado para cálculos matemáticos
+utils = instrumentacao.importar('utils')
+# SHAP, Matplotlib, backend de IA (llm.py), o modelo (compacto ou joblib/scikit-learn) e os artefatos são carregados sob demanda (ver funções abaixo).
 
 # --- FUNÇÕES DE CARREGAMENTO E IA ---
 @st.cache_resource
-def carregar_modelo_treinado():
-    """Carrega o pipeline de ML a partir do arquivo .joblib."""
+def carregar_modelo_treinado(caminho_modelo=utils.MODELO_FILENAME):
+    """
+    Carrega o modelo compacto (arrays com memória mapeada, compartilhados entre os processos do host,
+    sem scikit-learn) quando ele corresponde ao .joblib; caso contrário, o pipeline completo.
+    O modelo incremental (hashing + SGD) é sempre carregado como pipeline.
+    """
+    if caminho_modelo == utils.MODELO_FILENAME:
+        modelo_compacto = instrumentacao.importar('modelo_compacto')
+        try:
+            with instrumentacao.medir(modelo_compacto.MODELO_COMPACTO_DIR, 'artefato'):
+                compacto = modelo_compacto.ModeloCompacto.carregar()
+            if compacto.versao_modelo == obter_versao_modelo(caminho_modelo): return compacto
+        except (FileNotFoundError, ValueError):
+            pass
+    joblib = instrumentacao.importar('joblib')
     try:
-        modelo = joblib.load("modelo_recrutamento.joblib")
+        with instrumentacao.medir(caminho_modelo, 'artefato'):
+            modelo = joblib.load(caminho_modelo)
         return modelo
     except FileNotFoundError:
-        st.error("Arquivo 'modelo_recrutamento.joblib' não encontrado. Execute o script de treino e faça o upload.")
+        st.error(f"Arquivo '{caminho_modelo}' não encontrado. Execute o script de treino e faça o upload.")
         st.stop()
 
+@st.cache_resource
+def obter_versao_modelo(caminho_modelo=utils.MODELO_FILENAME):
+    """Versão (hash do conteúdo) do modelo, usada para localizar os rankings pré-calculados e invalidar os caches derivados."""
+    return utils.versao_arquivo(caminho_modelo)
+
+def modelo_ativo():
+    """Arquivo do modelo escolhido na barra lateral (o modelo TF-IDF completo, por padrão)."""
+    caminho = st.session_state.get('modelo_ativo', utils.MODELO_FILENAME)
+    return caminho if os.path.exists(caminho) else utils.MODELO_FILENAME
+
+def motor_ativo():
+    """Motor de pontuação do modelo ativo (None se o modelo não tiver vocabulário TF-IDF, como o incremental)."""
+    return carregar_motor_pontuacao(carregar_modelo_treinado(modelo_ativo()), obter_versao_modelo(modelo_ativo()))
+
 @st.cache_resource
 def carregar_explicador_shap():
-    """Carrega o explicador SHAP a partir do arquivo .joblib."""
+    """Carrega o explicador linear (coeficientes e médias do fundo) usado nas análises de contribuição."""
+    atribuicao = instrumentacao.importar('atribuicao')
     try:
-        explainer = joblib.load("shap_explainer.joblib")
-        return explainer
+        with instrumentacao.medir(utils.EXPLICADOR_FILENAME, 'artefato'):
+            return atribuicao.ExplicadorLinear.carregar(utils.EXPLICADOR_FILENAME)
     except FileNotFoundError:
-        st.error("Arquivo 'shap_explainer.joblib' não encontrado. Execute o script de treino e faça o upload.")
+        st.error(f"Arquivo '{utils.EXPLICADOR_FILENAME}' não encontrado. Execute o script de treino e faça o upload.")
         st.stop()
 
-def exibir_explicacao_shap(explainer, preprocessor, texto_candidato):
+@st.cache_resource
+def obter_llm():
+    """Backend de IA generativa (Gemini ou o falso, via LLM_BACKEND), limitador de taxa e cache de respostas compartilhados pelas sessões."""
+    llm = instrumentacao.importar('llm')
+    return llm.criar_backend(api_key=st.secrets.get("GOOGLE_API_KEY")), llm.LimitadorTaxa(chamadas_por_minuto=60), llm.CacheRespostas(utils.CACHE_LLM_FILENAME)
+
+def chamar_llm(prompt, metricas=None):
+    """Chamada em streaming ao backend (pedaços de texto à medida que chegam), com cache persistente, limite de taxa e retentativas."""
+    backend, limitador, cache = obter_llm()
+    return instrumentacao.importar('llm').gerar_stream_com_retentativa(backend, prompt, limitador, cache=cache, ignorar_cache=st.session_state.get('ignorar_cache_llm', False), metricas=metricas)
+
+def exibir_metricas_stream(metricas):
+    """Legenda com o tempo até o primeiro token, o tempo total da resposta e o tamanho do prompt."""
+    if 'total_s' in metricas:
+        origem = " (cache)" if metricas.get('cache') else ""
+        tamanho = f" · prompt com ~{metricas['prompt']['total_tokens']} tokens" if 'prompt' in metricas else ""
+        st.caption(f"Primeiro token em {metricas['primeiro_token_s']:.2f}s · resposta completa em {metricas['total_s']:.2f}s{origem}{tamanho}")
+
+def calcular_atribuicoes(explicador, modelo, codigos_candidatos, vaga_texto, indice):
+    """
+    Contribuições do candidato `indice` do ranking. Os textos de todo o ranking são transformados de uma vez
+    e guardados na sessão como matriz esparsa; só a linha do candidato selecionado é densificada.
+    """
+    chave = (vaga_texto, tuple(codigos_candidatos))
+    if st.session_state.get('atribuicoes_chave') != chave:
+        with instrumentacao.etapa('shap.atribuicoes', candidatos=len(codigos_candidatos)):
+            df_textos = utils.buscar_textos_candidatos(list(codigos_candidatos), colunas=('codigo_candidato', 'candidato_texto_completo'))
+            textos = df_textos.drop_duplicates('codigo_candidato').set_index('codigo_candidato')['candidato_texto_completo'] if not df_textos.empty else pd.Series(dtype=object)
+            textos = textos.reindex(list(codigos_candidatos)).fillna(utils.TEXTO_CANDIDATO_VAZIO)
+            df_textos = pd.DataFrame({'texto_completo': vaga_texto + ' ' + textos.to_numpy()})
+            if hasattr(modelo, 'transformar'): texto_transformado = modelo.transformar(df_textos['texto_completo'])
+            else: texto_transformado = modelo.named_steps['preprocessor'].transform(df_textos[['texto_completo']])
+            st.session_state.atribuicoes_analise = texto_transformado
+        st.session_state.atribuicoes_chave = chave
+    return explicador.explicar(st.session_state.atribuicoes_analise, linhas=[indice])
+
+@st.cache_resource
+def carregar_motor_pontuacao(_modelo, versao_modelo):
+    """Prepara o motor de pontuação com o cache de contagens por candidato (None se o modelo não for suportado)."""
+    motor_pontuacao = instrumentacao.importar('motor_pontuacao')
+    try:
+        motor = motor_pontuacao.MotorPontuacao(_modelo)
+    except ValueError:
+        return None
+    with st.spinner("Preparando o cache de contagens dos candidatos..."):
+        motor.carregar_cache()
+    return motor
+
+@st.cache_resource
+def carregar_indice_recuperacao(_motor, versao_modelo):
+    """Índice invertido para buscar candidatos em toda a base (None se o motor ou o modelo não forem suportados)."""
+    if _motor is None: return None
+    recuperacao = instrumentacao.importar('recuperacao')
+    try:
+        indice = recuperacao.IndiceInvertido(_motor)
+    except ValueError:
+        return None
+    with st.spinner("Preparando o índice invertido dos candidatos..."):
+        return indice.carregar()
+
+@st.cache_resource
+def carregar_matriz_vagas(_motor, _df_vagas, versao_modelo, versao_vagas):
+    """
+    Matriz de contagens de todas as vagas para a pontuação candidato -> vagas (None se o modelo não for suportado).
+    `versao_vagas` (assinatura do arquivo de vagas) refaz a matriz quando as vagas mudam.
+    """
+    if _motor is None: return None
+    motor_pontuacao = instrumentacao.importar('motor_pontuacao')
+    try:
+        matriz = motor_pontuacao.MatrizVagas(_motor)
+    except ValueError:
+        return None
+    with st.spinner("Preparando a matriz de vagas..."):
+        return matriz.carregar(_df_vagas)
+
+def calcular_ranking(codigo_vaga, vaga_texto, toda_base, top_n=20):
+    """Os `top_n` melhores candidatos da vaga como registros enxutos (`utils.registros_ranking`), sem os textos."""
+    if toda_base:
+        # --- Top-N de toda a base pelo índice invertido (mesmo resultado da pontuação exaustiva) ---
+        indice = carregar_indice_recuperacao(motor_ativo(), obter_versao_modelo(modelo_ativo()))
+        with instrumentacao.etapa('analise.recuperacao', candidatos=len(indice.codigos)):
+            df_ranking, _ = indice.buscar(vaga_texto, k=top_n, modelo=carregar_modelo_treinado())
+        return utils.registros_ranking(df_ranking)
+    # --- Ranking pré-calculado por pontuar_lote.py, quando disponível para o modelo e os dados atuais ---
+    df_ranking = utils.buscar_ranking_precomputado(codigo_vaga, obter_versao_modelo(modelo_ativo()), top_n)
+    if df_ranking is not None: return utils.registros_ranking(df_ranking)
+
+    ids = [str(p['codigo']) for p in prospects_data_dict.get(codigo_vaga, {}).get('prospects', [])]
+    # --- Carregamento sob demanda a partir da base colunar: nomes de todos, textos só de quem não está no cache de contagens ---
+    df_detalhes = utils.buscar_textos_candidatos(ids, colunas=('codigo_candidato', 'nome_candidato')) if ids else pd.DataFrame()
+    if df_detalhes.empty: return utils.registros_ranking(None)
+    modelo_match = carregar_modelo_treinado(modelo_ativo())
+    motor = motor_ativo()
+    sem_contagens = ~motor.em_cache(df_detalhes['codigo_candidato']) if motor is not None else np.ones(len(df_detalhes), dtype=bool)
+    if sem_contagens.any():
+        df_textos = utils.buscar_textos_candidatos(df_detalhes['codigo_candidato'][sem_contagens].tolist(), colunas=('codigo_candidato', 'candidato_texto_completo'))
+        df_detalhes = df_detalhes.merge(df_textos.drop_duplicates('codigo_candidato'), on='codigo_candidato', how='left')
+        df_detalhes['candidato_texto_completo'] = df_detalhes['candidato_texto_completo'].fillna(utils.TEXTO_CANDIDATO_VAZIO)
+    with instrumentacao.etapa('analise.predict_proba', candidatos=len(df_detalhes), motor=motor is not None):
+        if motor is not None:
+            probs = motor.predict_proba_vaga(vaga_texto, df_detalhes)
+        else:
+            probs = modelo_match.predict_proba(pd.DataFrame({'texto_completo': vaga_texto + ' ' + df_detalhes['candidato_texto_completo']}))[:, 1]
+    with instrumentacao.etapa('analise.ordenacao', candidatos=len(df_detalhes)):
+        df_detalhes = df_detalhes[['codigo_candidato', 'nome_candidato']].assign(probabilidade=probs, score=(probs * 100).astype(int))
+        df_detalhes = df_detalhes.sort_values('probabilidade', ascending=False, kind='mergesort').head(top_n)
+    return utils.registros_ranking(df_detalhes)
+
+@st.cache_data(max_entries=256)
+def obter_texto_candidato(codigo_candidato):
+    """Texto completo de um candidato, lido sob demanda da base colunar (compartilhado entre as sessões)."""
+    df = utils.buscar_textos_candidatos([codigo_candidato], colunas=('codigo_candidato', 'candidato_texto_completo'))
+    if df.empty or pd.isna(df['candidato_texto_completo'].iloc[0]): return utils.TEXTO_CANDIDATO_VAZIO
+    return df['candidato_texto_completo'].iloc[0]
+
+def exibir_explicacao_shap(atribuicoes):
     """Gera e exibe um gráfico de cascata (waterfall) do SHAP com nomes de features limpos e uma explicação clara."""
+    plt = instrumentacao.importar('matplotlib.pyplot')
+    shap = instrumentacao.importar('shap')
     try:
-        # 1. Transforma o texto do candidato
-        texto_transformado = preprocessor.transform(pd.DataFrame([texto_candidato], columns=['texto_completo']))
-        
-        # 2. Calcula os valores SHAP
-        shap_values = explainer(texto_transformado)
+        # 1. e 2. As contribuições já foram calculadas só para o candidato selecionado
+        explicacao = atribuicoes.explanation(0)
         
         # 3. Limpa os nomes das features
-        shap_values.feature_names = [name.replace('tfidf__', '').replace('_', ' ') for name in shap_values.feature_names]
+        explicacao.feature_names = [name.replace('tfidf__', '').replace('_', ' ') for name in explicacao.feature_names]
         
         # 4. Gera e exibe o gráfico de cascata
         st.subheader("Análise de Contribuição das Palavras-Chave")
         st.markdown("Este gráfico mostra como as principais palavras-chave (features) impactaram o score final do candidato, partindo de um score base.")
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        shap.plots.waterfall(shap_values[0], max_display=14, show=False)
-        st.pyplot(fig, bbox_inches='tight')
-        plt.close(fig)
+        with instrumentacao.etapa('shap.grafico'):
+            fig, ax = plt.subplots(figsize=(10, 6))
+            shap.plots.waterfall(explicacao, max_display=14, show=False)
+            st.pyplot(fig, bbox_inches='tight')
+            plt.close(fig)
 
         # --- MELHORIA: Tradução da Pontuação ---
         st.subheader("Tradução da Pontuação: Do Técnico ao Score Final")
         
         # Obter o score bruto (log-odds)
-        raw_score = shap_values[0].base_values + shap_values[0].values.sum()
+        raw_score = explicacao.base_values + explicacao.values.sum()
         
         # Converter para probabilidade
         probability = 1 / (1 + np.exp(-raw_score))
@@ -66,8 +209,8 @@ def exibir_explicacao_shap(explainer, preprocessor, texto_candidato):
         st.markdown(f"""
         O gráfico acima é uma representação técnica de como o modelo chegou à sua decisão. Veja como traduzimos isso para o score que você vê:
 
-        1.  **Score Base do Modelo (`E[f(X)]`):** O ponto de partida para todo candidato é **{shap_values[0].base_values:.3f}**.
-        2.  **Impacto das Palavras-Chave:** As palavras no perfil deste candidato somaram um impacto total de **{shap_values[0].values.sum():+.3f}**.
+        1.  **Score Base do Modelo (`E[f(X)]`):** O ponto de partida para todo candidato é **{explicacao.base_values:.3f}**.
+        2.  **Impacto das Palavras-Chave:** As palavras no perfil deste candidato somaram um impacto total de **{explicacao.values.sum():+.3f}**.
         3.  **Score Bruto Final (`f(x)`):** Somando o score base e o impacto, temos o score bruto de **{raw_score:.3f}**.
         4.  **Conversão para Probabilidade:** Este score bruto é convertido para uma probabilidade de "match", resultando em **{probability:.2%}**.
         5.  **Score Final (0-100):** Finalmente, essa probabilidade é apresentada como o **Score de {final_score}%** que você vê na lista de candidatos.
@@ -79,8 +222,11 @@ def exibir_explicacao_shap(explainer, preprocessor, texto_candidato):
         st.error(f"Ocorreu um erro ao gerar a explicação SHAP: {e}")
 
 
-def gerar_proxima_pergunta(vaga, candidato, historico_chat):
-    """Formula a próxima pergunta da entrevista usando a IA Generativa."""
+def gerar_proxima_pergunta(vaga, candidato, historico, metricas=None):
+    """Formula a próxima pergunta da entrevista usando a IA Generativa, em streaming, com contexto limitado por orçamento de tokens."""
+    contexto_prompt = instrumentacao.importar('contexto_prompt')
+    resumo_cv = contexto_prompt.extrair_cv_relevante(obter_texto_candidato(candidato['codigo_candidato']), f"{vaga.get('titulo_vaga', '')} {vaga.get('perfil_vaga_texto', '')}")
+    historico_chat = historico.contexto()
     prompt = f"""
     Você é um entrevistador de IA da empresa Decision. Sua tarefa é conduzir uma entrevista focada e eficiente.
     Com base no histórico da conversa, formule a PRÓXIMA pergunta para o candidato.
@@ -90,23 +236,22 @@ def gerar_proxima_pergunta(vaga, candidato, historico_chat):
 
     **Vaga:** {vaga.get('titulo_vaga', 'N/A')}
     **Candidato:** {candidato.get('nome_candidato', 'N/A')}
-    **Resumo do Candidato:** {candidato.get('candidato_texto_completo', '')}
+    **Resumo do Candidato:** {resumo_cv}
     **Histórico da Entrevista:**
     {historico_chat}
 
     **Sua Ação:** Formule a próxima pergunta ou finalize a entrevista.
     """
+    if metricas is not None: metricas['prompt'] = contexto_prompt.tamanho_prompt(prompt, cv=resumo_cv, historico=historico_chat)
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        yield from chamar_llm(prompt, metricas)
     except Exception as e:
         st.warning(f"Ocorreu um erro na comunicação com a IA: {e}")
-        return "Peço desculpas, tive um problema de comunicação. Podemos tentar novamente?"
+        yield "Peço desculpas, tive um problema de comunicação. Podemos tentar novamente?"
 
-def gerar_relatorio_final(vaga, candidato, historico_chat):
-    """Gera um relatório final estruturado da entrevista."""
-    prompt = f"""
+def montar_prompt_relatorio_final(vaga, candidato, historico_chat):
+    """Prompt do relatório final de uma entrevista."""
+    return f"""
     Você é um especialista em recrutamento da Decision. Sua tarefa é analisar a transcrição de uma entrevista e gerar um relatório final conciso e objetivo.
 
     **Vaga:** {vaga.get('titulo_vaga', 'N/A')}
@@ -121,16 +266,34 @@ def gerar_relatorio_final(vaga, candidato, historico_chat):
     3.  **Pontos de Atenção:** Liste 1 ou 2 pontos que requerem atenção ou desenvolvimento.
     4.  **Recomendação Final:** Classifique como "Recomendado", "Recomendado com Ressalvas" ou "Não Recomendado".
     """
+
+def gerar_relatorio_final(vaga, candidato, historico, metricas=None):
+    """Gera um relatório final estruturado da entrevista, em streaming."""
+    historico_chat = historico.transcricao()
+    prompt = montar_prompt_relatorio_final(vaga, candidato, historico_chat)
+    if metricas is not None: metricas['prompt'] = instrumentacao.importar('contexto_prompt').tamanho_prompt(prompt, historico=historico_chat)
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        yield from chamar_llm(prompt, metricas)
     except Exception as e:
         st.error(f"Ocorreu um erro ao gerar o relatório: {e}")
-        return "Falha ao gerar o relatório."
-
-def gerar_analise_comparativa(vaga, relatorios):
-    """Gera um parecer final comparando os candidatos finalistas."""
+        yield "Falha ao gerar o relatório."
+
+def gerar_relatorios_em_lote(vaga, candidatos, historicos):
+    """Gera em paralelo os relatórios finais de vários candidatos ({id: transcrição}); retorna ({id: relatório}, {id: erro})."""
+    llm = instrumentacao.importar('llm')
+    backend, limitador, cache = obter_llm()
+    prompts = {c['codigo_candidato']: montar_prompt_relatorio_final(vaga, c, historicos[c['codigo_candidato']]) for c in candidatos}
+    return llm.gerar_em_lote(backend, prompts, max_concorrencia=5, limitador=limitador, cache=cache, ignorar_cache=st.session_state.get('ignorar_cache_llm', False))
+
+def obter_historico(id_candidato):
+    """Histórico incremental da entrevista do candidato, sincronizado com as mensagens da sessão."""
+    historicos = st.session_state.setdefault('historicos', {})
+    if id_candidato not in historicos:
+        historicos[id_candidato] = instrumentacao.importar('contexto_prompt').HistoricoIncremental()
+    return historicos[id_candidato].sincronizar(st.session_state.messages[id_candidato])
+
+def gerar_analise_comparativa(vaga, relatorios, metricas=None):
+    """Gera um parecer final comparando os candidatos finalistas, em streaming."""
     cliente = vaga.get('cliente', 'empresa contratante')
     prompt = f"""
     Você é um Diretor de Recrutamento da Decision. Sua tarefa é criar um parecer final para apresentar ao cliente '{cliente}'.
@@ -145,12 +308,10 @@ def gerar_analise_comparativa(vaga, relatorios):
     3.  **Considerações Adicionais:** Breves comentários sobre os outros candidatos, if relevante.
     """
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        yield from chamar_llm(prompt, metricas)
     except Exception as e:
         st.error(f"Ocorreu um erro ao gerar a análise comparativa: {e}")
-        return "Falha ao gerar a análise comparativa."
+        yield "Falha ao gerar a análise comparativa."
 
 # --- CONFIGURAÇÃO INICIAL DO APP ---
 st.set_page_config(page_title="Decision - Assistente de Recrutamento IA", page_icon="✨", layout="wide")
@@ -162,11 +323,9 @@ if not utils.preparar_dados_candidatos():
 # Carrega os dados e modelos essenciais na inicialização
 df_vagas_ui = utils.carregar_vagas()
 prospects_data_dict = utils.carregar_json(utils.PROSPECTS_FILENAME)
-modelo_match = carregar_modelo_treinado()
-shap_explainer = carregar_explicador_shap()
 
 # Verifica se os componentes essenciais foram carregados
-dados_ok = all(obj is not None for obj in [df_vagas_ui, prospects_data_dict, modelo_match, shap_explainer])
+dados_ok = all(obj is not None for obj in [df_vagas_ui, prospects_data_dict])
 
 if dados_ok:
     st.title("✨ Assistente de Recrutamento da Decision")
@@ -175,16 +334,37 @@ if dados_ok:
         st.header("Configuração Essencial")
         google_api_key = st.secrets.get("GOOGLE_API_KEY")
         if google_api_key:
-            genai.configure(api_key=google_api_key)
             st.success("API do Google Gemini configurada!")
+        elif os.environ.get("LLM_BACKEND", "").lower() == "falso":
+            st.info("Backend de IA falso ativo (LLM_BACKEND=falso).")
         else:
             st.error("Chave de API do Google Gemini não encontrada.")
             st.stop()
 
         st.markdown("---")
         st.header("Status dos Modelos")
-        st.success("Modelo de Matching ✔️")
-        st.success("Explicador SHAP ✔️")
+        # Os artefatos só são carregados no primeiro uso; aqui apenas confirmamos que estão disponíveis.
+        for nome_status, arquivo_status in [("Modelo de Matching", utils.MODELO_FILENAME), ("Explicador SHAP", utils.EXPLICADOR_FILENAME)]:
+            if os.path.exists(arquivo_status): st.success(f"{nome_status} ✔️")
+            else: st.error(f"{nome_status}: '{arquivo_status}' não encontrado.")
+        if os.path.exists(utils.MODELO_INCREMENTAL_FILENAME):
+            opcoes_modelo = {utils.MODELO_FILENAME: "Completo (TF-IDF)", utils.MODELO_INCREMENTAL_FILENAME: "Incremental (hashing, treinado com os prospects novos)"}
+            st.radio("Modelo de matching:", options=list(opcoes_modelo), format_func=opcoes_modelo.get, key='modelo_ativo',
+                     help="O modelo incremental não tem vocabulário: a busca em toda a base, as vagas por candidato e a explicação por palavras-chave usam apenas o modelo completo.")
+        # Compara os dados atuais com os registrados no manifesto quando o modelo foi treinado
+        dados_alterados = utils.entradas_alteradas_do_modelo(modelo_ativo()) if os.path.exists(modelo_ativo()) else []
+        if dados_alterados is None:
+            st.info("O modelo não tem registro dos dados de treino no manifesto; não é possível confirmar que corresponde aos dados atuais.")
+        elif dados_alterados:
+            st.warning(f"O modelo foi treinado com outra versão dos dados ({', '.join(os.path.basename(a) for a in dados_alterados)}). Execute o script de treino novamente.")
+
+        st.markdown("---")
+        st.header("Cache da IA")
+        st.checkbox("Ignorar cache (regenerar respostas)", key='ignorar_cache_llm', help="Gera novas respostas mesmo para prompts já vistos; elas substituem as do cache.")
+        with st.expander("Estatísticas do cache de respostas"):
+            st.json(obter_llm()[2].estatisticas())
+        with st.expander("Latência da IA (streaming)"):
+            st.json(instrumentacao.importar('llm').ESTATISTICAS_STREAM.resumo())
 
     # Inicializa o session_state
     if 'df_analise_resultado' not in st.session_state: st.session_state.df_analise_resultado = pd.DataFrame()
@@ -192,44 +372,40 @@ if dados_ok:
     if 'vaga_selecionada' not in st.session_state: st.session_state.vaga_selecionada = {}
     if "messages" not in st.session_state: st.session_state.messages = {}
     if "relatorios_finais" not in st.session_state: st.session_state.relatorios_finais = {}
+    if 'vaga_analisada' not in st.session_state: st.session_state.vaga_analisada = None
+    if 'df_vagas_candidato' not in st.session_state: st.session_state.df_vagas_candidato = pd.DataFrame()
 
-    tab1, tab2, tab3 = st.tabs(["Agente 1: Matching e Análise", "Agente 2: Entrevistas", "Análise Final"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Agente 1: Matching e Análise", "Agente 2: Entrevistas", "Análise Final", "Vagas por Candidato"])
 
     with tab1:
         st.header("Matching com Machine Learning")
         opcoes_vagas = {row['codigo_vaga']: f"{row['titulo_vaga']} ({row['cliente']})" for _, row in df_vagas_ui.iterrows()}
         codigo_vaga_selecionada = st.selectbox("Selecione a vaga:", options=list(opcoes_vagas.keys()), format_func=lambda x: opcoes_vagas[x])
 
+        if dados_alterados:
+            st.warning("Atenção: os scores abaixo vêm de um modelo treinado com dados diferentes dos atuais.")
+        buscar_toda_base = st.checkbox("Buscar em toda a base de candidatos", help="Retorna os 20 melhores candidatos de toda a base, não apenas os prospects da vaga.")
         if st.button("Analisar Candidatos", type="primary"):
-            with st.spinner("Analisando candidatos..."):
-                prospects = prospects_data_dict.get(codigo_vaga_selecionada, {}).get('prospects', [])
-                if prospects:
-                    ids = [str(p['codigo']) for p in prospects]
-                    # --- MUDANÇA PRINCIPAL: Carregamento sob demanda ---
-                    df_detalhes = utils.buscar_detalhes_candidatos_por_id(ids)
-                    
-                    if not df_detalhes.empty:
-                        vaga_texto = df_vagas_ui[df_vagas_ui['codigo_vaga'] == codigo_vaga_selecionada].iloc[0]['perfil_vaga_texto']
-                        text_cols = ['informacoes_profissionais_resumo_profissional', 'informacoes_profissionais_conhecimentos', 'cv_pt', 'cv_en']
-                        for col in text_cols:
-                            if col not in df_detalhes.columns: df_detalhes[col] = ''
-                        df_detalhes['candidato_texto_completo'] = df_detalhes[text_cols].fillna('').astype(str).agg(' '.join, axis=1)
-                        df_detalhes['texto_completo'] = vaga_texto + ' ' + df_detalhes['candidato_texto_completo']
-                        
-                        probs = modelo_match.predict_proba(df_detalhes[['texto_completo']])
-                        df_detalhes['score'] = (probs[:, 1] * 100).astype(int)
-                        st.session_state.df_analise_resultado = df_detalhes.sort_values(by='score', ascending=False).head(20)
+            with st.spinner("Analisando candidatos..."), instrumentacao.etapa('analise.total', vaga=str(codigo_vaga_selecionada)):
+                vaga_texto = df_vagas_ui[df_vagas_ui['codigo_vaga'] == codigo_vaga_selecionada].iloc[0]['perfil_vaga_texto']
+                if buscar_toda_base and carregar_indice_recuperacao(motor_ativo(), obter_versao_modelo(modelo_ativo())) is None:
+                    st.warning("A busca em toda a base não é suportada por este modelo; exibindo os prospects da vaga.")
+                    buscar_toda_base = False
+                # --- Ranking compartilhado entre as sessões: calculado uma vez por vaga, modelo e versão dos dados ---
+                chave = (str(codigo_vaga_selecionada), 'toda_base' if buscar_toda_base else 'prospects', obter_versao_modelo(modelo_ativo()), utils.assinatura_dados_ranking())
+                df_ranking = utils.CACHE_RANKINGS.obter(chave, lambda: calcular_ranking(codigo_vaga_selecionada, vaga_texto, buscar_toda_base))
+                if df_ranking.empty: st.info("Nenhum prospect encontrado para esta vaga.")
+                st.session_state.df_analise_resultado = df_ranking
+                st.session_state.vaga_analisada = codigo_vaga_selecionada
 
         if not st.session_state.df_analise_resultado.empty:
             st.subheader("Candidatos Recomendados")
             st.markdown("Marque os candidatos que deseja mover para a fase de entrevistas.")
             
-            df_resultados = st.session_state.df_analise_resultado.copy()
-            
-            df_resultados['selecionar'] = False
-            colunas_para_mostrar = ['selecionar', 'codigo_candidato', 'score']
+            # O ranking é compartilhado com outras sessões (cache de rankings): a tabela editável é um novo DataFrame
+            df_resultados = st.session_state.df_analise_resultado
             df_editado = st.data_editor(
-                df_resultados[colunas_para_mostrar], 
+                pd.DataFrame({'selecionar': False, 'codigo_candidato': df_resultados['codigo_candidato'], 'score': df_resultados['score']}), 
                 column_config={
                     "selecionar": st.column_config.CheckboxColumn("Selecionar"), 
                     "codigo_candidato": "ID do Candidato", 
@@ -244,19 +420,22 @@ if dados_ok:
             id_candidato_selecionado = st.selectbox("Selecione um candidato para entender seu score:", options=ids_para_analise)
             
             if id_candidato_selecionado:
-                candidato_data = df_resultados[df_resultados['codigo_candidato'] == id_candidato_selecionado].iloc[0]
-                exibir_explicacao_shap(
-                    shap_explainer, 
-                    modelo_match.named_steps['preprocessor'], 
-                    candidato_data['texto_completo']
-                )
+                shap_explainer = carregar_explicador_shap()
+                if modelo_ativo() != utils.MODELO_FILENAME:
+                    st.info("A explicação por palavras-chave exige o modelo completo (TF-IDF); selecione-o na barra lateral.")
+                elif shap_explainer.versao_modelo != obter_versao_modelo():
+                    st.warning("O explicador não corresponde ao modelo carregado. Execute o script de treino novamente para gerar os dois artefatos juntos.")
+                else:
+                    vaga_analisada = df_vagas_ui[df_vagas_ui['codigo_vaga'] == st.session_state.vaga_analisada].iloc[0]['perfil_vaga_texto']
+                    atribuicoes = calcular_atribuicoes(shap_explainer, carregar_modelo_treinado(), ids_para_analise, vaga_analisada, ids_para_analise.index(id_candidato_selecionado))
+                    exibir_explicacao_shap(atribuicoes)
 
             if st.button("Confirmar para Entrevista"):
                 selecionados = df_editado[df_editado['selecionar']]['codigo_candidato'].tolist()
                 if selecionados:
-                    df_final = st.session_state.df_analise_resultado[st.session_state.df_analise_resultado['codigo_candidato'].isin(selecionados)]
-                    st.session_state.candidatos_para_entrevista = df_final.to_dict('records')
-                    st.session_state.vaga_selecionada = df_vagas_ui[df_vagas_ui['codigo_vaga'] == codigo_vaga_selecionada].iloc[0].to_dict()
+                    df_final = df_resultados[df_resultados['codigo_candidato'].isin(selecionados)]
+                    st.session_state.candidatos_para_entrevista = df_final[['codigo_candidato', 'nome_candidato', 'score']].to_dict('records')
+                    st.session_state.vaga_selecionada = df_vagas_ui[df_vagas_ui['codigo_vaga'] == st.session_state.vaga_analisada].iloc[0].to_dict()
                     st.success(f"{len(selecionados)} candidato(s) movido(s) para a aba de entrevistas!")
                     time.sleep(1)
                     st.rerun()
@@ -286,24 +465,38 @@ if dados_ok:
                     with st.chat_message("user"):
                         st.markdown(prompt)
                     
-                    with st.spinner("IA está formulando a próxima pergunta..."):
-                        historico_chat = "\n".join([f"{'Entrevistador' if m['role'] == 'assistant' else 'Candidato'}: {m['content']}" for m in st.session_state.messages[id_selecionado]])
-                        proxima_pergunta = gerar_proxima_pergunta(vaga_atual, candidato_atual, historico_chat)
-                        st.session_state.messages[id_selecionado].append({"role": "assistant", "content": proxima_pergunta})
-                    st.rerun()
+                    # A pergunta é exibida à medida que é gerada, sem redesenhar o chat inteiro
+                    metricas_stream = {}
+                    with st.chat_message("assistant"):
+                        proxima_pergunta = st.write_stream(gerar_proxima_pergunta(vaga_atual, candidato_atual, obter_historico(id_selecionado), metricas_stream))
+                        exibir_metricas_stream(metricas_stream)
+                    st.session_state.messages[id_selecionado].append({"role": "assistant", "content": proxima_pergunta})
 
                 if st.button(f"🏁 Finalizar Entrevista e Gerar Relatório para ID {id_selecionado}"):
-                    with st.spinner("Gerando relatório..."):
-                        historico_final = "\n".join([f"{'Entrevistador' if m['role'] == 'assistant' else 'Candidato'}: {m['content']}" for m in st.session_state.messages[id_selecionado]])
-                        relatorio = gerar_relatorio_final(vaga_atual, candidato_atual, historico_final)
-                        
-                        if vaga_atual['codigo_vaga'] not in st.session_state.relatorios_finais:
-                            st.session_state.relatorios_finais[vaga_atual['codigo_vaga']] = {}
-                        st.session_state.relatorios_finais[vaga_atual['codigo_vaga']][id_selecionado] = relatorio
-                        
-                        st.success("Relatório gerado! Verifique a aba 'Análise Final'.")
-                        with st.expander("Ver relatório gerado", expanded=True):
-                            st.markdown(relatorio)
+                    metricas_stream = {}
+                    with st.expander("Ver relatório gerado", expanded=True):
+                        relatorio = st.write_stream(gerar_relatorio_final(vaga_atual, candidato_atual, obter_historico(id_selecionado), metricas_stream))
+                        exibir_metricas_stream(metricas_stream)
+
+                    if vaga_atual['codigo_vaga'] not in st.session_state.relatorios_finais:
+                        st.session_state.relatorios_finais[vaga_atual['codigo_vaga']] = {}
+                    st.session_state.relatorios_finais[vaga_atual['codigo_vaga']][id_selecionado] = relatorio
+
+                    st.success("Relatório gerado! Verifique a aba 'Análise Final'.")
+
+            # --- Relatórios de todos os finalistas entrevistados, gerados em paralelo ---
+            entrevistados = [c for c in st.session_state.candidatos_para_entrevista if any(m['role'] == 'user' for m in st.session_state.messages.get(c['codigo_candidato'], []))]
+            if len(entrevistados) >= 2:
+                st.markdown("---")
+                if st.button(f"⚡ Gerar relatórios de todos os {len(entrevistados)} entrevistados"):
+                    with st.spinner("Gerando os relatórios em paralelo..."):
+                        inicio_lote = time.perf_counter()
+                        historicos = {c['codigo_candidato']: obter_historico(c['codigo_candidato']).transcricao() for c in entrevistados}
+                        relatorios_lote, erros_lote = gerar_relatorios_em_lote(vaga_atual, entrevistados, historicos)
+                        st.session_state.relatorios_finais.setdefault(vaga_atual['codigo_vaga'], {}).update(relatorios_lote)
+                    st.success(f"{len(relatorios_lote)} relatório(s) gerado(s) em {time.perf_counter() - inicio_lote:.1f}s. Verifique a aba 'Análise Final'.")
+                    for id_erro, erro in erros_lote.items():
+                        st.error(f"Falha ao gerar o relatório do ID {id_erro}: {erro}")
 
     with tab3:
         st.header("Agente 3: Análise Final Comparativa")
@@ -327,14 +520,67 @@ if dados_ok:
                 
                 if len(relatorios_vaga_atual) >= 2:
                     if st.button("Gerar Análise Comparativa Final com IA", type="primary"):
-                        with st.spinner("IA está analisando todos os finalistas..."):
-                            todos_relatorios = "\n\n---\n\n".join(
-                                f"Relatório do Candidato {mapa_nomes.get(id_cand, id_cand)}:\n{rel}" 
-                                for id_cand, rel in relatorios_vaga_atual.items()
-                            )
-                            analise_final = gerar_analise_comparativa(vaga_selecionada, todos_relatorios)
-                            st.subheader("Parecer Final do Assistente de IA")
-                            st.markdown(analise_final)
+                        todos_relatorios = "\n\n---\n\n".join(
+                            f"Relatório do Candidato {mapa_nomes.get(id_cand, id_cand)}:\n{rel}" 
+                            for id_cand, rel in relatorios_vaga_atual.items()
+                        )
+                        st.subheader("Parecer Final do Assistente de IA")
+                        metricas_stream = {}
+                        st.write_stream(gerar_analise_comparativa(vaga_selecionada, todos_relatorios, metricas_stream))
+                        exibir_metricas_stream(metricas_stream)
+
+    with tab4:
+        st.header("Vagas Recomendadas para um Candidato")
+        st.markdown("Pontua o candidato contra todas as vagas de uma só vez. Informe um ou mais IDs separados por vírgula.")
+        entrada_ids = st.text_input("ID(s) do candidato:")
+        top_n_vagas = st.slider("Vagas por candidato:", min_value=5, max_value=100, value=20, step=5)
+        if st.button("Buscar Vagas", type="primary") and entrada_ids.strip():
+            ids_candidatos = [i.strip() for i in entrada_ids.split(',') if i.strip()]
+            with st.spinner("Pontuando o(s) candidato(s) contra todas as vagas..."), instrumentacao.etapa('vagas_candidato.total', candidatos=len(ids_candidatos)):
+                matriz_vagas = carregar_matriz_vagas(motor_ativo(), df_vagas_ui, obter_versao_modelo(modelo_ativo()), utils.versao_vagas())
+                if matriz_vagas is None:
+                    st.session_state.df_vagas_candidato = pd.DataFrame()
+                    st.warning("A pontuação candidato -> vagas não é suportada por este modelo.")
+                else:
+                    st.session_state.df_vagas_candidato = utils.ranking_vagas_para_candidatos(matriz_vagas, ids_candidatos, df_vagas_ui, top_n_vagas)
+                    if st.session_state.df_vagas_candidato.empty: st.warning("Nenhum dos IDs informados foi encontrado na base de candidatos.")
+
+        if not st.session_state.df_vagas_candidato.empty:
+            for id_candidato, df_cand in st.session_state.df_vagas_candidato.groupby('codigo_candidato', sort=False):
+                st.subheader(f"Candidato {id_candidato}")
+                st.dataframe(
+                    df_cand[['posicao', 'codigo_vaga', 'titulo_vaga', 'cliente', 'score']],
+                    column_config={
+                        "posicao": "Posição", "codigo_vaga": "ID da Vaga", "titulo_vaga": "Vaga", "cliente": "Cliente",
+                        "score": st.column_config.ProgressColumn("Score (%)", min_value=0, max_value=100)
+                    },
+                    hide_index=True
+                )
 else:
     st.error("Falha ao carregar os dados ou o modelo. Verifique os arquivos e a configuração.")
 
+# --- PERFIL DE INICIALIZAÇÃO ---
+instrumentacao.marcar('primeira_renderizacao')
+instrumentacao.salvar_perfil()
+with st.sidebar:
+    # --- DESEMPENHO POR ETAPA (desenhado ao final para incluir as medições desta execução) ---
+    st.markdown("---")
+    st.header("Desempenho das Etapas")
+    if not instrumentacao.etapas_ativas:
+        st.info(f"Medição das etapas desativada ({instrumentacao.ETAPAS_ENV}=0).")
+    elif resumo_etapas := instrumentacao.resumo_etapas():
+        st.dataframe(pd.DataFrame.from_dict(resumo_etapas, orient='index').sort_index())
+        st.caption(f"Percentis das últimas {instrumentacao.JANELA_ETAPAS} medições de cada etapa neste processo (tempo em ms, variação de memória residente em MB).")
+    else:
+        st.caption("Nenhuma etapa medida ainda. Execute uma análise de candidatos.")
+    log_json = st.checkbox("Emitir logs JSON das etapas", value=instrumentacao.log_json_ativo(), help="Uma linha JSON por etapa medida, em stderr. Vale para todo o processo.")
+    if log_json != instrumentacao.log_json_ativo(): instrumentacao.configurar_log_json(log_json)
+    if st.button("Zerar medições"):
+        instrumentacao.zerar_etapas()
+        st.rerun()
+    with st.expander("Cache de rankings (compartilhado entre sessões)"):
+        st.json(utils.CACHE_RANKINGS.estatisticas())
+    with st.expander("Perfil de inicialização"):
+        perfil_inicializacao = instrumentacao.perfil()
+        st.json(perfil_inicializacao, expanded=False)
+        st.download_button("Baixar perfil (JSON)", json.dumps(perfil_inicializacao, indent=2), file_name="perfil_inicializacao.json", mime="application/json")
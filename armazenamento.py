@@ -0,0 +1,566 @@
+import bisect
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import downloader
+import instrumentacao
+from manifesto import MANIFESTO_FILENAME, Manifesto
+
+# Arquivos de dados, índice NDJSON, base colunar de textos e rankings, sem dependência do Streamlit:
+# usado pelo serviço, pelos scripts de lote e pelo motor. O `utils` reexporta tudo e acrescenta os
+# caches e as mensagens do app.
+
+# --- Constantes de Arquivos e URLs ---
+DATA_DIR = Path("./data")
+APPLICANTS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/applicants.json"
+VAGAS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/vagas.json"
+PROSPECTS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/prospects.json"
+RAW_APPLICANTS_FILENAME = DATA_DIR / "applicants.raw.json"
+NDJSON_FILENAME = DATA_DIR / "applicants.nd.json"
+INDICE_NDJSON_FILENAME = DATA_DIR / "applicants.nd.idx"
+BASE_TEXTOS_FILENAME = DATA_DIR / "candidatos_texto.parquet"
+RANKINGS_DIR = DATA_DIR / "rankings"
+CACHE_LLM_FILENAME = DATA_DIR / "cache_respostas_llm.sqlite"
+MANIFESTO_DOWNLOADS_FILENAME = DATA_DIR / "downloads.manifest.json"
+MODELO_FILENAME = "modelo_recrutamento.joblib"
+MODELO_INCREMENTAL_FILENAME = "modelo_recrutamento.incremental.joblib" # Gerado por `train.py --incremental`; nunca substitui o modelo TF-IDF
+EXPLICADOR_FILENAME = "explicador_linear.npz"
+VAGAS_FILENAME = DATA_DIR / "vagas.json"
+PROSPECTS_FILENAME = DATA_DIR / "prospects.json"
+
+ENTRADAS_MODELO = (VAGAS_FILENAME, PROSPECTS_FILENAME, RAW_APPLICANTS_FILENAME)
+
+def assinatura_arquivos(caminhos):
+    """(tamanho, mtime_ns) de cada arquivo, ou None se ele não existe."""
+    assinatura = []
+    for caminho in caminhos:
+        try:
+            stat = os.stat(caminho)
+            assinatura.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            assinatura.append(None)
+    return tuple(assinatura)
+
+# --- MANIFESTOS ---
+# Resultado da última verificação de cada modelo, reaproveitado enquanto a assinatura (tamanho, mtime)
+# do modelo, do manifesto e dos dados de treino não muda.
+_verificacoes_modelo = {}
+
+def entradas_alteradas_do_modelo(caminho_modelo=MODELO_FILENAME):
+    """Arquivos de dados que mudaram desde o treino do modelo ([] se nenhum; None se o modelo atual não tem registro no manifesto)."""
+    chave = (os.getcwd(), str(caminho_modelo))
+    arquivos = (caminho_modelo, MANIFESTO_FILENAME, *ENTRADAS_MODELO)
+    anterior = _verificacoes_modelo.get(chave)
+    if anterior is not None and anterior[0] == assinatura_arquivos(arquivos): return anterior[1]
+    manifesto = Manifesto()
+    alteradas = manifesto.entradas_alteradas(caminho_modelo)
+    manifesto.salvar()
+    _verificacoes_modelo[chave] = (assinatura_arquivos(arquivos), alteradas)
+    return alteradas
+
+def arquivo_anterior_ao_manifesto(nome_arquivo):
+    """Arquivo local baixado antes do manifesto de downloads existir (sem registro de tamanho e sha256)."""
+    return os.path.exists(nome_arquivo) and Path(nome_arquivo).name not in downloader.carregar_manifesto(MANIFESTO_DOWNLOADS_FILENAME)
+
+def arquivo_baixado_integro(nome_arquivo):
+    """Arquivo presente e conferido com o manifesto de downloads (sha256 recalculado só se tamanho/mtime mudarem)."""
+    return downloader.arquivo_integro(nome_arquivo, downloader.carregar_manifesto(MANIFESTO_DOWNLOADS_FILENAME).get(Path(nome_arquivo).name))
+
+def carregar_json(caminho_arquivo):
+    """Carrega um arquivo JSON de forma segura (None se ausente ou inválido)."""
+    try:
+        with open(caminho_arquivo, 'r', encoding='utf-8') as f: return json.load(f)
+    except: return None
+
+def carregar_vagas():
+    """Carrega e padroniza os dados das vagas."""
+    vagas_data = carregar_json(VAGAS_FILENAME)
+    if vagas_data is None: return pd.DataFrame()
+    vagas_lista = []
+    for codigo, dados in vagas_data.items():
+        info_basicas = dados.get('informacoes_basicas', {})
+        vaga_info = {'codigo_vaga': codigo, 'titulo_vaga': info_basicas.get('titulo_vaga', 'N/A'), 'cliente': info_basicas.get('cliente', 'N/A'), 'perfil_vaga_texto': json.dumps(dados.get('perfil_vaga', {}))}
+        vagas_lista.append(vaga_info)
+    return pd.DataFrame(vagas_lista)
+
+# --- CONVERSÃO EM STREAMING PARA NDJSON ---
+_ESPACOS = ' \t\n\r'
+
+def _iterar_itens_objeto_json(f, tamanho_bloco=1 << 20):
+    """
+    Percorre incrementalmente um objeto JSON de nível superior `{chave: valor}`,
+    produzindo um par (chave, valor) por vez. A memória fica limitada ao maior
+    valor individual mais um bloco de leitura.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, fim_arquivo = '', 0, False
+
+    def ler_mais(minimo):
+        nonlocal buffer, pos, fim_arquivo
+        bloco = f.read(max(tamanho_bloco, minimo))
+        if not bloco: fim_arquivo = True
+        buffer = buffer[pos:] + bloco
+        pos = 0
+
+    def proximo_caractere():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _ESPACOS: pos += 1
+            if pos < len(buffer): return buffer[pos]
+            if fim_arquivo: raise ValueError("Fim inesperado do arquivo JSON.")
+            ler_mais(0)
+
+    def decodificar():
+        nonlocal pos
+        pendente = 0
+        while True:
+            try:
+                valor, fim = decoder.raw_decode(buffer, pos)
+                # Um valor que termina exatamente no fim do buffer pode estar truncado (ex.: números).
+                if fim < len(buffer) or fim_arquivo:
+                    pos = fim
+                    return valor
+            except json.JSONDecodeError:
+                if fim_arquivo: raise
+            pendente = max(pendente * 2, len(buffer) - pos)
+            ler_mais(pendente)
+
+    if proximo_caractere() != '{': raise ValueError("O arquivo não contém um objeto JSON no nível superior.")
+    pos += 1
+    if proximo_caractere() == '}': return
+    while True:
+        proximo_caractere()
+        chave = decodificar()
+        if proximo_caractere() != ':': raise ValueError(f"Esperado ':' após a chave '{chave}'.")
+        pos += 1
+        proximo_caractere()
+        yield chave, decodificar()
+        separador = proximo_caractere()
+        pos += 1
+        if separador == '}': return
+        if separador != ',': raise ValueError(f"Separador inesperado '{separador}' após a chave '{chave}'.")
+
+def converter_json_para_ndjson(caminho_origem, caminho_destino, tamanho_bloco=1 << 20):
+    """
+    Converte o JSON `{codigo: candidato}` em NDJSON (uma linha por candidato) sem carregar
+    o arquivo inteiro. A escrita é atômica: o destino só aparece quando a conversão termina.
+    """
+    caminho_tmp = Path(f"{caminho_destino}.tmp")
+    total = 0
+    try:
+        with open(caminho_origem, 'r', encoding='utf-8') as f_in, open(caminho_tmp, 'w', encoding='utf-8') as f_out:
+            for codigo, candidato_data in _iterar_itens_objeto_json(f_in, tamanho_bloco):
+                candidato_data['codigo_candidato'] = codigo
+                json.dump(candidato_data, f_out)
+                f_out.write('\n')
+                total += 1
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(caminho_tmp, caminho_destino)
+    except BaseException:
+        caminho_tmp.unlink(missing_ok=True)
+        raise
+    return total
+
+# --- ÍNDICE DE BYTES DO NDJSON ---
+# Layout do arquivo .idx: cabeçalho fixo seguido de registros ordenados pelo código
+# do candidato (chave com largura fixa, preenchida com \0) + (offset, tamanho) da linha.
+_INDICE_MAGICO = b"NDIDX001"
+_INDICE_CABECALHO = struct.Struct("<8sQqII")  # mágico, tamanho e mtime do NDJSON, nº de registros, largura da chave
+_INDICE_POSICAO = struct.Struct("<QI")        # offset e tamanho da linha no NDJSON
+
+def construir_indice_ndjson(caminho_ndjson=NDJSON_FILENAME, caminho_indice=INDICE_NDJSON_FILENAME):
+    """Gera o índice `codigo_candidato -> (offset, tamanho)` do arquivo NDJSON."""
+    stat = os.stat(caminho_ndjson)
+    entradas = []
+    offset = 0
+    with open(caminho_ndjson, 'rb') as f:
+        for linha in f:
+            tamanho = len(linha.rstrip(b'\r\n'))
+            if tamanho:
+                try:
+                    codigo = json.loads(linha).get('codigo_candidato')
+                except json.JSONDecodeError:
+                    codigo = None
+                if codigo is not None:
+                    entradas.append((str(codigo).encode('utf-8'), offset, tamanho))
+            offset += len(linha)
+    entradas.sort()
+    largura_chave = max((len(chave) for chave, _, _ in entradas), default=1)
+
+    caminho_tmp = Path(f"{caminho_indice}.tmp")
+    with open(caminho_tmp, 'wb') as f:
+        f.write(_INDICE_CABECALHO.pack(_INDICE_MAGICO, stat.st_size, stat.st_mtime_ns, len(entradas), largura_chave))
+        for chave, offset, tamanho in entradas:
+            f.write(chave.ljust(largura_chave, b'\0'))
+            f.write(_INDICE_POSICAO.pack(offset, tamanho))
+    os.replace(caminho_tmp, caminho_indice)
+
+def _ler_cabecalho_indice(caminho_indice):
+    try:
+        with open(caminho_indice, 'rb') as f:
+            cabecalho = f.read(_INDICE_CABECALHO.size)
+    except OSError:
+        return None
+    if len(cabecalho) < _INDICE_CABECALHO.size: return None
+    magico, tamanho, mtime_ns, total, largura_chave = _INDICE_CABECALHO.unpack(cabecalho)
+    if magico != _INDICE_MAGICO: return None
+    return tamanho, mtime_ns, total, largura_chave
+
+def indice_ndjson_valido(caminho_ndjson=NDJSON_FILENAME, caminho_indice=INDICE_NDJSON_FILENAME):
+    """Verifica se o índice existe e corresponde à versão atual do arquivo NDJSON."""
+    cabecalho = _ler_cabecalho_indice(caminho_indice)
+    if cabecalho is None or not os.path.exists(caminho_ndjson): return False
+    stat = os.stat(caminho_ndjson)
+    return cabecalho[:2] == (stat.st_size, stat.st_mtime_ns)
+
+def _posicoes_no_indice(mm_indice, total, largura_chave, ids):
+    """Busca binária de cada ID no índice mapeado em memória; retorna os pares (offset, tamanho)."""
+    tamanho_registro = largura_chave + _INDICE_POSICAO.size
+    base = _INDICE_CABECALHO.size
+    posicoes = []
+    for codigo in ids:
+        chave = str(codigo).encode('utf-8')
+        if len(chave) > largura_chave: continue
+        chave = chave.ljust(largura_chave, b'\0')
+        lo, hi = 0, total
+        while lo < hi:
+            meio = (lo + hi) // 2
+            inicio = base + meio * tamanho_registro
+            if mm_indice[inicio:inicio + largura_chave] < chave: lo = meio + 1
+            else: hi = meio
+        while lo < total:
+            inicio = base + lo * tamanho_registro
+            if mm_indice[inicio:inicio + largura_chave] != chave: break
+            posicoes.append(_INDICE_POSICAO.unpack_from(mm_indice, inicio + largura_chave))
+            lo += 1
+    return posicoes
+
+def buscar_registros_por_id(ids_necessarios, caminho_ndjson=NDJSON_FILENAME, caminho_indice=INDICE_NDJSON_FILENAME):
+    """Lê do NDJSON apenas as linhas dos IDs pedidos, usando o índice (reconstruído se estiver desatualizado)."""
+    if not indice_ndjson_valido(caminho_ndjson, caminho_indice):
+        construir_indice_ndjson(caminho_ndjson, caminho_indice)
+    _, _, total, largura_chave = _ler_cabecalho_indice(caminho_indice)
+    if total == 0: return []
+
+    with instrumentacao.etapa('ndjson.indice', ids=len(ids_necessarios)), open(caminho_indice, 'rb') as f_idx, mmap.mmap(f_idx.fileno(), 0, access=mmap.ACCESS_READ) as mm_indice:
+        # Ordena pelo offset para manter a ordem do arquivo, como na varredura sequencial.
+        posicoes = sorted(set(_posicoes_no_indice(mm_indice, total, largura_chave, set(ids_necessarios))))
+    if not posicoes: return []
+
+    registros = []
+    with instrumentacao.etapa('ndjson.leitura', registros=len(posicoes)), open(caminho_ndjson, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm_dados:
+        for offset, tamanho in posicoes:
+            try:
+                registros.append(json.loads(mm_dados[offset:offset + tamanho]))
+            except json.JSONDecodeError:
+                continue
+    return registros
+
+def buscar_detalhes_candidatos_por_id(ids_necessarios: list):
+    """
+    Busca detalhes de candidatos específicos no arquivo NDJSON,
+    lendo apenas os registros necessários através do índice de bytes.
+    """
+    if not os.path.exists(NDJSON_FILENAME):
+        return pd.DataFrame()
+
+    candidatos_encontrados = buscar_registros_por_id(ids_necessarios)
+    
+    if not candidatos_encontrados:
+        return pd.DataFrame()
+
+    with instrumentacao.etapa('json_normalize', registros=len(candidatos_encontrados)):
+        df = pd.json_normalize(candidatos_encontrados, sep='_')
+    coluna_nome = 'informacoes_pessoais_dados_pessoais_nome_completo'
+    if coluna_nome in df.columns:
+        df.rename(columns={coluna_nome: 'nome_candidato'}, inplace=True)
+    else:
+        df['nome_candidato'] = 'Nome não encontrado'
+    df['codigo_candidato'] = df['codigo_candidato'].astype(str)
+    return df
+
+# --- BASE COLUNAR DE TEXTOS DOS CANDIDATOS ---
+# Apenas os campos usados no score e na exibição, com o texto completo já concatenado.
+COLUNAS_TEXTO_CANDIDATO = [('informacoes_profissionais', 'resumo_profissional'), ('informacoes_profissionais', 'conhecimentos'), ('cv_pt',), ('cv_en',)]
+TEXTO_CANDIDATO_VAZIO = ' '.join([''] * len(COLUNAS_TEXTO_CANDIDATO))
+_ESQUEMA_BASE_TEXTOS = pa.schema([('codigo_candidato', pa.string()), ('nome_candidato', pa.string()), ('candidato_texto_completo', pa.string())])
+_LINHAS_POR_GRUPO = 5000
+
+def _valor_aninhado(dados, caminho):
+    for chave in caminho:
+        if not isinstance(dados, dict): return None
+        dados = dados.get(chave)
+    return dados
+
+def montar_texto_candidato(candidato: dict):
+    """Concatena os campos de texto do candidato como o `json_normalize` + `agg(' '.join)` fazia."""
+    partes = []
+    for caminho in COLUNAS_TEXTO_CANDIDATO:
+        valor = _valor_aninhado(candidato, caminho)
+        partes.append('' if valor is None or isinstance(valor, dict) else str(valor))
+    return ' '.join(partes)
+
+def _intervalos_de_linhas(caminho, partes):
+    """Divide o arquivo em até `partes` intervalos de bytes, sempre alinhados ao início de uma linha."""
+    tamanho = os.path.getsize(caminho)
+    limites = [0]
+    with open(caminho, 'rb') as f:
+        for i in range(1, partes):
+            f.seek(max(tamanho * i // partes, limites[-1]))
+            f.readline()  # avança até o início da próxima linha
+            limites.append(min(f.tell(), tamanho))
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+def _extrair_textos_intervalo(caminho_ndjson, inicio, fim):
+    """Lê as linhas que começam em [inicio, fim) e extrai apenas código, nome e texto completo."""
+    codigos, nomes, textos = [], [], []
+    with open(caminho_ndjson, 'rb') as f:
+        f.seek(inicio)
+        while f.tell() < fim:
+            linha = f.readline()
+            if not linha: break
+            try:
+                candidato = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            codigos.append(str(candidato.get('codigo_candidato')))
+            nomes.append(_valor_aninhado(candidato, ('informacoes_pessoais', 'dados_pessoais', 'nome_completo')))
+            textos.append(montar_texto_candidato(candidato))
+    return codigos, nomes, textos
+
+def construir_base_textos(caminho_ndjson=NDJSON_FILENAME, caminho_destino=BASE_TEXTOS_FILENAME, workers=1):
+    """
+    Gera o arquivo Parquet com código, nome e texto completo de cada candidato, em grupos de linhas.
+    Com `workers` > 1 (ou None, para usar todos os núcleos), o NDJSON é dividido em intervalos de
+    bytes processados em paralelo; a ordem das linhas do arquivo é preservada.
+    """
+    stat = os.stat(caminho_ndjson)
+    esquema = _ESQUEMA_BASE_TEXTOS.with_metadata({'origem_tamanho': str(stat.st_size), 'origem_mtime_ns': str(stat.st_mtime_ns)})
+    caminho_tmp = Path(f"{caminho_destino}.tmp")
+    workers = workers or os.cpu_count() or 1
+    intervalos = _intervalos_de_linhas(caminho_ndjson, workers * 4)
+
+    def gravar(writer, codigos, nomes, textos):
+        for i in range(0, len(codigos), _LINHAS_POR_GRUPO):
+            fatia = slice(i, i + _LINHAS_POR_GRUPO)
+            writer.write_table(pa.table({'codigo_candidato': codigos[fatia], 'nome_candidato': nomes[fatia], 'candidato_texto_completo': textos[fatia]}, schema=esquema))
+
+    try:
+        with pq.ParquetWriter(caminho_tmp, esquema) as writer:
+            if workers > 1 and len(intervalos) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for resultado in executor.map(_extrair_textos_intervalo, repeat(str(caminho_ndjson)), *zip(*intervalos)):
+                        gravar(writer, *resultado)
+            else:
+                for inicio, fim in intervalos:
+                    gravar(writer, *_extrair_textos_intervalo(caminho_ndjson, inicio, fim))
+        os.replace(caminho_tmp, caminho_destino)
+    except BaseException:
+        caminho_tmp.unlink(missing_ok=True)
+        raise
+
+def base_textos_valida(caminho_ndjson=NDJSON_FILENAME, caminho_base=BASE_TEXTOS_FILENAME):
+    """Verifica se a base de textos existe e foi gerada a partir da versão atual do NDJSON."""
+    if not os.path.exists(caminho_base) or not os.path.exists(caminho_ndjson): return False
+    try:
+        metadados = pq.read_schema(caminho_base).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    stat = os.stat(caminho_ndjson)
+    return (metadados.get(b'origem_tamanho'), metadados.get(b'origem_mtime_ns')) == (str(stat.st_size).encode(), str(stat.st_mtime_ns).encode())
+
+@functools.lru_cache(maxsize=4)
+def _carregar_codigos_base_textos(caminho_base, assinatura):
+    """Lê só a coluna de códigos e os limites dos grupos de linhas; `assinatura` invalida o cache quando o arquivo muda."""
+    arquivo = pq.ParquetFile(caminho_base)
+    codigos = arquivo.read(columns=['codigo_candidato']).column(0).to_pandas()
+    inicios_grupos = [0]
+    for i in range(arquivo.num_row_groups): inicios_grupos.append(inicios_grupos[-1] + arquivo.metadata.row_group(i).num_rows)
+    return codigos, inicios_grupos
+
+def buscar_textos_candidatos(ids_necessarios: list, colunas=('codigo_candidato', 'nome_candidato', 'candidato_texto_completo'), caminho_base=BASE_TEXTOS_FILENAME):
+    """Carrega da base colunar apenas as colunas pedidas e os grupos de linhas que contêm os IDs necessários."""
+    if not os.path.exists(caminho_base): return pd.DataFrame()
+    stat = os.stat(caminho_base)
+    with instrumentacao.etapa('base_textos.localizar', ids=len(ids_necessarios)):
+        codigos, inicios_grupos = _carregar_codigos_base_textos(str(caminho_base), (stat.st_size, stat.st_mtime_ns))
+        ids_necessarios = [str(i) for i in ids_necessarios]
+        posicoes = codigos.index[codigos.isin(ids_necessarios)]
+    if len(posicoes) == 0: return pd.DataFrame()
+
+    grupos = sorted({bisect.bisect_right(inicios_grupos, p) - 1 for p in posicoes})
+    colunas = list(dict.fromkeys(['codigo_candidato', *colunas]))
+    with instrumentacao.etapa('base_textos.leitura', grupos=len(grupos)):
+        tabela = pq.ParquetFile(caminho_base).read_row_groups(grupos, columns=colunas)
+        df = tabela.to_pandas()
+    return df[df['codigo_candidato'].isin(ids_necessarios)].reset_index(drop=True)
+
+# --- RANKINGS PRÉ-CALCULADOS ---
+def versao_arquivo(caminho):
+    """Hash curto do conteúdo de um arquivo (usado como versão do modelo)."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''): sha.update(bloco)
+    return sha.hexdigest()[:16]
+
+def assinatura_dados_ranking():
+    """Assinatura (tamanho e modificação) dos arquivos que determinam o ranking de cada vaga."""
+    partes = []
+    for caminho in (VAGAS_FILENAME, PROSPECTS_FILENAME, BASE_TEXTOS_FILENAME):
+        if os.path.exists(caminho):
+            stat = os.stat(caminho)
+            partes.append(f"{Path(caminho).name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()[:16]
+
+def caminho_rankings(versao_modelo):
+    return RANKINGS_DIR / f"{versao_modelo}.parquet"
+
+def buscar_ranking_precomputado(codigo_vaga, versao_modelo, top_n=20):
+    """
+    Retorna os `top_n` candidatos pré-calculados da vaga para a versão do modelo, ou None
+    se a tabela não existir ou tiver sido gerada com dados diferentes dos atuais.
+    """
+    caminho = caminho_rankings(versao_modelo)
+    if not os.path.exists(caminho): return None
+    try:
+        metadados = pq.read_schema(caminho).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if metadados.get(b'assinatura_dados') != assinatura_dados_ranking().encode('utf-8'): return None
+    with instrumentacao.etapa('ranking_precomputado.leitura'):
+        df = pd.read_parquet(caminho, filters=[('codigo_vaga', '==', str(codigo_vaga)), ('posicao', '<=', top_n)])
+    return df.sort_values('posicao').reset_index(drop=True)
+
+# --- CACHE DE RANKINGS COMPARTILHADO ENTRE SESSÕES ---
+CACHE_RANKINGS_MAX_ENTRADAS = int(os.environ.get('CACHE_RANKINGS_MAX_ENTRADAS', 512))
+CACHE_RANKINGS_MAX_MB = float(os.environ.get('CACHE_RANKINGS_MAX_MB', 64))
+TIPOS_REGISTRO_RANKING = {'codigo_candidato': object, 'nome_candidato': object, 'score': np.int8, 'probabilidade': np.float64, 'posicao': np.int16}
+
+def registros_ranking(df_ranking):
+    """
+    Registros enxutos e tipados de um ranking: ID, nome, score, probabilidade e posição. Os textos não são
+    guardados; o próprio `codigo_candidato` é a referência para lê-los sob demanda da base colunar.
+    Levanta ValueError se faltar o código ou se não houver nem `score` nem `probabilidade`.
+    """
+    if df_ranking is None or df_ranking.empty:
+        return pd.DataFrame({coluna: pd.Series(dtype=tipo) for coluna, tipo in TIPOS_REGISTRO_RANKING.items()})
+    if 'codigo_candidato' not in df_ranking or not {'score', 'probabilidade'} & set(df_ranking.columns):
+        raise ValueError(f"O ranking precisa de 'codigo_candidato' e de 'score' ou 'probabilidade'; colunas recebidas: {list(df_ranking.columns)}")
+    df = df_ranking[[c for c in TIPOS_REGISTRO_RANKING if c in df_ranking]].reset_index(drop=True)
+    df['codigo_candidato'] = df['codigo_candidato'].astype(str)
+    if 'nome_candidato' not in df:
+        df_nomes = buscar_textos_candidatos(df['codigo_candidato'].tolist(), colunas=('codigo_candidato', 'nome_candidato'))
+        nomes = df_nomes.drop_duplicates('codigo_candidato').set_index('codigo_candidato')['nome_candidato'] if not df_nomes.empty else pd.Series(dtype=object)
+        df['nome_candidato'] = df['codigo_candidato'].map(nomes)
+    df['nome_candidato'] = df['nome_candidato'].fillna('N/A').astype(str)
+    if 'probabilidade' not in df: df['probabilidade'] = df['score'] / 100
+    if 'score' not in df: df['score'] = df['probabilidade'] * 100
+    if 'posicao' not in df: df['posicao'] = np.arange(1, len(df) + 1)
+    return df[list(TIPOS_REGISTRO_RANKING)].astype(TIPOS_REGISTRO_RANKING)
+
+class CacheRankings:
+    """
+    Rankings compartilhados por todas as sessões do processo, com despejo LRU por número de entradas e por
+    memória. Sessões que pedem a mesma chave ao mesmo tempo esperam uma única computação. Os DataFrames
+    guardados são compartilhados (não copiados): quem os recebe não deve modificá-los.
+    """
+
+    def __init__(self, max_entradas=CACHE_RANKINGS_MAX_ENTRADAS, max_bytes=int(CACHE_RANKINGS_MAX_MB * 1024 * 1024)):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # chave -> (valor, bytes), da menos para a mais recente
+        self._em_calculo = {}  # chave -> Event sinalizado ao fim da computação
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.acertos = self.faltas = self.despejos = 0
+
+    def obter(self, chave, calcular):
+        """Valor da chave; na falta, `calcular()` é executado uma única vez, mesmo com várias sessões esperando."""
+        while True:
+            with self._lock:
+                if chave in self._entradas:
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return self._entradas[chave][0]
+                evento = self._em_calculo.get(chave)
+                if evento is None:
+                    self._em_calculo[chave] = threading.Event()
+                    self.faltas += 1
+                    break
+            # Outra sessão está calculando: espera e tenta de novo (se ela falhar, esta calcula)
+            evento.wait()
+        try:
+            valor = calcular()
+            self._guardar(chave, valor)
+            return valor
+        finally:
+            with self._lock: self._em_calculo.pop(chave).set()
+
+    def _guardar(self, chave, valor):
+        tamanho = int(valor.memory_usage(index=True, deep=True).sum())
+        if tamanho > self.max_bytes: return
+        with self._lock:
+            self._entradas[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self.bytes > self.max_bytes:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self.bytes -= liberado
+                self.despejos += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            return {'entradas': len(self._entradas), 'max_entradas': self.max_entradas, 'memoria_mb': round(self.bytes / 1024 / 1024, 3),
+                    'max_memoria_mb': round(self.max_bytes / 1024 / 1024, 3), 'acertos': self.acertos, 'faltas': self.faltas, 'despejos': self.despejos}
+
+CACHE_RANKINGS = CacheRankings()
+
+# --- PONTUAÇÃO CANDIDATO -> VAGAS ---
+def ranking_vagas_para_candidatos(matriz_vagas, codigos_candidatos, df_vagas, top_n=20):
+    """
+    Pontua um ou mais candidatos contra todas as vagas de `matriz_vagas` (`motor_pontuacao.MatrizVagas`) em uma
+    única operação esparsa e retorna as `top_n` melhores vagas de cada candidato. Os textos só são lidos da base
+    colunar para candidatos fora do cache de contagens; códigos inexistentes são ignorados.
+    """
+    codigos = list(dict.fromkeys(str(c) for c in codigos_candidatos))
+    df_candidatos = pd.DataFrame({'codigo_candidato': codigos})
+    fora_do_cache = [c for c, em_cache in zip(codigos, matriz_vagas.motor.em_cache(codigos)) if not em_cache]
+    if fora_do_cache:
+        df_textos = buscar_textos_candidatos(fora_do_cache, colunas=('codigo_candidato', 'candidato_texto_completo'))
+        encontrados = set(df_textos['codigo_candidato']) if not df_textos.empty else set()
+        df_candidatos = df_candidatos[~df_candidatos['codigo_candidato'].isin(set(fora_do_cache) - encontrados)].reset_index(drop=True)
+        if not df_textos.empty: df_candidatos = df_candidatos.merge(df_textos.drop_duplicates('codigo_candidato'), on='codigo_candidato', how='left')
+    colunas = ['codigo_candidato', 'codigo_vaga', 'titulo_vaga', 'cliente', 'probabilidade', 'score', 'posicao']
+    if df_candidatos.empty: return pd.DataFrame(columns=colunas)
+
+    with instrumentacao.etapa('vagas_candidato.predict_proba', candidatos=len(df_candidatos), vagas=len(matriz_vagas.codigos_vagas)):
+        probabilidades = matriz_vagas.predict_proba(df_candidatos)
+    top_n = min(top_n, probabilidades.shape[1])
+    melhores = np.argsort(-probabilidades, axis=1, kind='stable')[:, :top_n]
+    selecionadas = np.take_along_axis(probabilidades, melhores, axis=1)
+    df = pd.DataFrame({'codigo_candidato': np.repeat(df_candidatos['codigo_candidato'].to_numpy(), top_n),
+                       'codigo_vaga': matriz_vagas.codigos_vagas[melhores.ravel()], 'probabilidade': selecionadas.ravel()})
+    df['score'] = (df['probabilidade'] * 100).astype(int)
+    df['posicao'] = np.tile(np.arange(1, top_n + 1, dtype=np.int32), len(df_candidatos))
+    df = df.merge(df_vagas[['codigo_vaga', 'titulo_vaga', 'cliente']].astype({'codigo_vaga': str}), on='codigo_vaga', how='left')
+    return df[colunas]
@@ -0,0 +1,105 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+
+@dataclass
+class Atribuicoes:
+    """Contribuições por feature de um lote de candidatos, no formato esperado pelo waterfall do SHAP."""
+    values: np.ndarray
+    base_values: float
+    data: np.ndarray
+    feature_names: list
+
+    def explanation(self, i):
+        """Converte a linha `i` em um `shap.Explanation` (o SHAP só é importado aqui, para o gráfico)."""
+        import shap
+        return shap.Explanation(values=self.values[i], base_values=self.base_values, data=self.data[i], feature_names=self.feature_names)
+
+
+class ExplicadorLinear:
+    """
+    Atribuições exatas de um modelo linear sobre features independentes.
+
+    Para a LogisticRegression, o valor SHAP (no espaço de log-odds) da feature j é
+    `coef_j * (x_j - media_j)`, e o valor base é `intercepto + coef · medias`.
+    Basta guardar os coeficientes e as médias do conjunto de fundo, sem os dados em si.
+    """
+
+    def __init__(self, coef, intercepto, medias, feature_names, versao_modelo=''):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercepto = float(intercepto)
+        self.medias = np.asarray(medias, dtype=np.float64).ravel()
+        self.feature_names = list(feature_names)
+        self.versao_modelo = versao_modelo
+        self.valor_base = self.intercepto + float(self.coef @ self.medias)
+        self._ordem_ausentes = None
+
+    @classmethod
+    def de_pipeline(cls, pipeline, X_fundo, versao_modelo=''):
+        """Cria o explicador a partir do pipeline treinado e dos dados de fundo já transformados."""
+        clf = pipeline.named_steps['clf']
+        medias = np.asarray(X_fundo.mean(axis=0)).ravel()
+        nomes = pipeline.named_steps['preprocessor'].get_feature_names_out()
+        return cls(clf.coef_, clf.intercept_[0], medias, nomes, versao_modelo)
+
+    def explicar(self, X, linhas=None, colunas=None):
+        """
+        Calcula as contribuições das `linhas` e `colunas` selecionadas de `X` (esparsa ou densa; todas por
+        padrão) em uma única operação. Só a seleção é densificada.
+        """
+        if linhas is not None: X = X[np.atleast_1d(linhas)]
+        if colunas is None:
+            colunas = slice(None)
+        else:
+            colunas = np.atleast_1d(colunas)
+            X = X[:, colunas]
+        dados = X.toarray() if sp.issparse(X) else np.array(X, dtype=np.float64)
+        valores = (dados - self.medias[colunas]) * self.coef[colunas]
+        return Atribuicoes(valores, self.valor_base, dados, np.asarray(self.feature_names, dtype=object)[colunas].tolist())
+
+    def maiores_contribuicoes(self, X, quantidade):
+        """
+        As `quantidade` maiores contribuições absolutas de cada linha de `X` (CSR) como `[(coluna, valor), ...]`,
+        sem densificar `X`: nas features ausentes da linha a contribuição é a constante `-coef * media`.
+        """
+        X = sp.csr_matrix(X)
+        if self._ordem_ausentes is None:
+            ausentes = -self.coef * self.medias
+            self._ordem_ausentes = np.argsort(-np.abs(ausentes), kind='stable')
+            self._ausentes = ausentes
+        resultado = []
+        for i in range(X.shape[0]):
+            presentes = X.indices[X.indptr[i]:X.indptr[i + 1]]
+            candidatas = self._ordem_ausentes[:quantidade + len(presentes)]
+            candidatas = candidatas[~np.isin(candidatas, presentes)][:quantidade]
+            colunas = np.concatenate([presentes, candidatas])
+            valores = np.concatenate([self.coef[presentes] * (X.data[X.indptr[i]:X.indptr[i + 1]] - self.medias[presentes]), self._ausentes[candidatas]])
+            maiores = np.argsort(-np.abs(valores), kind='stable')[:quantidade]
+            resultado.append([(int(colunas[j]), float(valores[j])) for j in maiores if valores[j] != 0])
+        return resultado
+
+    def salvar(self, caminho):
+        caminho_tmp = Path(f"{caminho}.tmp.npz")
+        np.savez(caminho_tmp, coef=self.coef, intercepto=np.array(self.intercepto), medias=self.medias,
+                 feature_names=np.array(self.feature_names, dtype=str), versao_modelo=np.array(self.versao_modelo))
+        os.replace(caminho_tmp, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho) as arquivo:
+            return cls(arquivo['coef'], arquivo['intercepto'], arquivo['medias'], arquivo['feature_names'].tolist(), str(arquivo['versao_modelo']))
+
+
+def verificar_paridade_shap(explicador, clf, X_fundo, X):
+    """Maior diferença absoluta entre o explicador e o `shap.LinearExplainer` com o mesmo conjunto de fundo."""
+    import shap
+    masker = shap.maskers.Independent(X_fundo, max_samples=X_fundo.shape[0])
+    referencia = shap.LinearExplainer(clf, masker)(X)
+    obtido = explicador.explicar(X)
+    diferenca_valores = np.max(np.abs(np.asarray(referencia.values) - obtido.values))
+    diferenca_base = np.max(np.abs(np.asarray(referencia.base_values) - obtido.base_values))
+    return float(max(diferenca_valores, diferenca_base))
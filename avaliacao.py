@@ -0,0 +1,31 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+
+
+def precisao_em_k_por_vaga(codigos_vaga, y_true, scores, k=20):
+    """Precisão@k média entre as vagas que têm ao menos um positivo no conjunto avaliado."""
+    df = pd.DataFrame({'codigo_vaga': np.asarray(codigos_vaga), 'y': np.asarray(y_true), 'score': np.asarray(scores)})
+    df = df.sort_values(['codigo_vaga', 'score'], ascending=[True, False], kind='mergesort')
+    df = df[df.groupby('codigo_vaga')['y'].transform('max') > 0]
+    if df.empty: return float('nan'), 0
+    top_k = df.groupby('codigo_vaga', sort=False).head(k)
+    precisoes = top_k.groupby('codigo_vaga')['y'].mean()
+    return float(precisoes.mean()), int(len(precisoes))
+
+
+def avaliar_holdout(pipeline, X_test, y_test, codigos_vaga, k=20):
+    """AUC, precisão@k por vaga e latência de predição do pipeline no conjunto de teste."""
+    inicio = time.perf_counter()
+    scores = pipeline.predict_proba(X_test)[:, 1]
+    tempo_predicao = time.perf_counter() - inicio
+    precisao, total_vagas = precisao_em_k_por_vaga(codigos_vaga, y_test, scores, k)
+    return {
+        'auc': float(roc_auc_score(y_test, scores)) if len(set(y_test)) > 1 else float('nan'),
+        f'precisao_em_{k}_por_vaga': precisao,
+        'vagas_avaliadas': total_vagas,
+        'amostras': int(len(y_test)),
+        'tempo_predicao_ms_por_1000': 1000 * tempo_predicao / max(len(y_test), 1) * 1000,
+    }
@@ -0,0 +1,269 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Os módulos do projeto usam caminhos relativos (./data); o benchmark roda dentro do diretório de trabalho.
+RAIZ_PROJETO = Path(__file__).resolve().parent
+if str(RAIZ_PROJETO) not in sys.path: sys.path.insert(0, str(RAIZ_PROJETO))
+import instrumentacao
+
+SITUACOES = ['Contratado pela Decision', 'Encaminhado ao Requisitante', 'Não Aprovado pelo Cliente', 'Prospect', 'Desistiu',
+             'Documentação PJ', 'Não Aprovado pelo RH', 'Inscrito', 'Em avaliação pelo RH', 'Entrevista Técnica',
+             'Contratado como Hunting', 'Aprovado', 'Entrevista com Cliente', 'Documentação CLT', 'Sem interesse nesta vaga']
+TERMOS = ("python java sql aws docker kubernetes sap abap fiori hana react angular node spark hadoop linux oracle excel power bi "
+          "ingles espanhol gestao projetos scrum agile dados analise negocio suporte redes seguranca cloud azure devops testes "
+          "qualidade financeiro contabil vendas infraestrutura servicenow salesforce mainframe cobol delphi php golang kafka").split()
+PALAVRAS = ("experiencia atuacao desenvolvimento implantacao sistemas empresa cliente equipe responsavel pela area com em de "
+            "para do da na no e o a os as uma um como atividades conhecimento avancado intermediario basico").split()
+NIVEIS = ['Júnior', 'Pleno', 'Sênior', 'Especialista', 'Analista']
+
+
+# --- GERADOR DE DADOS SINTÉTICOS (mesmo esquema aninhado do dataset do Hugging Face) ---
+def _paragrafos(aleatorio, quantidade=4000):
+    """Conjunto fixo de parágrafos combinados para montar os CVs sem sortear palavra por palavra."""
+    paragrafos = []
+    for _ in range(quantidade):
+        palavras = aleatorio.choices(PALAVRAS, k=aleatorio.randint(15, 45)) + aleatorio.choices(TERMOS, k=aleatorio.randint(3, 12))
+        aleatorio.shuffle(palavras)
+        paragrafos.append(' '.join(palavras).capitalize() + '.')
+    return paragrafos
+
+
+def _data(aleatorio):
+    return f"{aleatorio.randint(1, 28):02d}-{aleatorio.randint(1, 12):02d}-{aleatorio.choice([2019, 2020, 2021])}"
+
+
+def _candidato(aleatorio, codigo, paragrafos):
+    nome = f"Candidato {codigo}"
+    return {
+        'infos_basicas': {'codigo_profissional': codigo, 'nome': nome, 'email': f"{codigo}@exemplo.com", 'local': 'São Paulo',
+                          'objetivo_profissional': ' '.join(aleatorio.choices(TERMOS, k=3)), 'data_criacao': _data(aleatorio)},
+        'informacoes_pessoais': {'dados_pessoais': {'nome_completo': nome, 'data_nascimento': _data(aleatorio)}},
+        'informacoes_profissionais': {'titulo_profissional': f"Analista {aleatorio.choice(TERMOS)}",
+                                      'resumo_profissional': ' '.join(aleatorio.choices(paragrafos, k=aleatorio.randint(0, 2))),
+                                      'conhecimentos': ', '.join(aleatorio.sample(TERMOS, k=aleatorio.randint(2, 8))),
+                                      'nivel_profissional': aleatorio.choice(NIVEIS)},
+        'formacao_e_idiomas': {'nivel_academico': 'Ensino Superior Completo', 'nivel_ingles': aleatorio.choice(['Básico', 'Intermediário', 'Avançado'])},
+        'cv_pt': '\n'.join(aleatorio.choices(paragrafos, k=aleatorio.randint(2, 25))),
+        'cv_en': '\n'.join(aleatorio.choices(paragrafos, k=aleatorio.randint(0, 8))) if aleatorio.random() < 0.4 else '',
+    }
+
+
+def _vaga(aleatorio, indice):
+    return {
+        'informacoes_basicas': {'titulo_vaga': f"Consultor {aleatorio.choice(TERMOS).upper()} {aleatorio.choice(NIVEIS)}",
+                                'cliente': f"Cliente {indice % 500}", 'data_requicisao': _data(aleatorio), 'tipo_contratacao': 'CLT Full'},
+        'perfil_vaga': {'estado': 'São Paulo', 'nivel profissional': aleatorio.choice(NIVEIS), 'nivel_ingles': aleatorio.choice(['Nenhum', 'Técnico', 'Fluente']),
+                        'areas_atuacao': 'TI - Desenvolvimento/Programação',
+                        'principais_atividades': ' '.join(aleatorio.choices(PALAVRAS + TERMOS, k=aleatorio.randint(30, 120))),
+                        'competencia_tecnicas_e_comportamentais': ' '.join(aleatorio.choices(TERMOS, k=aleatorio.randint(5, 25)))},
+        'beneficios': {'valor_venda': '-', 'valor_compra_1': 'hora'},
+    }
+
+
+def gerar_dados(diretorio, candidatos=10_000, vagas=None, prospects_por_vaga=4.0, semente=42):
+    """
+    Grava `data/applicants.raw.json`, `data/vagas.json` e `data/prospects.json` em `diretorio`.
+    Por padrão, a proporção segue o dataset real: ~1 vaga para cada 3 candidatos e poucas vagas com muitos prospects.
+    Os candidatos são escritos um a um, sem montar o JSON inteiro em memória.
+    """
+    aleatorio = random.Random(semente)
+    pasta = Path(diretorio) / 'data'
+    pasta.mkdir(parents=True, exist_ok=True)
+    vagas = vagas or max(candidatos // 3, 1)
+    paragrafos = _paragrafos(aleatorio)
+    codigos = [str(100_000 + i) for i in range(candidatos)]
+
+    with open(pasta / 'applicants.raw.json', 'w', encoding='utf-8') as f:
+        f.write('{')
+        for i, codigo in enumerate(codigos):
+            if i: f.write(',\n')
+            f.write(f"{json.dumps(codigo)}: {json.dumps(_candidato(aleatorio, codigo, paragrafos), ensure_ascii=False)}")
+        f.write('}')
+
+    dados_vagas, dados_prospects = {}, {}
+    for i in range(vagas):
+        codigo_vaga = str(1000 + i)
+        dados_vagas[codigo_vaga] = _vaga(aleatorio, i)
+        # Distribuição de cauda longa: a maioria das vagas tem poucos prospects, algumas têm centenas.
+        total = min(int(aleatorio.expovariate(1 / prospects_por_vaga)) if i else 500, candidatos)
+        dados_prospects[codigo_vaga] = {'titulo': dados_vagas[codigo_vaga]['informacoes_basicas']['titulo_vaga'], 'modalidade': '',
+                                        'prospects': [{'nome': f"Candidato {c}", 'codigo': c, 'situacao_candidado': aleatorio.choice(SITUACOES),
+                                                       'data_candidatura': _data(aleatorio), 'ultima_atualizacao': _data(aleatorio), 'comentario': '', 'recrutador': 'Recrutador'}
+                                                      for c in aleatorio.sample(codigos, total)]}
+    with open(pasta / 'vagas.json', 'w', encoding='utf-8') as f: json.dump(dados_vagas, f, ensure_ascii=False)
+    with open(pasta / 'prospects.json', 'w', encoding='utf-8') as f: json.dump(dados_prospects, f, ensure_ascii=False)
+    return {'candidatos': candidatos, 'vagas': vagas, 'prospects': sum(len(p['prospects']) for p in dados_prospects.values()),
+            'tamanho_applicants_mb': (pasta / 'applicants.raw.json').stat().st_size / 2**20}
+
+
+# --- MEDIÇÃO ---
+class _MedidorMemoria:
+    """Pico de memória residente do processo durante um bloco, amostrado em uma thread (Linux: /proc/self/statm)."""
+
+    def __init__(self, intervalo_s=0.005):
+        self.intervalo_s = intervalo_s
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            self.pico = max(self.pico, instrumentacao.rss_bytes())
+
+    def __enter__(self):
+        self.inicio = self.pico = instrumentacao.rss_bytes()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, instrumentacao.rss_bytes())
+
+
+def _medir(resultados, nome, funcao, repeticoes=1, **extras):
+    """Executa `funcao` `repeticoes` vezes, registra a mediana do tempo e o pico de memória, e devolve o último retorno."""
+    tempos = []
+    with _MedidorMemoria() as memoria, contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            retorno = funcao()
+            tempos.append(time.perf_counter() - inicio)
+    resultados[nome] = {'segundos': statistics.median(tempos), 'min_s': min(tempos), 'repeticoes': repeticoes,
+                        'pico_rss_mb': memoria.pico / 2**20, 'delta_rss_mb': (memoria.pico - memoria.inicio) / 2**20, **extras}
+    print(f"  {nome:<32} {resultados[nome]['segundos'] * 1000:>10.1f} ms  {resultados[nome]['delta_rss_mb']:>8.1f} MB")
+    return retorno
+
+
+def executar(diretorio, candidatos=10_000, vagas=None, repeticoes=5, workers=None, semente=42, gerar=True):
+    """Gera (opcionalmente) os dados em `diretorio` e mede os caminhos críticos; retorna o dicionário de resultados."""
+    diretorio = Path(diretorio).resolve()
+    info_dados = gerar_dados(diretorio, candidatos, vagas, semente=semente) if gerar else {'candidatos': candidatos}
+    os.chdir(diretorio)
+
+    import numpy as np
+    import pandas as pd
+    import sklearn
+    import armazenamento
+    import dados_treino
+    import train
+    from atribuicao import ExplicadorLinear
+    from motor_pontuacao import MotorPontuacao
+
+    r = {}
+    print(f"Benchmark com {candidatos} candidatos em '{diretorio}':")
+    # Preparação dos dados (etapas de utils.preparar_dados_candidatos, sem o download)
+    _medir(r, 'conversao_ndjson', lambda: armazenamento.converter_json_para_ndjson(armazenamento.RAW_APPLICANTS_FILENAME, armazenamento.NDJSON_FILENAME))
+    _medir(r, 'indice_ndjson', armazenamento.construir_indice_ndjson)
+    _medir(r, 'base_textos_sequencial', lambda: armazenamento.construir_base_textos(workers=1))
+    _medir(r, 'base_textos_paralela', lambda: armazenamento.construir_base_textos(workers=workers), workers=workers or os.cpu_count())
+
+    # Consultas por ID (mesmo tamanho de lote que o app usa para uma vaga)
+    aleatorio = random.Random(semente)
+    prospects = armazenamento.carregar_json(armazenamento.PROSPECTS_FILENAME)
+    vagas_data = armazenamento.carregar_json(armazenamento.VAGAS_FILENAME)
+    codigo_vaga = max(prospects, key=lambda v: len(prospects[v]['prospects']))
+    ids_vaga = [str(p['codigo']) for p in prospects[codigo_vaga]['prospects']]
+    ids_aleatorios = aleatorio.sample([str(100_000 + i) for i in range(candidatos)], min(100, candidatos))
+    _medir(r, 'buscar_detalhes_candidatos_100', lambda: armazenamento.buscar_detalhes_candidatos_por_id(ids_aleatorios), repeticoes)
+    _medir(r, 'buscar_textos_candidatos_100', lambda: armazenamento.buscar_textos_candidatos(ids_aleatorios), repeticoes)
+
+    # Etapas do treino
+    df_applicants = _medir(r, 'treino_carregar_candidatos', lambda: dados_treino.carregar_candidatos(workers=workers))
+    df_treino = _medir(r, 'treino_montar_df', lambda: dados_treino.montar_df_treino(vagas_data, prospects, df_applicants))
+    r['treino_montar_df']['pares'] = len(df_treino)
+    X_train, X_test, y_train, y_test, vagas_test = train.dividir_treino_teste(df_treino)
+    pipeline, _ = _medir(r, 'treino_fit', lambda: train.etapa_2_treinar(X_train, y_train))
+    preprocessor = pipeline.named_steps['preprocessor']
+    X_train_transformado = preprocessor.transform(X_train)
+    explicador = _medir(r, 'treino_explicador', lambda: ExplicadorLinear.de_pipeline(pipeline, X_train_transformado))
+
+    # Ranking de uma vaga (a com mais prospects), como no botão "Analisar Candidatos"
+    texto_vaga = armazenamento.carregar_vagas().set_index('codigo_vaga').loc[codigo_vaga, 'perfil_vaga_texto']
+    df_candidatos = armazenamento.buscar_textos_candidatos(ids_vaga)
+    X_vaga = pd.DataFrame({'texto_completo': texto_vaga + ' ' + df_candidatos['candidato_texto_completo']})
+    probs = _medir(r, 'ranking_predict_proba', lambda: pipeline.predict_proba(X_vaga)[:, 1], repeticoes, prospects=len(ids_vaga))
+    motor = MotorPontuacao(pipeline)
+    _medir(r, 'ranking_motor_cache', motor.construir_cache)
+    probs_motor = _medir(r, 'ranking_motor', lambda: motor.predict_proba_vaga(texto_vaga, df_candidatos), repeticoes, prospects=len(ids_vaga))
+    r['ranking_motor']['maior_diferenca'] = float(np.max(np.abs(probs - probs_motor))) if len(probs) else 0.0
+
+    # Explicação das contribuições dos 20 melhores (aba de matching)
+    top = X_vaga.iloc[np.argsort(-probs)[:20]]
+    _medir(r, 'explicacao_top20', lambda: explicador.explicar(preprocessor.transform(top)), repeticoes)
+
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        'parametros': {'candidatos': candidatos, 'vagas': vagas, 'repeticoes': repeticoes, 'workers': workers, 'semente': semente},
+        'dados': info_dados,
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(), 'cpus': os.cpu_count(),
+                     'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__},
+        'pico_rss_processo_mb': max(v['pico_rss_mb'] for v in r.values()),
+        'pico_rss_filhos_mb': filhos / 2**20 if sys.platform == 'darwin' else filhos / 1024,
+        'resultados': r,
+    }
+
+
+# --- COMPARAÇÃO ENTRE EXECUÇÕES ---
+def comparar(base, novo, tolerancia=0.10, tolerancia_memoria=0.25, minimo_s=0.005, minimo_mb=32.0):
+    """
+    Compara tempo e memória de cada etapa presente nas duas execuções. Uma regressão é um aumento
+    acima da tolerância relativa e acima do mínimo absoluto, para ignorar o ruído de etapas rápidas
+    e do alocador (o RSS amostrado varia alguns MB entre execuções idênticas).
+    """
+    linhas, regressoes = [], []
+    for nome in base['resultados'].keys() & novo['resultados'].keys():
+        a, b = base['resultados'][nome], novo['resultados'][nome]
+        razao_tempo = b['segundos'] / a['segundos'] if a['segundos'] else float('inf')
+        razao_memoria = (b['delta_rss_mb'] + 1) / (a['delta_rss_mb'] + 1)
+        regressao_tempo = razao_tempo > 1 + tolerancia and b['segundos'] - a['segundos'] > minimo_s
+        regressao_memoria = razao_memoria > 1 + tolerancia_memoria and b['delta_rss_mb'] - a['delta_rss_mb'] > minimo_mb
+        linhas.append((nome, a['segundos'], b['segundos'], razao_tempo, a['delta_rss_mb'], b['delta_rss_mb'], regressao_tempo or regressao_memoria))
+        if regressao_tempo: regressoes.append(f"{nome}: tempo {a['segundos'] * 1000:.1f} -> {b['segundos'] * 1000:.1f} ms ({razao_tempo:.2f}x)")
+        if regressao_memoria: regressoes.append(f"{nome}: memória {a['delta_rss_mb']:.1f} -> {b['delta_rss_mb']:.1f} MB")
+    return sorted(linhas), regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos críticos com dados sintéticos.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    p_executar = subcomandos.add_parser('executar', help="Gera os dados sintéticos e mede as etapas.")
+    p_executar.add_argument('--candidatos', type=int, default=10_000, help="Número de candidatos (ex.: 10000 a 1000000).")
+    p_executar.add_argument('--vagas', type=int, default=None, help="Número de vagas (padrão: candidatos / 3).")
+    p_executar.add_argument('--repeticoes', type=int, default=5, help="Repetições das etapas rápidas (vale a mediana).")
+    p_executar.add_argument('--workers', type=int, default=None, help="Processos nas etapas paralelas (padrão: número de CPUs).")
+    p_executar.add_argument('--diretorio', default='benchmark_dados', help="Diretório de trabalho com os dados gerados.")
+    p_executar.add_argument('--reutilizar-dados', action='store_true', help="Não gera os dados de novo se já existirem no diretório.")
+    p_executar.add_argument('--saida', default=None, help="Arquivo JSON de resultados (padrão: benchmark_<candidatos>.json).")
+    p_comparar = subcomandos.add_parser('comparar', help="Compara dois arquivos de resultados e aponta regressões.")
+    p_comparar.add_argument('base')
+    p_comparar.add_argument('novo')
+    p_comparar.add_argument('--tolerancia', type=float, default=0.10, help="Aumento relativo de tempo tolerado (padrão: 10%%).")
+    p_comparar.add_argument('--tolerancia-memoria', type=float, default=0.25, help="Aumento relativo de memória tolerado (padrão: 25%%).")
+    args = parser.parse_args()
+
+    if args.comando == 'executar':
+        saida = Path(args.saida or f"benchmark_{args.candidatos}.json").resolve()
+        gerar = not (args.reutilizar_dados and (Path(args.diretorio) / 'data' / 'applicants.raw.json').exists())
+        resultado = executar(args.diretorio, args.candidatos, args.vagas, args.repeticoes, args.workers, gerar=gerar)
+        with open(saida, 'w', encoding='utf-8') as f: json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em '{saida}'.")
+    else:
+        with open(args.base, 'r', encoding='utf-8') as f: base = json.load(f)
+        with open(args.novo, 'r', encoding='utf-8') as f: novo = json.load(f)
+        linhas, regressoes = comparar(base, novo, args.tolerancia, args.tolerancia_memoria)
+        print(f"{'etapa':<32} {'base ms':>10} {'novo ms':>10} {'razão':>7} {'base MB':>8} {'novo MB':>8}")
+        for nome, a_s, b_s, razao, a_mb, b_mb, regressao in linhas:
+            print(f"{nome:<32} {a_s * 1000:>10.1f} {b_s * 1000:>10.1f} {razao:>6.2f}x {a_mb:>8.1f} {b_mb:>8.1f}{'  <-- REGRESSÃO' if regressao else ''}")
+        for regressao in regressoes: print(f"REGRESSÃO: {regressao}")
+        sys.exit(1 if regressoes else 0)
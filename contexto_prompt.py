@@ -0,0 +1,115 @@
+import math
+import re
+from functools import lru_cache
+
+CARACTERES_POR_TOKEN = 4  # Aproximação usual de tokens por caracteres (português/inglês)
+ORCAMENTO_PERGUNTA = {'cv': 600, 'resumo_historico': 250, 'historico_recente': 900}
+ORCAMENTO_RELATORIO = {'historico': 3000}
+TOKENS_POR_TURNO_RESUMIDO = 40
+_PALAVRA = re.compile(r"\w{3,}")
+_FIM_DE_FRASE = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def estimar_tokens(texto):
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def truncar(texto, limite_tokens, manter_fim=False):
+    """Corta o texto para caber em `limite_tokens`, mantendo o início (ou o fim)."""
+    limite = limite_tokens * CARACTERES_POR_TOKEN
+    if len(texto) <= limite: return texto
+    return '…' + texto[-limite:] if manter_fim else texto[:limite] + '…'
+
+
+def tamanho_prompt(prompt, **secoes):
+    """Tamanho estimado do prompt completo e de cada seção, para exibição e registro."""
+    return {'total_tokens': estimar_tokens(prompt), 'caracteres': len(prompt), **{f'{nome}_tokens': estimar_tokens(texto) for nome, texto in secoes.items()}}
+
+
+# --- TRECHOS DO CV RELEVANTES PARA A VAGA ---
+def _segmentos(texto, palavras_por_segmento=60):
+    """Divide o texto em frases/linhas e as agrupa em segmentos de até ~`palavras_por_segmento` palavras."""
+    segmentos, atual, tamanho = [], [], 0
+    for frase in (f.strip() for f in _FIM_DE_FRASE.split(texto)):
+        if not frase: continue
+        palavras = len(frase.split())
+        if atual and tamanho + palavras > palavras_por_segmento:
+            segmentos.append(' '.join(atual))
+            atual, tamanho = [], 0
+        atual.append(frase)
+        tamanho += palavras
+    if atual: segmentos.append(' '.join(atual))
+    return segmentos
+
+
+@lru_cache(maxsize=2048)
+def extrair_cv_relevante(texto_cv, texto_vaga, limite_tokens=ORCAMENTO_PERGUNTA['cv']):
+    """
+    Seleciona, dentro do orçamento, os segmentos do CV com mais termos em comum com a vaga
+    (normalizado pela raiz do tamanho do segmento), na ordem original. O resultado fica em cache
+    por (CV, vaga, orçamento), então cada candidato é processado uma única vez por vaga.
+    """
+    if estimar_tokens(texto_cv) <= limite_tokens: return texto_cv
+    termos_vaga = {t.lower() for t in _PALAVRA.findall(texto_vaga)}
+    segmentos = _segmentos(texto_cv)
+    pontuacoes = []
+    for i, segmento in enumerate(segmentos):
+        termos = [t.lower() for t in _PALAVRA.findall(segmento)]
+        pontuacoes.append((sum(t in termos_vaga for t in termos) / math.sqrt(len(termos) or 1), -i))
+
+    escolhidos, usados = [], 0
+    for _, menos_i in sorted(pontuacoes, reverse=True):
+        tokens = estimar_tokens(segmentos[-menos_i]) + 1
+        if usados + tokens > limite_tokens: continue
+        escolhidos.append(-menos_i)
+        usados += tokens
+    return ' … '.join(segmentos[i] for i in sorted(escolhidos)) or truncar(texto_cv, limite_tokens)
+
+
+# --- HISTÓRICO INCREMENTAL DA ENTREVISTA ---
+class HistoricoIncremental:
+    """
+    Histórico da entrevista mantido turno a turno: os turnos recentes ficam na íntegra até
+    `orcamento_recente` tokens, e os mais antigos passam para um resumo extrativo (início de cada
+    turno) limitado a `orcamento_resumo`. Cada mensagem nova custa O(1); nada é refeito do zero.
+    """
+
+    def __init__(self, orcamento_recente=ORCAMENTO_PERGUNTA['historico_recente'], orcamento_resumo=ORCAMENTO_PERGUNTA['resumo_historico']):
+        self.orcamento_recente = orcamento_recente
+        self.orcamento_resumo = orcamento_resumo
+        self.linhas, self.tokens = [], []
+        self.inicio_recente = 0
+        self.tokens_recentes = 0
+        self.tokens_total = 0
+        self.resumo = ''
+
+    @staticmethod
+    def formatar(mensagem):
+        return f"{'Entrevistador' if mensagem['role'] == 'assistant' else 'Candidato'}: {mensagem['content']}"
+
+    def adicionar(self, mensagem):
+        linha = truncar(self.formatar(mensagem), self.orcamento_recente)
+        self.linhas.append(linha)
+        self.tokens.append(estimar_tokens(linha) + 1)
+        self.tokens_recentes += self.tokens[-1]
+        self.tokens_total += self.tokens[-1]
+        while self.tokens_recentes > self.orcamento_recente and self.inicio_recente < len(self.linhas) - 1:
+            turno = _FIM_DE_FRASE.split(self.linhas[self.inicio_recente], maxsplit=1)[0]
+            self.resumo = truncar(f"{self.resumo} {truncar(turno, TOKENS_POR_TURNO_RESUMIDO)}".strip(), self.orcamento_resumo, manter_fim=True)
+            self.tokens_recentes -= self.tokens[self.inicio_recente]
+            self.inicio_recente += 1
+
+    def sincronizar(self, mensagens):
+        """Acrescenta apenas as mensagens ainda não vistas da lista da sessão."""
+        for mensagem in mensagens[len(self.linhas):]:
+            self.adicionar(mensagem)
+        return self
+
+    def contexto(self):
+        """Histórico dentro do orçamento: resumo dos turnos antigos (se houver) seguido dos turnos recentes."""
+        recentes = '\n'.join(self.linhas[self.inicio_recente:])
+        return f"[Resumo dos turnos anteriores] {self.resumo}\n{recentes}" if self.resumo else recentes
+
+    def transcricao(self, limite_tokens=ORCAMENTO_RELATORIO['historico']):
+        """Transcrição completa se couber em `limite_tokens`; caso contrário, o contexto resumido."""
+        return '\n'.join(self.linhas) if self.tokens_total <= limite_tokens else self.contexto()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import re
+from datetime import datetime
+
+import pandas as pd
+
+import armazenamento
+
+POSITIVOS_KEYWORDS = ['contratado', 'aprovado', 'documentação', 'encaminhado ao requisitante']
+
+
+def carregar_candidatos(caminho_ndjson=armazenamento.NDJSON_FILENAME, caminho_base=armazenamento.BASE_TEXTOS_FILENAME, workers=None):
+    """
+    Carrega apenas código e texto completo dos candidatos. Se a base colunar estiver desatualizada,
+    ela é regenerada a partir do NDJSON, com o arquivo dividido em intervalos de bytes processados
+    em paralelo (`workers=None` usa todos os núcleos).
+    """
+    if not armazenamento.base_textos_valida(caminho_ndjson, caminho_base):
+        armazenamento.construir_base_textos(caminho_ndjson, caminho_base, workers=workers)
+    return pd.read_parquet(caminho_base, columns=['codigo_candidato', 'candidato_texto_completo'])
+
+
+def montar_texto_vagas(vagas_data):
+    """Texto de cada vaga (campos `perfil_vaga_*` unidos por espaço), calculado uma vez por vaga e não por par."""
+    df_vagas = pd.json_normalize([{'codigo_vaga': k, **v} for k, v in vagas_data.items()], sep='_')
+    colunas = [c for c in df_vagas.columns if c.startswith('perfil_vaga_')]
+    texto = pd.Series('', index=df_vagas.index)
+    for i, coluna in enumerate(colunas):
+        valores = df_vagas[coluna].fillna('').astype(str)
+        texto = valores if i == 0 else texto + ' ' + valores
+    return pd.DataFrame({'codigo_vaga': df_vagas['codigo_vaga'], 'texto_vaga': texto}), len(colunas)
+
+
+def montar_df_treino(vagas_data, prospects_data, df_applicants):
+    """
+    Monta o DataFrame de treino (um registro por par vaga x prospect com status) usando apenas as
+    colunas que o modelo precisa, com concatenação de texto e rótulos vetorizados.
+    """
+    df_prospects = pd.DataFrame(
+        [(vaga_id, p.get('codigo'), p.get('situacao_candidado', 'N/A')) for vaga_id, data in prospects_data.items() for p in data.get('prospects', [])],
+        columns=['codigo_vaga', 'codigo_candidato', 'status_final'])
+    df_prospects['codigo_candidato'] = df_prospects['codigo_candidato'].astype(str)
+    df_vagas, total_colunas_vaga = montar_texto_vagas(vagas_data)
+    df_applicants = df_applicants[['codigo_candidato', 'candidato_texto_completo']].astype({'codigo_candidato': str})
+
+    df_mestre = pd.merge(df_prospects, df_vagas, on='codigo_vaga', how='left')
+    df_mestre = pd.merge(df_mestre, df_applicants, on='codigo_candidato', how='left')
+    # Vagas ou candidatos ausentes equivalem a unir campos vazios.
+    df_mestre['texto_vaga'] = df_mestre['texto_vaga'].fillna(' ' * max(total_colunas_vaga - 1, 0))
+    df_mestre['candidato_texto_completo'] = df_mestre['candidato_texto_completo'].fillna(armazenamento.TEXTO_CANDIDATO_VAZIO)
+    df_mestre['texto_completo'] = df_mestre['texto_vaga'] + ' ' + df_mestre['candidato_texto_completo']
+
+    padrao_positivo = '|'.join(re.escape(k) for k in POSITIVOS_KEYWORDS)
+    df_mestre['target'] = df_mestre['status_final'].astype(str).str.lower().str.contains(padrao_positivo, regex=True).astype(int)
+    return df_mestre[df_mestre['status_final'] != 'N/A'].dropna(subset=['texto_completo']).copy()
+
+
+def _data_prospect(prospect):
+    """Data ISO da última atualização do prospect (ou da candidatura); None se ausente ou inválida."""
+    for campo in ('ultima_atualizacao', 'data_candidatura'):
+        try:
+            return datetime.strptime(prospect.get(campo) or '', '%d-%m-%Y').date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _assinatura_prospect(prospect):
+    """Hash curto do conteúdo do prospect: muda quando o registro é atualizado (por exemplo, a situação)."""
+    return hashlib.sha1(json.dumps(prospect, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def filtrar_prospects_novos(prospects_data, marca):
+    """
+    Seleciona os prospects ainda não consumidos segundo a marca `{'data': 'AAAA-MM-DD', 'consumidos': {'vaga:codigo': [hashes]}}`.
+    Um prospect é novo se o par vaga x candidato não foi consumido ou se o seu conteúdo mudou desde então,
+    independentemente da data (que pode ser anterior à marca ou ausente). Retorna os prospects novos, no
+    mesmo formato do `prospects.json`, e a nova marca; `data` é só informativa (a maior data já vista).
+    """
+    consumidos, atuais = (marca or {}).get('consumidos', {}), {}
+    novos, datas = {}, [(marca or {}).get('data')]
+    for vaga_id, dados in prospects_data.items():
+        for p in dados.get('prospects', []):
+            chave, assinatura = f"{vaga_id}:{p.get('codigo')}", _assinatura_prospect(p)
+            atuais.setdefault(chave, set()).add(assinatura)
+            if assinatura in consumidos.get(chave, ()): continue
+            novos.setdefault(vaga_id, {'prospects': []})['prospects'].append(p)
+            datas.append(_data_prospect(p))
+    # O mesmo par pode aparecer mais de uma vez no arquivo: guarda os hashes de todas as ocorrências atuais
+    return novos, {'data': max(datas, key=lambda d: d or ''), 'consumidos': {**consumidos, **{c: sorted(a) for c, a in atuais.items()}}}
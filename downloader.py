@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+TAMANHO_PARTE = 8 * 2**20  # Bytes por requisição de intervalo; arquivos com menos de duas partes vão em uma só requisição
+TAMANHO_BLOCO = 1 << 20
+_SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ErroIntegridade(Exception):
+    """O arquivo baixado não confere com o tamanho ou o checksum esperados."""
+
+
+# --- MANIFESTO (tamanho e sha256 de cada arquivo baixado) ---
+def carregar_manifesto(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _salvar_json_atomico(dados, caminho):
+    caminho_tmp = f"{caminho}.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8') as f: json.dump(dados, f, indent=2)
+    os.replace(caminho_tmp, caminho)
+
+
+_trava_manifesto = threading.Lock()
+
+def _registrar_no_manifesto(caminho_manifesto, destino, entrada):
+    with _trava_manifesto:
+        manifesto = carregar_manifesto(caminho_manifesto)
+        manifesto[Path(destino).name] = entrada
+        _salvar_json_atomico(manifesto, caminho_manifesto)
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''): h.update(bloco)
+    return h.hexdigest()
+
+
+def arquivo_integro(destino, entrada):
+    """
+    Confere o arquivo com a entrada do manifesto. O sha256 só é recalculado se o tamanho ou o mtime
+    mudaram desde a última verificação.
+    """
+    if not entrada or not os.path.exists(destino): return False
+    estado = os.stat(destino)
+    if estado.st_size != entrada.get('tamanho'): return False
+    if entrada.get('mtime_ns') == estado.st_mtime_ns: return True
+    return entrada.get('sha256') is None or sha256_arquivo(destino) == entrada['sha256']
+
+
+# --- DOWNLOAD ---
+def _consultar(sessao, url, timeout):
+    """Tamanho, suporte a intervalos e sha256 anunciado (ETag do Hugging Face/LFS) do recurso."""
+    resposta = sessao.head(url, allow_redirects=True, timeout=timeout)
+    resposta.raise_for_status()
+    cabecalhos = requests.structures.CaseInsensitiveDict()
+    for r in [*resposta.history, resposta]: cabecalhos.update(r.headers)  # o Hugging Face anuncia X-Linked-* no redirecionamento
+    tamanho = cabecalhos.get('X-Linked-Size') or cabecalhos.get('Content-Length')
+    etag = (cabecalhos.get('X-Linked-Etag') or cabecalhos.get('ETag') or '').strip('"').removeprefix('W/').strip('"')
+    return {'url_final': resposta.url, 'tamanho': int(tamanho) if tamanho else None,
+            'intervalos': cabecalhos.get('Accept-Ranges', '').lower() == 'bytes',
+            'sha256': etag if _SHA256_HEX.match(etag) else None}
+
+
+def _baixar_intervalo(url, caminho_parcial, inicio, fim, sessoes, timeout, tentativas, progresso):
+    """Baixa os bytes [inicio, fim] na posição correspondente do arquivo parcial, com novas tentativas."""
+    if not hasattr(sessoes, 'sessao'): sessoes.sessao = requests.Session()
+    for tentativa in range(tentativas):
+        escritos = 0
+        try:
+            with sessoes.sessao.get(url, headers={'Range': f'bytes={inicio}-{fim}'}, stream=True, timeout=timeout) as resposta:
+                resposta.raise_for_status()
+                if resposta.status_code != 206: raise requests.exceptions.RequestException("O servidor ignorou o cabeçalho Range.")
+                with open(caminho_parcial, 'r+b') as f:
+                    f.seek(inicio)
+                    for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+                        f.write(bloco)
+                        escritos += len(bloco)
+                        progresso(len(bloco))
+            if escritos != fim - inicio + 1: raise requests.exceptions.RequestException(f"Intervalo incompleto ({escritos} de {fim - inicio + 1} bytes).")
+            return
+        except requests.exceptions.RequestException:
+            progresso(-escritos)
+            if tentativa == tentativas - 1: raise
+            time.sleep(2 ** tentativa)
+
+
+def _baixar_sequencial(sessao, url, caminho_parcial, timeout, progresso):
+    with sessao.get(url, stream=True, timeout=timeout) as resposta:
+        resposta.raise_for_status()
+        with open(caminho_parcial, 'wb') as f:
+            for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+                f.write(bloco)
+                progresso(len(bloco))
+
+
+def baixar(url, destino, caminho_manifesto, workers=8, tamanho_parte=TAMANHO_PARTE, timeout=60, tentativas=3, ao_progredir=None):
+    """
+    Baixa `url` para `destino` com requisições de intervalo em paralelo, retomando downloads
+    interrompidos (as partes concluídas ficam registradas em `<destino>.part.json`). O destino só é
+    criado, de forma atômica, depois que tamanho e sha256 conferem com o manifesto (ou com o
+    tamanho/ETag anunciados pelo servidor no primeiro download). Retorna as estatísticas do download.
+    """
+    destino = Path(destino)
+    entrada = carregar_manifesto(caminho_manifesto).get(destino.name)
+    if arquivo_integro(destino, entrada):
+        if entrada.get('mtime_ns') != destino.stat().st_mtime_ns:
+            _registrar_no_manifesto(caminho_manifesto, destino, {**entrada, 'mtime_ns': destino.stat().st_mtime_ns})
+        return {'baixado': False, 'bytes': 0, 'segundos': 0.0, 'mb_por_s': 0.0}
+
+    sessao = requests.Session()
+    info = _consultar(sessao, url, timeout)
+    tamanho_esperado = (entrada or {}).get('tamanho') or info['tamanho']
+    sha256_esperado = info['sha256'] or (entrada or {}).get('sha256')  # o checksum anunciado pela origem prevalece sobre o registrado
+    if info['tamanho'] is not None and tamanho_esperado != info['tamanho']:
+        # O arquivo mudou na origem: o manifesto antigo deixa de valer.
+        tamanho_esperado, sha256_esperado = info['tamanho'], info['sha256']
+    if entrada is None and destino.exists() and destino.stat().st_size == tamanho_esperado:
+        # Arquivo baixado antes do manifesto: é adotado se conferir com o que o servidor anuncia.
+        sha256 = sha256_arquivo(destino)
+        if sha256_esperado in (None, sha256):
+            _registrar_no_manifesto(caminho_manifesto, destino, {'url': url, 'tamanho': tamanho_esperado, 'sha256': sha256, 'mtime_ns': destino.stat().st_mtime_ns})
+            return {'baixado': False, 'bytes': 0, 'segundos': 0.0, 'mb_por_s': 0.0}
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    caminho_parcial, caminho_estado = Path(f"{destino}.part"), Path(f"{destino}.part.json")
+    trava, baixados = threading.Lock(), [0]
+    inicio_download = time.perf_counter()
+
+    def progresso(n):
+        with trava:
+            baixados[0] += n
+            if ao_progredir: ao_progredir(baixados[0], tamanho_esperado)
+
+    retomados = 0
+    if info['intervalos'] and tamanho_esperado and tamanho_esperado >= 2 * tamanho_parte:
+        estado = carregar_manifesto(caminho_estado)
+        assinatura = {'tamanho': tamanho_esperado, 'sha256': sha256_esperado, 'tamanho_parte': tamanho_parte}
+        if any(estado.get(k) != v for k, v in assinatura.items()) or not caminho_parcial.exists():
+            estado = {**assinatura, 'url': url, 'concluidas': []}
+            with open(caminho_parcial, 'wb') as f: f.truncate(tamanho_esperado)
+            _salvar_json_atomico(estado, caminho_estado)
+        concluidas = set(estado['concluidas'])
+        partes = [(i, i * tamanho_parte, min((i + 1) * tamanho_parte, tamanho_esperado) - 1) for i in range(-(-tamanho_esperado // tamanho_parte))]
+        retomados = sum(fim - ini + 1 for i, ini, fim in partes if i in concluidas)
+        sessoes = threading.local()
+
+        def baixar_parte(parte):
+            i, ini, fim = parte
+            _baixar_intervalo(info['url_final'], caminho_parcial, ini, fim, sessoes, timeout, tentativas, progresso)
+            with trava:
+                estado['concluidas'].append(i)
+                _salvar_json_atomico(estado, caminho_estado)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(baixar_parte, [p for p in partes if p[0] not in concluidas]))
+    else:
+        _baixar_sequencial(sessao, info['url_final'], caminho_parcial, timeout, progresso)
+
+    tamanho_obtido = caminho_parcial.stat().st_size
+    if tamanho_esperado is not None and tamanho_obtido != tamanho_esperado:
+        caminho_parcial.unlink(missing_ok=True)
+        caminho_estado.unlink(missing_ok=True)
+        raise ErroIntegridade(f"'{destino.name}': {tamanho_obtido} bytes recebidos, {tamanho_esperado} esperados.")
+    sha256 = sha256_arquivo(caminho_parcial)
+    if sha256_esperado is not None and sha256 != sha256_esperado:
+        caminho_parcial.unlink(missing_ok=True)
+        caminho_estado.unlink(missing_ok=True)
+        raise ErroIntegridade(f"'{destino.name}': sha256 {sha256} diferente do esperado {sha256_esperado}.")
+
+    with open(caminho_parcial, 'rb+') as f: os.fsync(f.fileno())
+    os.replace(caminho_parcial, destino)
+    caminho_estado.unlink(missing_ok=True)
+    _registrar_no_manifesto(caminho_manifesto, destino, {'url': url, 'tamanho': tamanho_obtido, 'sha256': sha256, 'mtime_ns': destino.stat().st_mtime_ns})
+    segundos = time.perf_counter() - inicio_download
+    return {'baixado': True, 'bytes': baixados[0], 'retomados': retomados, 'segundos': segundos, 'mb_por_s': baixados[0] / 2**20 / max(segundos, 1e-9)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downloads paralelos e retomáveis com verificação de integridade.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    p_baixar = subcomandos.add_parser('baixar', help="Baixa uma URL para um arquivo.")
+    p_baixar.add_argument('url')
+    p_baixar.add_argument('destino')
+    p_baixar.add_argument('--manifesto', default='data/downloads.manifest.json')
+    p_baixar.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    resultado = baixar(args.url, args.destino, args.manifesto, workers=args.workers)
+    print(json.dumps(resultado, indent=2))
@@ -0,0 +1,161 @@
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Referência de tempo do processo: este módulo é o primeiro importado pelo app.
+_INICIO = time.perf_counter()
+_INICIO_EPOCA = time.time()
+_trava = threading.Lock()
+_eventos = []
+_marcos = {}
+
+PERFIL_JSON_ENV = "PERFIL_INICIALIZACAO_JSON"
+ETAPAS_ENV = "INSTRUMENTACAO_ETAPAS"  # "0" desativa a medição das etapas
+LOG_JSON_ENV = "INSTRUMENTACAO_LOG_JSON"  # "1" emite uma linha JSON por etapa medida
+JANELA_ETAPAS = 500  # Últimas medições de cada etapa usadas nos percentis
+
+
+def _registrar(tipo, nome, duracao):
+    with _trava:
+        _eventos.append({'tipo': tipo, 'nome': nome, 'inicio_s': round(time.perf_counter() - _INICIO - duracao, 6), 'duracao_s': round(duracao, 6)})
+
+
+@contextmanager
+def medir(nome, tipo='etapa'):
+    """Mede um bloco (import, carregamento de artefato ou etapa) e registra no perfil de inicialização."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(tipo, nome, time.perf_counter() - inicio)
+
+
+def importar(nome_modulo):
+    """Importa um módulo registrando o tempo apenas na primeira vez que ele é carregado no processo."""
+    if nome_modulo in sys.modules:
+        return sys.modules[nome_modulo]
+    with medir(nome_modulo, 'import'):
+        return importlib.import_module(nome_modulo)
+
+
+def marcar(nome):
+    """Registra o instante (desde o início do processo) em que um marco foi atingido pela primeira vez."""
+    with _trava:
+        _marcos.setdefault(nome, round(time.perf_counter() - _INICIO, 6))
+
+
+def perfil():
+    """Retorna o perfil de inicialização acumulado no processo."""
+    with _trava:
+        return {'pid': os.getpid(), 'inicio_processo': _INICIO_EPOCA, 'marcos': dict(_marcos), 'eventos': list(_eventos)}
+
+
+def salvar_perfil(caminho=None):
+    """Grava o perfil em JSON (por padrão no caminho da variável de ambiente PERFIL_INICIALIZACAO_JSON)."""
+    caminho = caminho or os.environ.get(PERFIL_JSON_ENV)
+    if not caminho: return None
+    caminho_tmp = f"{caminho}.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(perfil(), f, indent=2)
+    os.replace(caminho_tmp, caminho)
+    return caminho
+
+
+# --- ETAPAS DAS ANÁLISES ---
+# Tempo e variação de memória residente de cada etapa, com janela móvel por etapa para os percentis.
+# Desativado, `etapa` devolve um contexto vazio compartilhado: o custo é o de uma chamada de função.
+etapas_ativas = os.environ.get(ETAPAS_ENV, '1') != '0'
+_janelas = {}
+_NULO = nullcontext()
+_logger_etapas = logging.getLogger('instrumentacao.etapas')
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Memória residente atual do processo (Linux: /proc/self/statm; nos demais, o pico via getrusage)."""
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * _PAGINA
+    except OSError:
+        import resource
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo if sys.platform == 'darwin' else maximo * 1024
+
+
+def configurar_log_json(ativo):
+    """Liga ou desliga a emissão de logs JSON das etapas (uma linha por medição, em stderr)."""
+    if ativo and not _logger_etapas.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _logger_etapas.addHandler(handler)
+        _logger_etapas.propagate = False
+    _logger_etapas.setLevel(logging.INFO if ativo else logging.WARNING)
+
+
+def log_json_ativo():
+    return _logger_etapas.isEnabledFor(logging.INFO)
+
+
+class _Etapa:
+    __slots__ = ('nome', 'atributos', '_inicio', '_rss')
+
+    def __init__(self, nome, atributos):
+        self.nome = nome
+        self.atributos = atributos
+
+    def __enter__(self):
+        self._rss = rss_bytes()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, *_):
+        duracao = time.perf_counter() - self._inicio
+        delta_rss = rss_bytes() - self._rss
+        with _trava:
+            janela = _janelas.get(self.nome)
+            if janela is None: janela = _janelas[self.nome] = deque(maxlen=JANELA_ETAPAS)
+            janela.append((duracao, delta_rss))
+        if _logger_etapas.isEnabledFor(logging.INFO):
+            _logger_etapas.info(json.dumps({'evento': 'etapa', 'etapa': self.nome, 'duracao_ms': round(duracao * 1000, 3),
+                                            'delta_rss_mb': round(delta_rss / 2**20, 3), 'erro': tipo_erro.__name__ if tipo_erro else None,
+                                            'pid': os.getpid(), 'ts': round(time.time(), 3), **self.atributos}, ensure_ascii=False))
+        return False
+
+
+def etapa(nome, **atributos):
+    """
+    Mede tempo e variação de memória residente de um bloco e acumula na janela da etapa `nome`.
+    `atributos` (ex.: quantidade de candidatos) só vão para o log JSON.
+    """
+    return _Etapa(nome, atributos) if etapas_ativas else _NULO
+
+
+def _percentil(valores_ordenados, p):
+    return valores_ordenados[min(len(valores_ordenados) - 1, int(p / 100 * len(valores_ordenados)))]
+
+
+def resumo_etapas():
+    """Percentis de tempo (ms) e variação de memória (MB) de cada etapa nas últimas `JANELA_ETAPAS` medições."""
+    with _trava:
+        janelas = {nome: list(janela) for nome, janela in _janelas.items()}
+    resumo = {}
+    for nome, medicoes in janelas.items():
+        tempos = sorted(d * 1000 for d, _ in medicoes)
+        memorias = sorted(m / 2**20 for _, m in medicoes)
+        resumo[nome] = {'n': len(medicoes), 'ultima_ms': round(medicoes[-1][0] * 1000, 2), 'p50_ms': round(_percentil(tempos, 50), 2),
+                        'p90_ms': round(_percentil(tempos, 90), 2), 'p99_ms': round(_percentil(tempos, 99), 2), 'max_ms': round(tempos[-1], 2),
+                        'delta_rss_p50_mb': round(_percentil(memorias, 50), 2), 'delta_rss_max_mb': round(memorias[-1], 2)}
+    return resumo
+
+
+def zerar_etapas():
+    with _trava:
+        _janelas.clear()
+
+
+configurar_log_json(os.environ.get(LOG_JSON_ENV, '0') == '1')
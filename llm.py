@@ -0,0 +1,338 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+MODELO_GEMINI = 'gemini-1.5-flash'
+LLM_BACKEND_ENV = "LLM_BACKEND" # "gemini" (padrão) ou "falso", para testes e benchmarks offline
+
+
+# --- BACKENDS ---
+class BackendGemini:
+    """Backend sobre `genai.GenerativeModel`; o SDK só é importado na primeira chamada."""
+
+    def __init__(self, api_key=None, modelo=MODELO_GEMINI, parametros=None):
+        self.api_key = api_key
+        self.nome_modelo = modelo
+        self.parametros = dict(parametros or {})  # generation_config (temperature, max_output_tokens...)
+        self._modelo = None
+        self._trava = threading.Lock()
+
+    def _obter_modelo(self):
+        with self._trava:
+            if self._modelo is None:
+                import instrumentacao
+                genai = instrumentacao.importar('google.generativeai')
+                if self.api_key: genai.configure(api_key=self.api_key)
+                self._modelo = genai.GenerativeModel(self.nome_modelo, generation_config=self.parametros or None)
+            return self._modelo
+
+    def gerar(self, prompt):
+        return self._obter_modelo().generate_content(prompt).text
+
+    def gerar_stream(self, prompt):
+        for pedaco in self._obter_modelo().generate_content(prompt, stream=True):
+            try:
+                texto = pedaco.text
+            except ValueError:  # pedaço sem partes de texto (ex.: bloqueado por segurança)
+                continue
+            if texto: yield texto
+
+
+class BackendFalso:
+    """Backend local com latência, tempo até o primeiro token e taxa de falhas configuráveis, para testes sem a API."""
+
+    def __init__(self, latencia_s=1.0, taxa_falhas=0.0, semente=None, primeiro_token_s=None):
+        self.latencia_s = latencia_s
+        self.primeiro_token_s = latencia_s / 5 if primeiro_token_s is None else primeiro_token_s
+        self.taxa_falhas = taxa_falhas
+        self.nome_modelo = 'falso'
+        self.parametros = {}
+        self._aleatorio = random.Random(semente)
+        self._trava = threading.Lock()
+        self.chamadas = 0
+
+    def gerar(self, prompt):
+        return ''.join(self.gerar_stream(prompt))
+
+    def gerar_stream(self, prompt):
+        with self._trava:
+            self.chamadas += 1
+            falhar = self._aleatorio.random() < self.taxa_falhas
+        time.sleep(self.primeiro_token_s)
+        if falhar: raise RuntimeError("Falha simulada do backend falso.")
+        palavras = f"### Resposta simulada\n\nPrompt com {len(prompt)} caracteres, gerada pelo backend falso em pedaços.".split(' ')
+        intervalo = max(self.latencia_s - self.primeiro_token_s, 0) / len(palavras)
+        for i, palavra in enumerate(palavras):
+            if i: time.sleep(intervalo)
+            yield palavra if i == 0 else ' ' + palavra
+
+
+def criar_backend(api_key=None):
+    """Escolhe o backend pela variável de ambiente LLM_BACKEND."""
+    if os.environ.get(LLM_BACKEND_ENV, 'gemini').lower() == 'falso':
+        return BackendFalso(latencia_s=float(os.environ.get('LLM_LATENCIA_FALSA_S', '1.0')))
+    return BackendGemini(api_key=api_key)
+
+
+# --- CACHE DE RESPOSTAS ---
+class CacheRespostas:
+    """
+    Cache persistente de respostas em SQLite, endereçado pelo hash de (modelo, parâmetros, prompt).
+    O arquivo é compartilhado entre sessões e processos (modo WAL); os contadores de acertos e faltas
+    também ficam no banco. Entradas mais antigas que `idade_maxima_s` expiram, e acima de `tamanho_maximo_bytes`
+    as menos acessadas recentemente são descartadas. Uma resposta maior que o próprio limite não é guardada.
+    """
+
+    def __init__(self, caminho, tamanho_maximo_bytes=50 * 2**20, idade_maxima_s=7 * 24 * 3600):
+        self.caminho = str(caminho)
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self.idade_maxima_s = idade_maxima_s
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("CREATE TABLE IF NOT EXISTS respostas (chave TEXT PRIMARY KEY, modelo TEXT, resposta TEXT, tamanho INTEGER, criado_em REAL, acessado_em REAL)")
+            conexao.execute("CREATE INDEX IF NOT EXISTS respostas_acesso ON respostas (acessado_em)")
+            conexao.execute("CREATE TABLE IF NOT EXISTS contadores (nome TEXT PRIMARY KEY, valor INTEGER)")
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conexao:  # commit ao final (ou rollback em caso de erro)
+                yield conexao
+        finally:
+            conexao.close()
+
+    @staticmethod
+    def chave(backend, prompt):
+        conteudo = json.dumps({'modelo': backend.nome_modelo, 'parametros': backend.parametros, 'prompt': prompt}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def _contar(self, conexao, nome):
+        conexao.execute("INSERT INTO contadores (nome, valor) VALUES (?, 1) ON CONFLICT(nome) DO UPDATE SET valor = valor + 1", (nome,))
+
+    def obter(self, chave):
+        """Resposta em cache (ou None), registrando o acerto ou a falta."""
+        agora = time.time()
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT resposta FROM respostas WHERE chave = ? AND criado_em >= ?", (chave, agora - self.idade_maxima_s)).fetchone()
+            if linha is None:
+                self._contar(conexao, 'faltas')
+                return None
+            conexao.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+            self._contar(conexao, 'acertos')
+            return linha[0]
+
+    def gravar(self, chave, modelo, resposta):
+        agora = time.time()
+        tamanho = len(resposta.encode('utf-8'))
+        with self._conectar() as conexao:
+            if tamanho > self.tamanho_maximo_bytes:
+                # Uma resposta maior que o limite não é guardada (ela despejaria todo o cache, inclusive a si mesma);
+                # a versão anterior da mesma chave é removida para não ser servida no lugar da nova.
+                conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                self._contar(conexao, 'grandes_demais')
+                return
+            conexao.execute("INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)", (chave, modelo, resposta, tamanho, agora, agora))
+            self._despejar(conexao, agora, chave)
+
+    def _despejar(self, conexao, agora, chave_atual):
+        conexao.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.idade_maxima_s,))
+        total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.tamanho_maximo_bytes: return
+        acumulado, limite_acesso = 0, None
+        for acessado_em, tamanho in conexao.execute("SELECT acessado_em, tamanho FROM respostas WHERE chave != ? ORDER BY acessado_em", (chave_atual,)):
+            acumulado += tamanho
+            limite_acesso = acessado_em
+            if total - acumulado <= self.tamanho_maximo_bytes: break
+        conexao.execute("DELETE FROM respostas WHERE acessado_em <= ? AND chave != ?", (limite_acesso, chave_atual))
+        self._contar(conexao, 'despejos')
+
+    def estatisticas(self):
+        with self._conectar() as conexao:
+            contadores = dict(conexao.execute("SELECT nome, valor FROM contadores").fetchall())
+            entradas, tamanho = conexao.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()
+        acertos, faltas = contadores.get('acertos', 0), contadores.get('faltas', 0)
+        return {'acertos': acertos, 'faltas': faltas, 'taxa_acerto': acertos / max(acertos + faltas, 1),
+                'despejos': contadores.get('despejos', 0), 'grandes_demais': contadores.get('grandes_demais', 0), 'entradas': entradas, 'bytes': tamanho}
+
+    def limpar(self):
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM respostas")
+            conexao.execute("DELETE FROM contadores")
+
+
+# --- CONTROLE DE TAXA E RETENTATIVAS ---
+class LimitadorTaxa:
+    """Balde de fichas compartilhado entre threads: no máximo `chamadas_por_minuto` chamadas, com rajadas até `rajada`."""
+
+    def __init__(self, chamadas_por_minuto=60, rajada=None):
+        self.intervalo_s = 60.0 / chamadas_por_minuto
+        self.capacidade = float(rajada or max(1, chamadas_por_minuto // 6))
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._trava = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._trava:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) / self.intervalo_s)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) * self.intervalo_s
+            time.sleep(espera)
+
+
+def gerar_com_retentativa(backend, prompt, limitador=None, tentativas=3, espera_inicial_s=1.0, cache=None, ignorar_cache=False):
+    """
+    Chama o backend respeitando o limitador; em caso de erro, tenta de novo com espera exponencial e jitter.
+    Com `cache`, respostas já conhecidas voltam sem chamada (nem consumo do limite de taxa); `ignorar_cache`
+    força uma nova geração, que substitui a entrada em cache.
+    """
+    chave = CacheRespostas.chave(backend, prompt) if cache is not None else None
+    if chave is not None and not ignorar_cache:
+        resposta = cache.obter(chave)
+        if resposta is not None: return resposta
+    for tentativa in range(tentativas):
+        if limitador is not None: limitador.aguardar()
+        try:
+            resposta = backend.gerar(prompt)
+            break
+        except Exception:
+            if tentativa == tentativas - 1: raise
+            time.sleep(espera_inicial_s * 2 ** tentativa * (0.5 + random.random()))
+    if chave is not None: cache.gravar(chave, backend.nome_modelo, resposta)
+    return resposta
+
+
+class EstatisticasStream:
+    """Janela móvel (por processo) do tempo até o primeiro token e do tempo total das chamadas em streaming."""
+
+    def __init__(self, janela=200):
+        self._amostras = deque(maxlen=janela)
+        self._trava = threading.Lock()
+        self.acertos_cache = 0
+
+    def registrar(self, primeiro_token_s, total_s):
+        with self._trava:
+            self._amostras.append((primeiro_token_s, total_s))
+
+    def registrar_acerto_cache(self):
+        with self._trava:
+            self.acertos_cache += 1
+
+    def resumo(self):
+        with self._trava:
+            amostras = list(self._amostras)
+            acertos = self.acertos_cache
+        if not amostras: return {'chamadas': 0, 'acertos_cache': acertos}
+        primeiros, totais = sorted(a[0] for a in amostras), sorted(a[1] for a in amostras)
+        percentil = lambda valores, p: valores[min(len(valores) - 1, int(p * len(valores)))]
+        return {'chamadas': len(amostras), 'acertos_cache': acertos,
+                'primeiro_token_p50_s': percentil(primeiros, 0.5), 'primeiro_token_p95_s': percentil(primeiros, 0.95),
+                'total_p50_s': percentil(totais, 0.5), 'total_p95_s': percentil(totais, 0.95)}
+
+
+ESTATISTICAS_STREAM = EstatisticasStream()
+
+
+def gerar_stream_com_retentativa(backend, prompt, limitador=None, tentativas=3, espera_inicial_s=1.0, cache=None, ignorar_cache=False, metricas=None):
+    """
+    Versão em streaming de `gerar_com_retentativa`: produz os pedaços de texto à medida que chegam.
+    Só há nova tentativa se a falha ocorrer antes do primeiro pedaço. O dicionário `metricas`, se
+    fornecido, recebe `primeiro_token_s`, `total_s`, `pedacos` e `cache` ao final.
+    """
+    inicio = time.perf_counter()
+    metricas = {} if metricas is None else metricas
+    chave = CacheRespostas.chave(backend, prompt) if cache is not None else None
+    if chave is not None and not ignorar_cache:
+        resposta = cache.obter(chave)
+        if resposta is not None:
+            metricas.update(primeiro_token_s=time.perf_counter() - inicio, total_s=time.perf_counter() - inicio, pedacos=1, cache=True)
+            ESTATISTICAS_STREAM.registrar_acerto_cache()
+            yield resposta
+            return
+    partes = []
+    for tentativa in range(tentativas):
+        if limitador is not None: limitador.aguardar()
+        try:
+            for pedaco in backend.gerar_stream(prompt):
+                if not partes: metricas['primeiro_token_s'] = time.perf_counter() - inicio
+                partes.append(pedaco)
+                yield pedaco
+            break
+        except Exception:
+            if partes or tentativa == tentativas - 1: raise
+            time.sleep(espera_inicial_s * 2 ** tentativa * (0.5 + random.random()))
+    total = time.perf_counter() - inicio
+    metricas.setdefault('primeiro_token_s', total)
+    metricas.update(total_s=total, pedacos=len(partes), cache=False)
+    ESTATISTICAS_STREAM.registrar(metricas['primeiro_token_s'], total)
+    if chave is not None: cache.gravar(chave, backend.nome_modelo, ''.join(partes))
+
+
+def gerar_em_lote(backend, prompts, max_concorrencia=5, limitador=None, tentativas=3, espera_inicial_s=1.0, cache=None, ignorar_cache=False):
+    """
+    Gera as respostas de `prompts` ({chave: prompt}) em paralelo, em um pool limitado de threads.
+    Retorna ({chave: texto}, {chave: exceção}); uma falha não interrompe as demais chamadas.
+    """
+    if not prompts: return {}, {}
+    with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(prompts))) as executor:
+        futuros = {chave: executor.submit(gerar_com_retentativa, backend, prompt, limitador, tentativas, espera_inicial_s, cache, ignorar_cache) for chave, prompt in prompts.items()}
+    respostas, erros = {}, {}
+    for chave, futuro in futuros.items():
+        try:
+            respostas[chave] = futuro.result()
+        except Exception as e:
+            erros[chave] = e
+    return respostas, erros
+
+
+# --- BENCHMARK OFFLINE ---
+def comparar_sequencial_e_lote(finalistas=5, latencia_s=1.0, max_concorrencia=5, chamadas_por_minuto=60):
+    """Tempo de parede para gerar os relatórios de `finalistas` candidatos um a um e em lote, com o backend falso."""
+    backend = BackendFalso(latencia_s=latencia_s)
+    prompts = {f"candidato_{i}": f"Relatório do candidato {i}" for i in range(finalistas)}
+
+    inicio = time.perf_counter()
+    for prompt in prompts.values():
+        gerar_com_retentativa(backend, prompt, LimitadorTaxa(chamadas_por_minuto))
+    tempo_sequencial = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    respostas, erros = gerar_em_lote(backend, prompts, max_concorrencia, LimitadorTaxa(chamadas_por_minuto))
+    tempo_lote = time.perf_counter() - inicio
+    return {'finalistas': finalistas, 'latencia_s': latencia_s, 'sequencial_s': tempo_sequencial, 'lote_s': tempo_lote,
+            'aceleracao': tempo_sequencial / tempo_lote, 'respostas': len(respostas), 'erros': len(erros)}
+
+
+def medir_stream(latencia_s=1.0, primeiro_token_s=None):
+    """Tempo até o primeiro pedaço e tempo total de uma resposta em streaming do backend falso."""
+    metricas = {}
+    for _ in gerar_stream_com_retentativa(BackendFalso(latencia_s=latencia_s, primeiro_token_s=primeiro_token_s), "Próxima pergunta", metricas=metricas):
+        pass
+    return metricas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara a geração sequencial e em lote de relatórios e mede o streaming com o backend falso.")
+    parser.add_argument('--finalistas', type=int, default=5)
+    parser.add_argument('--latencia', type=float, default=1.0, help="Latência simulada de cada chamada, em segundos.")
+    parser.add_argument('--concorrencia', type=int, default=5)
+    parser.add_argument('--chamadas-por-minuto', type=int, default=60)
+    args = parser.parse_args()
+    resultado = comparar_sequencial_e_lote(args.finalistas, args.latencia, args.concorrencia, args.chamadas_por_minuto)
+    print(f"Sequencial: {resultado['sequencial_s']:.2f}s | Lote: {resultado['lote_s']:.2f}s | Aceleração: {resultado['aceleracao']:.1f}x ({resultado['respostas']} respostas, {resultado['erros']} erros)")
+    metricas = medir_stream(args.latencia)
+    print(f"Streaming: primeiro token em {metricas['primeiro_token_s']:.2f}s, resposta completa em {metricas['total_s']:.2f}s ({metricas['pedacos']} pedaços)")
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFESTO_FILENAME = "artefatos.manifest.json" # Fica ao lado do modelo e deve ser versionado junto com ele
+TAMANHO_BLOCO = 1 << 20
+
+
+def _chave(caminho):
+    return Path(caminho).as_posix()
+
+
+class Manifesto:
+    """
+    Registro do hash de conteúdo de cada arquivo de entrada e derivado, e, para os derivados, dos
+    hashes das entradas e dos parâmetros com que foram construídos. O sha256 de um arquivo só é
+    recalculado quando o tamanho ou o mtime mudam.
+    """
+
+    def __init__(self, caminho=MANIFESTO_FILENAME):
+        self.caminho = Path(caminho)
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f: dados = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            dados = {}
+        self.arquivos = dados.get('arquivos', {})
+        self.artefatos = dados.get('artefatos', {})
+        self._alterado = False
+
+    def hash(self, caminho):
+        """sha256 do conteúdo (None se o arquivo não existe)."""
+        try:
+            estado = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        entrada = self.arquivos.get(_chave(caminho))
+        if entrada and entrada['tamanho'] == estado.st_size and entrada['mtime_ns'] == estado.st_mtime_ns:
+            return entrada['sha256']
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''): h.update(bloco)
+        self.arquivos[_chave(caminho)] = {'sha256': h.hexdigest(), 'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+        self._alterado = True
+        return h.hexdigest()
+
+    def entradas_alteradas(self, saida):
+        """Entradas do artefato cujo conteúdo atual difere do usado na construção (None se o artefato atual não tem registro)."""
+        registro = self.artefatos.get(_chave(saida))
+        if registro is None or self.hash(saida) != registro['sha256']: return None
+        return [entrada for entrada, h in registro['entradas'].items() if self.hash(entrada) != h]
+
+    def motivo_reconstrucao(self, saida, entradas, parametros=None):
+        """
+        Por que o artefato precisa ser reconstruído (None se está atualizado). Um artefato existente
+        ainda sem registro é adotado se for mais novo que todas as entradas, como faria o `make`.
+        """
+        if not os.path.exists(saida): return "não existe"
+        registro = self.artefatos.get(_chave(saida))
+        if registro is None:
+            mtime_saida = os.stat(saida).st_mtime_ns
+            if all(os.path.exists(e) and os.stat(e).st_mtime_ns <= mtime_saida for e in entradas):
+                self.registrar(saida, entradas, parametros)
+                return None
+            return "sem registro no manifesto"
+        if self.hash(saida) != registro['sha256']: return "alterado fora do processo de construção"
+        if sorted(registro['entradas']) != sorted(_chave(e) for e in entradas): return "conjunto de entradas diferente"
+        alteradas = self.entradas_alteradas(saida)
+        if alteradas: return f"entradas alteradas: {', '.join(alteradas)}"
+        if registro.get('parametros') != (parametros or {}): return "parâmetros de construção diferentes"
+        return None
+
+    def registrar(self, saida, entradas, parametros=None):
+        self.artefatos[_chave(saida)] = {'sha256': self.hash(saida), 'entradas': {_chave(e): self.hash(e) for e in entradas},
+                                         'parametros': parametros or {}, 'construido_em': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self._alterado = True
+
+    def salvar(self):
+        """Grava o manifesto (de forma atômica) se algo mudou."""
+        if not self._alterado: return
+        caminho_tmp = Path(f"{self.caminho}.tmp")
+        with open(caminho_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'arquivos': self.arquivos, 'artefatos': self.artefatos}, f, indent=2, sort_keys=True)
+        os.replace(caminho_tmp, self.caminho)
+        self._alterado = False
@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+
+FORMATO = 1
+MODELO_COMPACTO_DIR = "modelo_recrutamento.compacto" # Fica ao lado do modelo .joblib e deve ser publicado junto com ele
+TERMOS_POR_LOTE = 200_000
+_ARRAYS = ('vocabulario', 'colunas', 'idf', 'coef')
+
+
+def _remover_acentos_unicode(texto):
+    # Mesmo comportamento do `strip_accents='unicode'` do scikit-learn
+    try:
+        texto.encode('ASCII', errors='strict')
+        return texto
+    except UnicodeEncodeError:
+        return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def _remover_acentos_ascii(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('ASCII')
+
+
+class ModeloCompacto:
+    """
+    TF-IDF + modelo linear binário guardado em arrays: vocabulário ordenado (busca binária com
+    `searchsorted`), coluna de cada termo, IDF e coeficientes, mais as configurações do vetorizador
+    em `meta.json`. Os arrays são abertos com memória mapeada, então processos no mesmo host
+    compartilham as páginas, e a inferência reproduz o `predict_proba` do pipeline só com NumPy.
+    """
+
+    def __init__(self, vocabulario, colunas, idf, coef, meta):
+        self.vocabulario = vocabulario
+        self.colunas = colunas
+        self.idf = idf
+        self.coef = coef
+        self.meta = meta
+        self.intercepto = float(meta['intercepto'])
+        self.ngram_min, self.ngram_max = meta['ngram_range']
+        self.n_features = len(coef)
+        self.versao_modelo = meta.get('versao_modelo', '')
+        self._padrao = re.compile(meta['token_pattern'])
+        self._stop_words = frozenset(meta['stop_words'])
+        self._acentos = {'unicode': _remover_acentos_unicode, 'ascii': _remover_acentos_ascii, None: None}[meta['strip_accents']]
+
+    @classmethod
+    def de_pipeline(cls, pipeline, versao_modelo=''):
+        """Extrai os arrays do pipeline (ColumnTransformer com TfidfVectorizer de palavras + classificador linear binário)."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vetorizador = pipeline.named_steps['preprocessor'].named_transformers_.get('tfidf')
+        clf = pipeline.named_steps['clf']
+        if not isinstance(vetorizador, TfidfVectorizer) or vetorizador.analyzer != 'word' or vetorizador.tokenizer or vetorizador.preprocessor:
+            raise ValueError("O formato compacto só suporta pipelines com TfidfVectorizer de palavras sem tokenizador/pré-processador próprios.")
+        if vetorizador.strip_accents not in (None, 'ascii', 'unicode'):
+            raise ValueError("O formato compacto só suporta strip_accents None, 'ascii' ou 'unicode'.")
+        if not hasattr(clf, 'coef_') or clf.coef_.shape[0] != 1:
+            raise ValueError("O formato compacto só suporta classificadores lineares binários.")
+
+        # Um caractere além do maior termo: um termo mais longo, truncado nessa largura, nunca coincide com o vocabulário.
+        termos = sorted(vetorizador.vocabulary_)
+        vocabulario = np.array(termos, dtype=f"<U{max(map(len, termos), default=0) + 1}")
+        colunas = np.array([vetorizador.vocabulary_[t] for t in termos], dtype=np.int32)
+        idf = np.asarray(vetorizador.idf_, dtype=np.float64) if vetorizador.use_idf else None
+        meta = {'formato': FORMATO, 'versao_modelo': versao_modelo, 'lowercase': vetorizador.lowercase, 'strip_accents': vetorizador.strip_accents,
+                'token_pattern': vetorizador.token_pattern, 'ngram_range': list(vetorizador.ngram_range),
+                'stop_words': sorted(vetorizador.get_stop_words() or []), 'binary': vetorizador.binary, 'sublinear_tf': vetorizador.sublinear_tf,
+                'norm': vetorizador.norm, 'intercepto': float(clf.intercept_[0])}
+        return cls(vocabulario, colunas, idf, np.asarray(clf.coef_, dtype=np.float64).ravel(), meta)
+
+    # --- Arquivos ---
+    def salvar(self, diretorio=MODELO_COMPACTO_DIR):
+        """Grava os arrays (.npy) e o meta.json em um diretório temporário e o troca pelo destino."""
+        diretorio = Path(diretorio)
+        diretorio_tmp = Path(f"{diretorio}.tmp")
+        shutil.rmtree(diretorio_tmp, ignore_errors=True)
+        diretorio_tmp.mkdir(parents=True)
+        for nome in _ARRAYS:
+            if getattr(self, nome) is not None: np.save(diretorio_tmp / f"{nome}.npy", getattr(self, nome))
+        with open(diretorio_tmp / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({**self.meta, 'assinatura': self.assinatura()}, f, indent=2, ensure_ascii=False)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_tmp, diretorio)
+
+    @classmethod
+    def carregar(cls, diretorio=MODELO_COMPACTO_DIR):
+        """Abre os arrays com memória mapeada (somente leitura)."""
+        diretorio = Path(diretorio)
+        with open(diretorio / "meta.json", 'r', encoding='utf-8') as f: meta = json.load(f)
+        if meta.get('formato') != FORMATO:
+            raise ValueError(f"Formato de modelo compacto não suportado: {meta.get('formato')}")
+        arrays = {nome: np.load(diretorio / f"{nome}.npy", mmap_mode='r') if (diretorio / f"{nome}.npy").exists() else None for nome in _ARRAYS}
+        return cls(meta=meta, **arrays)
+
+    def assinatura(self):
+        """Hash das configurações de análise de texto e do vocabulário (muda quando as contagens mudariam)."""
+        sha = hashlib.sha256(json.dumps({c: self.meta[c] for c in ('lowercase', 'strip_accents', 'token_pattern', 'ngram_range', 'stop_words')}).encode('utf-8'))
+        sha.update(np.ascontiguousarray(self.vocabulario).tobytes())
+        sha.update(np.ascontiguousarray(self.colunas).tobytes())
+        return sha.hexdigest()[:16]
+
+    # --- Análise de texto (a mesma do TfidfVectorizer) ---
+    def tokens(self, texto):
+        """Tokens após pré-processamento, tokenização e remoção de stop words."""
+        if self.meta['lowercase']: texto = texto.lower()
+        if self._acentos: texto = self._acentos(texto)
+        return [t for t in self._padrao.findall(texto) if t not in self._stop_words]
+
+    def termos(self, tokens):
+        """N-gramas de `ngram_min` a `ngram_max` na ordem do `_word_ngrams` do scikit-learn."""
+        if self.ngram_max == 1: return tokens
+        termos = list(tokens) if self.ngram_min == 1 else []
+        for n in range(max(self.ngram_min, 2), min(self.ngram_max, len(tokens)) + 1):
+            termos.extend(map(' '.join, zip(*(tokens[k:] for k in range(n)))))
+        return termos
+
+    def indices(self, termos):
+        """Coluna de cada termo do vocabulário (-1 para os que não estão nele), por busca binária no array ordenado."""
+        if not termos or not len(self.vocabulario): return np.full(len(termos), -1, dtype=np.int64)
+        candidatos = np.array(termos, dtype=self.vocabulario.dtype)
+        posicoes = np.minimum(np.searchsorted(self.vocabulario, candidatos), len(self.vocabulario) - 1)
+        return np.where(self.vocabulario[posicoes] == candidatos, self.colunas[posicoes], -1)
+
+    def indice(self, termo):
+        coluna = int(self.indices([termo])[0])
+        return None if coluna < 0 else coluna
+
+    def _contar_lote(self, termos, linhas, inicio, fim):
+        colunas = self.indices(termos)
+        validos = colunas >= 0
+        chaves, contagens = np.unique(np.asarray(linhas, dtype=np.int64)[validos] * self.n_features + colunas[validos], return_counts=True)
+        return contagens, chaves % self.n_features, np.bincount(chaves // self.n_features - inicio, minlength=fim - inicio)
+
+    def contar(self, textos):
+        """
+        Contagens brutas no vocabulário como CSR `(data, indices, indptr)`, com as colunas ordenadas
+        em cada linha. Os termos são procurados no vocabulário em lotes de até `TERMOS_POR_LOTE`.
+        """
+        partes, termos_lote, linhas_lote, inicio, n = [], [], [], 0, 0
+        for texto in textos:
+            termos = self.termos(self.tokens(texto))
+            termos_lote.extend(termos)
+            linhas_lote.extend(repeat(n, len(termos)))
+            n += 1
+            if len(termos_lote) >= TERMOS_POR_LOTE:
+                partes.append(self._contar_lote(termos_lote, linhas_lote, inicio, n))
+                termos_lote, linhas_lote, inicio = [], [], n
+        partes.append(self._contar_lote(termos_lote, linhas_lote, inicio, n))
+        data, indices, por_linha = (np.concatenate(p) for p in zip(*partes))
+        return data.astype(np.int64), indices.astype(np.int32), np.concatenate([[0], np.cumsum(por_linha)]).astype(np.int64)
+
+    # --- Pontuação ---
+    def _tfidf(self, data, indices, indptr):
+        """Valores TF-IDF normalizados das contagens em CSR (mesmas operações do TfidfTransformer)."""
+        valores = np.asarray(data, dtype=np.float64)
+        if self.meta['binary']: valores = np.minimum(valores, 1)
+        if self.meta['sublinear_tf']: valores = np.log(valores) + 1
+        if self.idf is not None: valores = valores * self.idf[indices]
+        linhas = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        if self.meta['norm']:
+            normas = np.bincount(linhas, np.abs(valores) if self.meta['norm'] == 'l1' else valores * valores, minlength=len(indptr) - 1)
+            if self.meta['norm'] == 'l2': normas = np.sqrt(normas)
+            normas[normas == 0] = 1
+            valores = valores / normas[linhas]
+        return valores, linhas
+
+    def transformar(self, textos):
+        """Matriz TF-IDF (scipy.sparse CSR) dos textos, igual à saída do pré-processador do pipeline."""
+        import scipy.sparse as sp
+        data, indices, indptr = self.contar(textos)
+        valores, _ = self._tfidf(data, indices, indptr)
+        return sp.csr_matrix((valores, indices, indptr), shape=(len(indptr) - 1, self.n_features))
+
+    def decisoes_de_contagens(self, data, indices, indptr):
+        """Função de decisão (log-odds da classe positiva) a partir das contagens brutas em CSR."""
+        valores, linhas = self._tfidf(data, indices, indptr)
+        return np.bincount(linhas, valores * self.coef[indices], minlength=len(indptr) - 1) + self.intercepto
+
+    def probabilidades_de_contagens(self, data, indices, indptr):
+        """Probabilidade da classe positiva a partir das contagens brutas em CSR."""
+        return 1.0 / (1.0 + np.exp(-self.decisoes_de_contagens(data, indices, indptr)))
+
+    def predict_proba(self, X):
+        """Mesmo contrato do pipeline: `X` é um DataFrame com a coluna `texto_completo` (ou uma lista de textos)."""
+        textos = X['texto_completo'] if hasattr(X, 'columns') else X
+        probabilidades = self.probabilidades_de_contagens(*self.contar(textos))
+        return np.column_stack([1 - probabilidades, probabilidades])
+
+
+def verificar_paridade_e_desempenho(caminho_pipeline, diretorio=MODELO_COMPACTO_DIR, amostras=2000):
+    """Compara o modelo compacto com o `predict_proba` do pipeline nos textos da base e mede carga, memória e tempo."""
+    import joblib
+    import pandas as pd
+    import instrumentacao
+    import armazenamento
+
+    rss = instrumentacao.rss_bytes()
+    inicio = time.perf_counter()
+    compacto = ModeloCompacto.carregar(diretorio)
+    tempo_carga_compacto, rss_compacto = time.perf_counter() - inicio, instrumentacao.rss_bytes() - rss
+    rss = instrumentacao.rss_bytes()
+    inicio = time.perf_counter()
+    pipeline = joblib.load(caminho_pipeline)
+    tempo_carga_pipeline, rss_pipeline = time.perf_counter() - inicio, instrumentacao.rss_bytes() - rss
+
+    import pyarrow.parquet as pq
+    textos = pq.read_table(armazenamento.BASE_TEXTOS_FILENAME, columns=['candidato_texto_completo']).column(0).to_pylist()[:amostras]
+    textos = ['' if t is None else t for t in textos] + ['', 'Python SQL', 'Ação, GESTÃO de projetos — inglês avançado']
+    df = pd.DataFrame({'texto_completo': textos})
+    inicio = time.perf_counter()
+    esperado = pipeline.predict_proba(df)
+    tempo_pipeline = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    obtido = compacto.predict_proba(df)
+    tempo_compacto = time.perf_counter() - inicio
+    return {'textos': len(textos), 'maior_diferenca': float(np.max(np.abs(esperado - obtido))),
+            'tempo_carga_pipeline_s': tempo_carga_pipeline, 'tempo_carga_compacto_s': tempo_carga_compacto,
+            'rss_carga_pipeline_mb': rss_pipeline / 2**20, 'rss_carga_compacto_mb': rss_compacto / 2**20,
+            'tamanho_pipeline_mb': os.path.getsize(caminho_pipeline) / 2**20,
+            'tamanho_compacto_mb': sum(f.stat().st_size for f in Path(diretorio).iterdir()) / 2**20,
+            'tempo_pipeline_s': tempo_pipeline, 'tempo_compacto_s': tempo_compacto}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modelo compacto (arrays com memória mapeada) para a inferência sem scikit-learn.")
+    parser.add_argument('acao', choices=['exportar', 'verificar'], help="'exportar' gera o modelo compacto a partir do .joblib; 'verificar' compara os dois.")
+    parser.add_argument('--modelo', default="modelo_recrutamento.joblib", help="Arquivo .joblib do pipeline.")
+    parser.add_argument('--destino', default=MODELO_COMPACTO_DIR, help="Diretório do modelo compacto.")
+    args = parser.parse_args()
+
+    if args.acao == 'exportar':
+        import joblib
+        import armazenamento
+        ModeloCompacto.de_pipeline(joblib.load(args.modelo), armazenamento.versao_arquivo(args.modelo)).salvar(args.destino)
+        print(f"Modelo compacto salvo em '{args.destino}'.")
+    else:
+        resultado = verificar_paridade_e_desempenho(args.modelo, args.destino)
+        print(json.dumps(resultado, indent=2))
+        if resultado['maior_diferenca'] > 1e-12:
+            raise SystemExit("ERRO: o modelo compacto diverge do predict_proba do pipeline.")
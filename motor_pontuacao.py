@@ -0,0 +1,408 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+
+import armazenamento
+from modelo_compacto import MODELO_COMPACTO_DIR, ModeloCompacto
+
+CACHE_CONTAGENS_FILENAME = armazenamento.DATA_DIR / "contagens_candidatos.npz"
+CACHE_MATRIZ_VAGAS_FILENAME = armazenamento.DATA_DIR / "matriz_vagas.npz"
+
+
+def carregar_modelo(caminho_modelo=armazenamento.MODELO_FILENAME, diretorio_compacto=MODELO_COMPACTO_DIR):
+    """
+    Retorna (modelo, versão): o modelo compacto (memória mapeada, páginas compartilhadas entre processos)
+    quando corresponde ao .joblib; senão o pipeline completo.
+    """
+    versao = armazenamento.versao_arquivo(caminho_modelo)
+    try:
+        compacto = ModeloCompacto.carregar(diretorio_compacto)
+        if compacto.versao_modelo == versao: return compacto, versao
+    except (FileNotFoundError, ValueError):
+        pass
+    import joblib
+    return joblib.load(caminho_modelo), versao
+
+
+class MotorPontuacao:
+    """
+    Reproduz o `predict_proba` do pipeline TF-IDF + LogisticRegression somando contagens.
+
+    As contagens brutas de `vaga + ' ' + candidato` são a soma das contagens de cada parte,
+    exceto pelos n-gramas que cruzam a fronteira entre os dois textos. Por isso, além do vetor
+    de contagens, guardamos os primeiros tokens (após remover stop words) de cada candidato e
+    os últimos tokens da vaga, e somamos os n-gramas de fronteira que existirem no vocabulário.
+
+    Aceita o pipeline treinado ou o `ModeloCompacto`. O pipeline é convertido, de modo que a
+    análise de texto e a pontuação são sempre as do modelo compacto (sem scikit-learn).
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo if isinstance(modelo, ModeloCompacto) else ModeloCompacto.de_pipeline(modelo)
+        self.ngram_min, self.ngram_max = self.modelo.ngram_min, self.modelo.ngram_max
+        self.versao_vocabulario = self.modelo.assinatura()
+
+        self._codigos = None
+        self._contagens = None
+        self._cabecas = None
+
+    # --- Vetorização ---
+    def _tokens_filtrados(self, texto):
+        return self.modelo.tokens(texto)
+
+    def contar(self, textos):
+        """Contagens brutas no vocabulário treinado (as mesmas do CountVectorizer interno do pipeline)."""
+        data, indices, indptr = self.modelo.contar(textos)
+        return sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, self.modelo.n_features))
+
+    def cabecas(self, textos):
+        """Primeiros `ngram_max - 1` tokens filtrados de cada texto, usados nos n-gramas de fronteira."""
+        largura = self.ngram_max - 1
+        return [tuple(self._tokens_filtrados(texto)[:largura]) for texto in textos]
+
+    def _termos_fronteira(self, cauda_vaga, cabeca_candidato):
+        termos = []
+        for n in range(max(self.ngram_min, 2), self.ngram_max + 1):
+            for da_vaga in range(1, n):
+                do_candidato = n - da_vaga
+                if da_vaga > len(cauda_vaga) or do_candidato > len(cabeca_candidato): continue
+                termos.append(' '.join(cauda_vaga[len(cauda_vaga) - da_vaga:] + cabeca_candidato[:do_candidato]))
+        return termos
+
+    # --- Cache de contagens por candidato ---
+    def construir_cache(self, caminho_base=armazenamento.BASE_TEXTOS_FILENAME, caminho_cache=CACHE_CONTAGENS_FILENAME):
+        """Vetoriza uma única vez todos os candidatos da base colunar e grava as contagens em disco."""
+        arquivo = pq.ParquetFile(caminho_base)
+        codigos, blocos, cabecas = [], [], []
+        for i in range(arquivo.num_row_groups):
+            grupo = arquivo.read_row_group(i, columns=['codigo_candidato', 'candidato_texto_completo']).to_pandas()
+            textos = grupo['candidato_texto_completo'].fillna(armazenamento.TEXTO_CANDIDATO_VAZIO).tolist()
+            codigos.extend(grupo['codigo_candidato'].astype(str))
+            blocos.append(self.contar(textos).astype(np.int32))
+            cabecas.extend(self.cabecas(textos))
+        contagens = sp.vstack(blocos, format='csr') if blocos else sp.csr_matrix((0, self.modelo.n_features), dtype=np.int32)
+        largura = max(self.ngram_max - 1, 1)
+        matriz_cabecas = np.array([list(c) + [''] * (largura - len(c)) for c in cabecas], dtype=str).reshape(len(cabecas), largura)
+
+        stat = os.stat(caminho_base)
+        caminho_tmp = Path(f"{caminho_cache}.tmp.npz")
+        np.savez(caminho_tmp, data=contagens.data, indices=contagens.indices, indptr=contagens.indptr, shape=np.array(contagens.shape),
+                 codigos=np.array(codigos, dtype=str), cabecas=matriz_cabecas,
+                 versao_vocabulario=np.array(self.versao_vocabulario), origem=np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64))
+        os.replace(caminho_tmp, caminho_cache)
+        self._definir_cache(codigos, contagens, matriz_cabecas)
+
+    def carregar_cache(self, caminho_base=armazenamento.BASE_TEXTOS_FILENAME, caminho_cache=CACHE_CONTAGENS_FILENAME):
+        """Carrega o cache se ele corresponder ao vocabulário do modelo e à base atual; caso contrário, reconstrói."""
+        if os.path.exists(caminho_cache) and os.path.exists(caminho_base):
+            stat = os.stat(caminho_base)
+            with np.load(caminho_cache) as arquivo:
+                if str(arquivo['versao_vocabulario']) == self.versao_vocabulario and arquivo['origem'].tolist() == [stat.st_size, stat.st_mtime_ns]:
+                    contagens = sp.csr_matrix((arquivo['data'], arquivo['indices'], arquivo['indptr']), shape=tuple(arquivo['shape']))
+                    self._definir_cache(arquivo['codigos'], contagens, arquivo['cabecas'])
+                    return
+        self.construir_cache(caminho_base, caminho_cache)
+
+    def _definir_cache(self, codigos, contagens, cabecas):
+        indice = pd.Index(np.asarray(codigos, dtype=str))
+        unicos = ~indice.duplicated()
+        self._codigos = indice[unicos]
+        self._linhas = np.flatnonzero(unicos)
+        self._contagens = contagens
+        self._cabecas = cabecas
+
+    def em_cache(self, codigos):
+        """Máscara dos códigos de candidato cujas contagens estão no cache (os demais precisam do texto)."""
+        if self._codigos is None: return np.zeros(len(codigos), dtype=bool)
+        return self._codigos.get_indexer(np.asarray(codigos, dtype=str)) >= 0
+
+    # --- Pontuação ---
+    def predict_proba_vaga(self, texto_vaga, df_candidatos):
+        """
+        Probabilidade de match de cada candidato de `df_candidatos` (colunas `codigo_candidato` e
+        `candidato_texto_completo`) para a vaga, equivalente a `pipeline.predict_proba(vaga + ' ' + candidato)[:, 1]`.
+        """
+        if len(df_candidatos) == 0: return np.zeros(0)
+        return self._probabilidades(self._contagens_pares(texto_vaga, df_candidatos))
+
+    def decisoes_vaga(self, texto_vaga, df_candidatos):
+        """Função de decisão (log-odds) de cada candidato para a vaga; `predict_proba_vaga` é o seu sigmoide."""
+        if len(df_candidatos) == 0: return np.zeros(0)
+        X = self._contagens_pares(texto_vaga, df_candidatos)
+        return self.modelo.decisoes_de_contagens(X.data, X.indices, X.indptr)
+
+    def predict_proba_lotes(self, lotes):
+        """
+        `predict_proba_vaga` de vários pares `(texto_vaga, df_candidatos)` com uma única passagem pelo
+        modelo (as contagens de todos os lotes são empilhadas). Retorna uma lista de arrays, na ordem dos lotes.
+        """
+        lotes = [(texto_vaga, df) for texto_vaga, df in lotes]
+        tamanhos = [len(df) for _, df in lotes]
+        if not sum(tamanhos): return [np.zeros(0) for _ in lotes]
+        contagens = sp.vstack([self._contagens_pares(texto_vaga, df) for texto_vaga, df in lotes if len(df)], format='csr')
+        return np.split(self._probabilidades(contagens), np.cumsum(tamanhos)[:-1])
+
+    def contagens_candidatos(self, df_candidatos):
+        """
+        Contagens (CSR, uma linha por candidato) e primeiros tokens de cada candidato de `df_candidatos`:
+        do cache quando o código está nele, senão do texto em `candidato_texto_completo`.
+        """
+        n = len(df_candidatos)
+        codigos = df_candidatos['codigo_candidato'].astype(str).to_numpy()
+        linhas = np.full(n, -1)
+        if self._codigos is not None:
+            posicoes = self._codigos.get_indexer(codigos)
+            linhas[posicoes >= 0] = self._linhas[posicoes[posicoes >= 0]]
+
+        contagens = sp.csr_matrix((n, self.modelo.n_features), dtype=np.float64)
+        cabecas = [()] * n
+        no_cache = np.flatnonzero(linhas >= 0)
+        if len(no_cache):
+            selecao = sp.csr_matrix((np.ones(len(no_cache)), (no_cache, linhas[no_cache])), shape=(n, self._contagens.shape[0]))
+            contagens = contagens + selecao @ self._contagens
+            for i in no_cache: cabecas[i] = tuple(t for t in self._cabecas[linhas[i]] if t)
+        fora_do_cache = np.flatnonzero(linhas < 0)
+        if len(fora_do_cache):
+            textos = df_candidatos['candidato_texto_completo'].iloc[fora_do_cache].tolist()
+            selecao = sp.csr_matrix((np.ones(len(fora_do_cache)), (fora_do_cache, np.arange(len(fora_do_cache)))), shape=(n, len(fora_do_cache)))
+            contagens = contagens + selecao @ self.contar(textos)
+            for i, cabeca in zip(fora_do_cache, self.cabecas(textos)): cabecas[i] = cabeca
+        return contagens, cabecas
+
+    def _contagens_pares(self, texto_vaga, df_candidatos):
+        n = len(df_candidatos)
+        contagens, cabecas = self.contagens_candidatos(df_candidatos)
+
+        # Contagens da vaga (tokenizada uma única vez) somadas a cada linha, mais os n-gramas de fronteira.
+        contagens_vaga = self.contar([texto_vaga])
+        cauda_vaga = tuple(self._tokens_filtrados(texto_vaga)[-(self.ngram_max - 1):]) if self.ngram_max > 1 else ()
+        termos_fronteira, linhas_fronteira = [], []
+        if cauda_vaga:
+            for i, cabeca in enumerate(cabecas):
+                termos = self._termos_fronteira(cauda_vaga, cabeca)
+                termos_fronteira.extend(termos)
+                linhas_fronteira.extend([i] * len(termos))
+        # Todos os termos de fronteira são procurados no vocabulário de uma vez
+        colunas_fronteira = self.modelo.indices(termos_fronteira)
+        no_vocabulario = colunas_fronteira >= 0
+        linhas_fronteira, colunas_fronteira = np.asarray(linhas_fronteira, dtype=np.int64)[no_vocabulario], colunas_fronteira[no_vocabulario]
+        repeticao = sp.csr_matrix(np.ones((n, 1)))
+        fronteira = sp.csr_matrix((np.ones(len(linhas_fronteira)), (linhas_fronteira, colunas_fronteira)), shape=contagens.shape)
+        return contagens + repeticao @ contagens_vaga + fronteira
+
+    def _probabilidades(self, contagens):
+        X = sp.csr_matrix(contagens, dtype=np.float64)
+        return self.modelo.probabilidades_de_contagens(X.data, X.indices, X.indptr)
+
+
+class MatrizVagas:
+    """
+    Pontua candidatos contra todas as vagas de uma vez (direção candidato -> vagas).
+
+    Com TF-IDF de contagens brutas, a decisão de um par é `b + (w·a + w·y) / ||a + y||`, onde `a` e `y`
+    são as contagens da vaga e do candidato ponderadas pelo IDF, mais os n-gramas de fronteira. A matriz
+    de contagens das vagas, `w·a` e `||a||²` são calculados uma única vez; para um lote de candidatos,
+    o único termo que acopla os dois lados (`a·y`, dentro da norma L2) sai de um produto esparso com a
+    matriz das vagas. Os n-gramas de fronteira são somados como correção, par a par.
+    """
+
+    def __init__(self, motor):
+        modelo = motor.modelo
+        if modelo.meta['binary'] or modelo.meta['sublinear_tf'] or modelo.meta['norm'] not in ('l2', 'l1', None):
+            raise ValueError("A matriz de vagas só suporta TF-IDF com contagens brutas e norma L2, L1 ou nenhuma.")
+        self.motor = motor
+        self.modelo = modelo
+        self.norma = modelo.meta['norm']
+        self.idf = np.asarray(modelo.idf, dtype=np.float64) if modelo.idf is not None else np.ones(modelo.n_features)
+        self.pesos = np.asarray(modelo.coef, dtype=np.float64) * self.idf
+        self.codigos_vagas = None
+
+    # --- Matriz das vagas ---
+    def construir(self, df_vagas, caminho_cache=CACHE_MATRIZ_VAGAS_FILENAME):
+        """Vetoriza uma única vez o `perfil_vaga_texto` de todas as vagas e grava as contagens em disco."""
+        textos = df_vagas['perfil_vaga_texto'].fillna('').tolist()
+        contagens = self.motor.contar(textos).astype(np.int32)
+        largura = max(self.motor.ngram_max - 1, 1)
+        caudas = [list(self.motor._tokens_filtrados(texto)[-largura:]) if self.motor.ngram_max > 1 else [] for texto in textos]
+        matriz_caudas = np.array([[''] * (largura - len(c)) + c for c in caudas], dtype=str).reshape(len(caudas), largura)
+
+        caminho_tmp = Path(f"{caminho_cache}.tmp.npz")
+        np.savez(caminho_tmp, data=contagens.data, indices=contagens.indices, indptr=contagens.indptr, shape=np.array(contagens.shape),
+                 codigos=np.asarray(df_vagas['codigo_vaga'].astype(str), dtype=str), caudas=matriz_caudas,
+                 versao_vocabulario=np.array(self.motor.versao_vocabulario), origem=np.array(self._origem(df_vagas)))
+        os.replace(caminho_tmp, caminho_cache)
+        self._definir(df_vagas['codigo_vaga'].astype(str).to_numpy(), contagens, matriz_caudas)
+        return self
+
+    def carregar(self, df_vagas, caminho_cache=CACHE_MATRIZ_VAGAS_FILENAME):
+        """Carrega a matriz se ela corresponder ao vocabulário do modelo e às vagas atuais; caso contrário, reconstrói."""
+        if os.path.exists(caminho_cache):
+            with np.load(caminho_cache) as arquivo:
+                if str(arquivo['versao_vocabulario']) == self.motor.versao_vocabulario and str(arquivo['origem']) == self._origem(df_vagas):
+                    contagens = sp.csr_matrix((arquivo['data'], arquivo['indices'], arquivo['indptr']), shape=tuple(arquivo['shape']))
+                    self._definir(arquivo['codigos'], contagens, arquivo['caudas'])
+                    return self
+        return self.construir(df_vagas, caminho_cache)
+
+    @staticmethod
+    def _origem(df_vagas):
+        sha = hashlib.sha256()
+        for codigo, texto in zip(df_vagas['codigo_vaga'].astype(str), df_vagas['perfil_vaga_texto'].fillna('')):
+            sha.update(codigo.encode('utf-8') + b'\0' + texto.encode('utf-8') + b'\0')
+        return sha.hexdigest()[:16]
+
+    def _definir(self, codigos, contagens, caudas):
+        self.codigos_vagas = np.asarray(codigos, dtype=str)
+        self.contagens = contagens
+        ponderadas = contagens.astype(np.float64) @ sp.diags(self.idf)
+        self._soma_pesos = ponderadas @ (self.pesos / self.idf)
+        if self.norma == 'l2':
+            self._quadrados = np.asarray(ponderadas.multiply(ponderadas).sum(axis=1)).ravel()
+            # a·y = y_contagens · (idf² * a_contagens): transposta pré-calculada para o produto com os candidatos
+            self._acoplamento = (ponderadas @ sp.diags(self.idf)).T.tocsr()
+        elif self.norma == 'l1':
+            self._somas = np.asarray(ponderadas.sum(axis=1)).ravel()
+        # Vagas agrupadas pelos últimos tokens: os n-gramas de fronteira dependem só da cauda e da cabeça do candidato
+        chaves = ['\0'.join(t for t in linha if t) for linha in caudas]
+        unicas, grupo = np.unique(np.asarray(chaves, dtype=str), return_inverse=True)
+        self._caudas = [tuple(c.split('\0')) if c else () for c in unicas]
+        self._ordem_grupos = np.argsort(grupo, kind='stable')
+        self._inicio_grupos = np.concatenate([[0], np.cumsum(np.bincount(grupo, minlength=len(unicas)))])
+
+    # --- Pontuação ---
+    def decisoes(self, df_candidatos):
+        """Matriz (candidatos x vagas) da função de decisão; mesmo contrato de colunas de `MotorPontuacao.predict_proba_vaga`."""
+        contagens, cabecas = self.motor.contagens_candidatos(df_candidatos)
+        contagens = sp.csr_matrix(contagens, dtype=np.float64)
+        numerador = (contagens @ self.pesos)[:, None] + self._soma_pesos[None, :]
+        if self.norma == 'l2':
+            ponderadas = contagens @ sp.diags(self.idf)
+            normas = np.asarray(ponderadas.multiply(ponderadas).sum(axis=1)) + self._quadrados[None, :] + 2 * (contagens @ self._acoplamento).toarray()
+        elif self.norma == 'l1':
+            normas = (contagens @ self.idf)[:, None] + self._somas[None, :]
+
+        linhas, vagas, colunas, repeticoes = self._fronteira(cabecas)
+        if len(colunas):
+            np.add.at(numerador, (linhas, vagas), self.pesos[colunas] * repeticoes)
+            if self.norma == 'l2':
+                # (x + m·idf)² - x² para x = idf * (contagem da vaga + contagem do candidato)
+                brutas = np.asarray(self.contagens[vagas, colunas]).ravel() + np.asarray(contagens[linhas, colunas]).ravel()
+                np.add.at(normas, (linhas, vagas), self.idf[colunas] ** 2 * repeticoes * (2 * brutas + repeticoes))
+            elif self.norma == 'l1':
+                np.add.at(normas, (linhas, vagas), self.idf[colunas] * repeticoes)
+        if self.norma is None: return numerador + self.modelo.intercepto
+        if self.norma == 'l2': normas = np.sqrt(normas)
+        normas[normas == 0] = 1
+        return numerador / normas + self.modelo.intercepto
+
+    def predict_proba(self, df_candidatos):
+        """Matriz (candidatos x vagas) de probabilidades de match, na ordem de `codigos_vagas`."""
+        return 1.0 / (1.0 + np.exp(-self.decisoes(df_candidatos)))
+
+    def _fronteira(self, cabecas):
+        """N-gramas de fronteira no vocabulário como (linha do candidato, vaga, coluna, repetições)."""
+        termos, linhas, grupos = [], [], []
+        for i, cabeca in enumerate(cabecas):
+            if not cabeca: continue
+            for g, cauda in enumerate(self._caudas):
+                if not cauda: continue
+                for termo in self.motor._termos_fronteira(cauda, cabeca):
+                    termos.append(termo)
+                    linhas.append(i)
+                    grupos.append(g)
+        colunas = self.modelo.indices(termos)
+        validos = colunas >= 0
+        linhas, grupos, colunas = np.asarray(linhas, dtype=np.int64)[validos], np.asarray(grupos, dtype=np.int64)[validos], colunas[validos]
+        # Cada termo vale para todas as vagas do grupo da cauda
+        tamanhos = self._inicio_grupos[grupos + 1] - self._inicio_grupos[grupos]
+        deslocamentos = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+        vagas = self._ordem_grupos[np.repeat(self._inicio_grupos[grupos], tamanhos) + deslocamentos]
+        linhas, colunas = np.repeat(linhas, tamanhos), np.repeat(colunas, tamanhos)
+        if not len(colunas): return linhas, vagas, colunas, np.zeros(0)
+        chaves, repeticoes = np.unique(np.column_stack([linhas, vagas, colunas]), axis=0, return_counts=True)
+        return chaves[:, 0], chaves[:, 1], chaves[:, 2], repeticoes.astype(np.float64)
+
+
+def verificar_paridade_e_desempenho(pipeline, vagas, prospects, limite_vagas=20):
+    """Compara o motor com `pipeline.predict_proba` nas vagas com prospects e mede o tempo de cada caminho."""
+    motor = MotorPontuacao(pipeline)
+    inicio = time.perf_counter()
+    motor.carregar_cache()
+    tempo_cache = time.perf_counter() - inicio
+
+    maior_diferenca, tempo_pipeline, tempo_motor, pares = 0.0, 0.0, 0.0, 0
+    for _, vaga in vagas.iterrows():
+        ids = [str(p['codigo']) for p in prospects.get(vaga['codigo_vaga'], {}).get('prospects', [])]
+        df = armazenamento.buscar_textos_candidatos(ids)
+        if df.empty: continue
+
+        inicio = time.perf_counter()
+        esperado = pipeline.predict_proba(pd.DataFrame({'texto_completo': vaga['perfil_vaga_texto'] + ' ' + df['candidato_texto_completo']}))[:, 1]
+        tempo_pipeline += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        obtido = motor.predict_proba_vaga(vaga['perfil_vaga_texto'], df)
+        tempo_motor += time.perf_counter() - inicio
+
+        maior_diferenca = max(maior_diferenca, float(np.max(np.abs(esperado - obtido))))
+        pares += len(df)
+        limite_vagas -= 1
+        if limite_vagas == 0: break
+    return {'pares': pares, 'maior_diferenca': maior_diferenca, 'tempo_cache_s': tempo_cache,
+            'tempo_pipeline_s': tempo_pipeline, 'tempo_motor_s': tempo_motor,
+            'aceleracao': tempo_pipeline / tempo_motor if tempo_motor else None}
+
+
+def verificar_matriz_vagas(pipeline, vagas, limite_candidatos=50):
+    """Compara a `MatrizVagas` com o motor (um par vaga x candidato por linha) e mede o tempo de cada caminho."""
+    motor = MotorPontuacao(pipeline)
+    motor.carregar_cache()
+    inicio = time.perf_counter()
+    matriz = MatrizVagas(motor).carregar(vagas)
+    tempo_matriz = time.perf_counter() - inicio
+    df = pd.DataFrame({'codigo_candidato': motor._codigos[:limite_candidatos]})
+
+    inicio = time.perf_counter()
+    obtido = matriz.predict_proba(df)
+    tempo_lote = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    um_a_um = np.vstack([matriz.predict_proba(df.iloc[[i]]) for i in range(len(df))])
+    tempo_um_a_um = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    esperado = np.column_stack(motor.predict_proba_lotes([(texto, df) for texto in vagas['perfil_vaga_texto']]))
+    tempo_motor = time.perf_counter() - inicio
+    return {'candidatos': len(df), 'vagas': len(matriz.codigos_vagas), 'tempo_matriz_s': tempo_matriz,
+            'maior_diferenca': float(np.max(np.abs(esperado - obtido))) if obtido.size else 0.0,
+            'maior_diferenca_um_a_um': float(np.max(np.abs(um_a_um - obtido))) if obtido.size else 0.0,
+            'tempo_lote_s': tempo_lote, 'tempo_um_a_um_s': tempo_um_a_um, 'tempo_motor_s': tempo_motor}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache de contagens por candidato para a pontuação rápida das vagas.")
+    parser.add_argument('acao', choices=['construir', 'verificar', 'vagas'], help="'construir' gera o cache; 'verificar' compara com o pipeline e mede o ganho; 'vagas' verifica a pontuação candidato -> todas as vagas.")
+    parser.add_argument('--vagas', type=int, default=20, help="Número de vagas usadas na verificação.")
+    parser.add_argument('--candidatos', type=int, default=50, help="Número de candidatos usados na verificação da matriz de vagas.")
+    args = parser.parse_args()
+
+    import joblib
+    pipeline = joblib.load(armazenamento.MODELO_FILENAME)
+    if args.acao == 'construir':
+        MotorPontuacao(pipeline).construir_cache()
+        print(f"Cache de contagens salvo em '{CACHE_CONTAGENS_FILENAME}'.")
+    elif args.acao == 'vagas':
+        resultado = verificar_matriz_vagas(pipeline, armazenamento.carregar_vagas(), args.candidatos)
+        print(json.dumps(resultado, indent=2))
+        if max(resultado['maior_diferenca'], resultado['maior_diferenca_um_a_um']) > 1e-9:
+            raise SystemExit("ERRO: a matriz de vagas diverge do motor.")
+    else:
+        resultado = verificar_paridade_e_desempenho(pipeline, armazenamento.carregar_vagas(), armazenamento.carregar_json(armazenamento.PROSPECTS_FILENAME), args.vagas)
+        print(json.dumps(resultado, indent=2))
+        if resultado['maior_diferenca'] > 1e-9:
+            raise SystemExit("ERRO: o motor diverge do predict_proba do pipeline.")
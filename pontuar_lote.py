@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import armazenamento
+from motor_pontuacao import MotorPontuacao, carregar_modelo
+
+# Estado de cada processo do pool: o modelo e o motor são carregados uma vez por worker. O modelo
+# compacto é aberto com memória mapeada, então os workers compartilham as páginas dos arrays.
+_modelo = None
+_motor = None
+
+
+def _iniciar_worker(caminho_modelo):
+    global _modelo, _motor
+    _modelo, _ = carregar_modelo(caminho_modelo)
+    try:
+        _motor = MotorPontuacao(_modelo)
+        _motor.carregar_cache()
+    except ValueError:
+        _motor = None
+
+
+def _pontuar_lote_vagas(vagas):
+    """Pontua todos os prospects de um lote de vagas `[(codigo_vaga, texto_vaga, ids), ...]`."""
+    resultados = []
+    for codigo_vaga, texto_vaga, ids in vagas:
+        # Com o motor, os textos só são lidos para os candidatos sem contagens no cache
+        df = armazenamento.buscar_textos_candidatos(ids, colunas=('codigo_candidato', 'nome_candidato'))
+        if df.empty: continue
+        sem_contagens = ~_motor.em_cache(df['codigo_candidato']) if _motor is not None else np.ones(len(df), dtype=bool)
+        if sem_contagens.any():
+            df_textos = armazenamento.buscar_textos_candidatos(df['codigo_candidato'][sem_contagens].tolist(), colunas=('codigo_candidato', 'candidato_texto_completo'))
+            df = df.merge(df_textos.drop_duplicates('codigo_candidato'), on='codigo_candidato', how='left')
+            df['candidato_texto_completo'] = df['candidato_texto_completo'].fillna(armazenamento.TEXTO_CANDIDATO_VAZIO)
+        if _motor is not None:
+            probs = _motor.predict_proba_vaga(texto_vaga, df)
+        else:
+            probs = _modelo.predict_proba(pd.DataFrame({'texto_completo': texto_vaga + ' ' + df['candidato_texto_completo']}))[:, 1]
+        df = df[['codigo_candidato', 'nome_candidato']].assign(codigo_vaga=str(codigo_vaga), probabilidade=probs, score=(probs * 100).astype(int))
+        df = df.sort_values('probabilidade', ascending=False, kind='mergesort')
+        df['posicao'] = np.arange(1, len(df) + 1, dtype=np.int32)
+        resultados.append(df)
+    return pd.concat(resultados, ignore_index=True) if resultados else None
+
+
+def pontuar_todas_as_vagas(caminho_modelo=armazenamento.MODELO_FILENAME, workers=None, vagas_por_tarefa=8):
+    """Pontua todos os pares (vaga, prospect) em paralelo e grava a tabela de rankings da versão do modelo."""
+    versao_modelo = armazenamento.versao_arquivo(caminho_modelo)
+    assinatura_dados = armazenamento.assinatura_dados_ranking()
+    df_vagas = armazenamento.carregar_vagas()
+    prospects = armazenamento.carregar_json(armazenamento.PROSPECTS_FILENAME) or {}
+
+    tarefas = []
+    for _, vaga in df_vagas.iterrows():
+        ids = [str(p['codigo']) for p in prospects.get(vaga['codigo_vaga'], {}).get('prospects', [])]
+        if ids: tarefas.append((vaga['codigo_vaga'], vaga['perfil_vaga_texto'], ids))
+    lotes = [tarefas[i:i + vagas_por_tarefa] for i in range(0, len(tarefas), vagas_por_tarefa)]
+
+    # O cache de contagens é gerado antes do pool para que os workers apenas o leiam.
+    _iniciar_worker(caminho_modelo)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(caminho_modelo,)) as executor:
+        partes = [df for df in executor.map(_pontuar_lote_vagas, lotes) if df is not None]
+
+    colunas = ['codigo_vaga', 'posicao', 'codigo_candidato', 'nome_candidato', 'score', 'probabilidade']
+    df_rankings = pd.concat(partes, ignore_index=True)[colunas] if partes else pd.DataFrame(columns=colunas)
+    df_rankings = df_rankings.sort_values(['codigo_vaga', 'posicao'], kind='mergesort').reset_index(drop=True)
+
+    tabela = pa.Table.from_pandas(df_rankings, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b'versao_modelo': versao_modelo.encode('utf-8'), b'assinatura_dados': assinatura_dados.encode('utf-8')})
+    caminho = armazenamento.caminho_rankings(versao_modelo)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho_tmp = caminho.with_suffix('.tmp')
+    pq.write_table(tabela, caminho_tmp, row_group_size=50_000)
+    os.replace(caminho_tmp, caminho)
+    return caminho, len(tarefas), len(df_rankings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pontua offline todos os pares vaga x prospect e grava os rankings por versão do modelo.")
+    parser.add_argument('--modelo', default=armazenamento.MODELO_FILENAME, help="Arquivo .joblib do modelo.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    parser.add_argument('--vagas-por-tarefa', type=int, default=8, help="Vagas enviadas a cada worker por tarefa.")
+    args = parser.parse_args()
+
+    if not armazenamento.base_textos_valida():
+        armazenamento.construir_base_textos()
+    inicio = time.perf_counter()
+    caminho, total_vagas, total_pares = pontuar_todas_as_vagas(args.modelo, args.workers, args.vagas_por_tarefa)
+    print(f"{total_pares} pares de {total_vagas} vagas pontuados em {time.perf_counter() - inicio:.1f}s.")
+    print(f"Rankings salvos em '{caminho}'.")
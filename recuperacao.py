@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+import armazenamento
+
+INDICE_INVERTIDO_FILENAME = armazenamento.DATA_DIR / "indice_invertido.npz"
+FRACAO_MAXIMA_POSTINGS = 0.25  # Listas de termos presentes em mais candidatos que isso entram só no limite (MaxScore)
+TAMANHO_BLOCO_RESCORE = 128
+MARGEM_LIMITE = 1e-9  # Folga numérica ao comparar limites superiores com scores exatos
+
+
+class IndiceInvertido:
+    """
+    Recuperação dos melhores candidatos de toda a base para uma vaga, com resultado idêntico à
+    pontuação exaustiva.
+
+    O modelo pontua o TF-IDF de `vaga + ' ' + candidato`, então o score não é uma soma de pesos por
+    termo: com a norma L2, a decisão é `b + (w·a + w·y) / ||a + y||`, onde `a` e `y` são os vetores
+    ponderados pelo IDF da vaga e do candidato. `w·y` e `||y||²` são pré-calculados por candidato
+    (postings ponderadas pelos coeficientes), e `||a + y||² = ||a||² + ||y||² + 2 a·y` só depende dos
+    termos da vaga: `a·y` vem das listas invertidas desses termos. As listas mais longas (acima de
+    `fracao_maxima_postings` da base) não são percorridas; a contribuição delas entra apenas como
+    limite (Cauchy-Schwarz), no estilo MaxScore.
+
+    O limite é calculado para todos os candidatos em uma passada vetorizada (O(N) por vaga, sem o
+    término antecipado por lista do WAND): o que se poda é a repontuação exata. Os candidatos são
+    repontuados pelo motor em ordem decrescente de limite até que o k-ésimo score exato supere o
+    próximo limite, e as k linhas retornadas podem ser repontuadas a partir dos textos pelo modelo
+    completo (`buscar(..., modelo=pipeline)`).
+    """
+
+    def __init__(self, motor):
+        modelo = motor.modelo
+        if modelo.meta['binary'] or modelo.meta['sublinear_tf'] or modelo.meta['norm'] not in ('l2', 'l1', None):
+            raise ValueError("O índice invertido só suporta TF-IDF com contagens brutas e norma L2, L1 ou nenhuma.")
+        if motor._contagens is None:
+            raise ValueError("O cache de contagens do motor não foi carregado.")
+        self.motor = motor
+        self.modelo = modelo
+        self.idf = np.asarray(modelo.idf, dtype=np.float64) if modelo.idf is not None else np.ones(modelo.n_features)
+        self.pesos = np.asarray(modelo.coef, dtype=np.float64) * self.idf
+        # N-gramas que podem cruzar a fronteira entre vaga e candidato (cada um soma 1 à contagem de um termo)
+        self.n_fronteira = sum(n - 1 for n in range(max(modelo.ngram_min, 2), modelo.ngram_max + 1))
+        sha = hashlib.sha256(motor.versao_vocabulario.encode('utf-8'))
+        sha.update(self.pesos.tobytes())
+        sha.update(json.dumps(modelo.meta['norm']).encode('utf-8'))
+        self.versao = sha.hexdigest()[:16]
+        self.codigos = None
+
+    # --- Construção ---
+    def construir(self, caminho=INDICE_INVERTIDO_FILENAME):
+        """Gera as listas invertidas (CSC das contagens) e os termos por candidato a partir do cache do motor."""
+        linhas = self.motor._linhas
+        contagens = self.motor._contagens[linhas].astype(np.float64)
+        ponderadas = contagens @ sp.diags(self.idf)
+        soma_pesos = ponderadas @ (self.pesos / self.idf)
+        if self.modelo.meta['norm'] == 'l2': norma = np.sqrt(np.asarray(ponderadas.multiply(ponderadas).sum(axis=1)).ravel())
+        else: norma = np.asarray(ponderadas.sum(axis=1)).ravel()
+        postings = self.motor._contagens[linhas].tocsc()
+        postings.sort_indices()
+
+        caminho_tmp = Path(f"{caminho}.tmp.npz")
+        np.savez(caminho_tmp, data=postings.data, indices=postings.indices, indptr=postings.indptr, shape=np.array(postings.shape),
+                 codigos=np.asarray(self.motor._codigos, dtype=str), soma_pesos=soma_pesos, norma=norma,
+                 versao=np.array(self.versao), origem=np.array(self._origem()))
+        os.replace(caminho_tmp, caminho)
+        self._definir(np.asarray(self.motor._codigos, dtype=str), postings, soma_pesos, norma)
+
+    def carregar(self, caminho=INDICE_INVERTIDO_FILENAME):
+        """Carrega o índice se ele corresponder ao modelo e ao cache atuais; caso contrário, reconstrói."""
+        if os.path.exists(caminho):
+            with np.load(caminho) as arquivo:
+                if str(arquivo['versao']) == self.versao and str(arquivo['origem']) == self._origem():
+                    postings = sp.csc_matrix((arquivo['data'], arquivo['indices'], arquivo['indptr']), shape=tuple(arquivo['shape']))
+                    self._definir(arquivo['codigos'], postings, arquivo['soma_pesos'], arquivo['norma'])
+                    return self
+        self.construir(caminho)
+        return self
+
+    def _origem(self):
+        # O índice deriva do cache de contagens; qualquer mudança na base muda os códigos ou as contagens
+        return hashlib.sha256(np.asarray(self.motor._codigos, dtype=str).tobytes() + np.asarray(self.motor._contagens.indptr).tobytes()).hexdigest()[:16]
+
+    def _definir(self, codigos, postings, soma_pesos, norma):
+        self.codigos = np.asarray(codigos, dtype=str)
+        self.postings = postings
+        self.tamanho_postings = np.diff(postings.indptr)
+        self.soma_pesos = np.asarray(soma_pesos, dtype=np.float64)
+        self.norma = np.asarray(norma, dtype=np.float64)
+
+    # --- Consulta ---
+    def limites_superiores(self, texto_vaga, fracao_maxima_postings=FRACAO_MAXIMA_POSTINGS):
+        """Limite superior da decisão (log-odds) de cada candidato da base para a vaga, e o número de postings lidas."""
+        data_vaga, colunas_vaga, _ = self.modelo.contar([texto_vaga])
+        a = data_vaga * self.idf[colunas_vaga]
+        numerador = float(self.pesos[colunas_vaga] @ data_vaga) + self.soma_pesos
+        # Cada n-grama de fronteira soma no máximo o maior peso positivo ao numerador e `idf` à norma
+        numerador += self.n_fronteira * max(float(self.pesos.max(initial=0.0)), 0.0)
+        folga_norma = self.n_fronteira * float(self.idf.max(initial=0.0))
+        norma = self.modelo.meta['norm']
+        if norma is None:
+            return self.modelo.intercepto + numerador, 0
+
+        if norma == 'l1':
+            minima = float(a.sum()) + self.norma
+            maxima = minima + folga_norma
+            lidas = 0
+        else:
+            # a·y: listas curtas percorridas exatamente; as longas limitadas por ||a_longas|| * ||y||
+            curtas = self.tamanho_postings[colunas_vaga] <= fracao_maxima_postings * len(self.codigos)
+            produto = np.zeros(len(self.codigos))
+            if curtas.any():
+                produto = self.postings[:, colunas_vaga[curtas]] @ (a[curtas] * self.idf[colunas_vaga[curtas]])
+            resto = float(np.sqrt((a[~curtas] ** 2).sum()))
+            base = float((a ** 2).sum()) + self.norma ** 2
+            minima = np.sqrt(base + 2 * produto)
+            maxima = np.sqrt(base + 2 * (produto + resto * self.norma)) + folga_norma
+            lidas = int(self.tamanho_postings[colunas_vaga[curtas]].sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            limite = np.where(numerador >= 0, numerador / minima, numerador / maxima)
+        limite[minima == 0] = np.inf  # Vaga e candidato sem termos do vocabulário: sempre repontuados
+        return self.modelo.intercepto + limite, lidas
+
+    def buscar(self, texto_vaga, k=20, fracao_maxima_postings=FRACAO_MAXIMA_POSTINGS, tamanho_bloco=TAMANHO_BLOCO_RESCORE, modelo=None):
+        """
+        Os `k` candidatos de maior probabilidade para a vaga em toda a base, com as probabilidades exatas
+        do motor (as mesmas do `predict_proba` do pipeline). Com `modelo` (pipeline ou modelo compacto),
+        as `k` linhas retornadas são repontuadas por `modelo.predict_proba` a partir dos textos.
+        Retorna (DataFrame, estatísticas da busca).
+        """
+        inicio = time.perf_counter()
+        limites, lidas = self.limites_superiores(texto_vaga, fracao_maxima_postings)
+        ordem = np.argsort(-limites, kind='stable')
+        tempo_limites = time.perf_counter() - inicio
+
+        melhores_indices, melhores_decisoes = np.zeros(0, dtype=np.int64), np.zeros(0)
+        repontuados = 0
+        while repontuados < len(ordem):
+            if len(melhores_decisoes) >= k and melhores_decisoes[k - 1] >= limites[ordem[repontuados]] + MARGEM_LIMITE: break
+            bloco = ordem[repontuados:repontuados + tamanho_bloco]
+            repontuados += len(bloco)
+            decisoes = self.motor.decisoes_vaga(texto_vaga, pd.DataFrame({'codigo_candidato': self.codigos[bloco]}))
+            melhores_indices = np.concatenate([melhores_indices, bloco])
+            melhores_decisoes = np.concatenate([melhores_decisoes, decisoes])
+            selecao = np.argsort(-melhores_decisoes, kind='stable')[:k]
+            melhores_indices, melhores_decisoes = melhores_indices[selecao], melhores_decisoes[selecao]
+
+        codigos = self.codigos[melhores_indices]
+        probabilidades = 1.0 / (1.0 + np.exp(-melhores_decisoes))
+        diferenca_modelo = None
+        if modelo is not None and len(codigos):
+            textos = armazenamento.buscar_textos_candidatos(codigos.tolist(), colunas=('codigo_candidato', 'candidato_texto_completo'))
+            textos = textos.drop_duplicates('codigo_candidato').set_index('codigo_candidato')['candidato_texto_completo'] if not textos.empty else pd.Series(dtype=object)
+            textos = textos.reindex(codigos).fillna(armazenamento.TEXTO_CANDIDATO_VAZIO).to_numpy()
+            do_modelo = modelo.predict_proba(pd.DataFrame({'texto_completo': texto_vaga + ' ' + textos}))[:, 1]
+            diferenca_modelo = float(np.max(np.abs(do_modelo - probabilidades)))
+            ordem_final = np.argsort(-do_modelo, kind='stable')
+            codigos, probabilidades = codigos[ordem_final], do_modelo[ordem_final]
+        df = pd.DataFrame({'codigo_candidato': codigos, 'probabilidade': probabilidades,
+                           'score': (probabilidades * 100).astype(int), 'posicao': np.arange(1, len(codigos) + 1, dtype=np.int32)})
+        estatisticas = {'candidatos': len(self.codigos), 'repontuados': repontuados, 'postings_lidas': lidas,
+                        'postings_total': int(self.postings.nnz), 'diferenca_modelo': diferenca_modelo,
+                        'tempo_limites_s': tempo_limites, 'tempo_total_s': time.perf_counter() - inicio}
+        return df, estatisticas
+
+
+def verificar_contra_forca_bruta(limite_vagas=20, k=20):
+    """Compara a busca pelo índice com a pontuação exaustiva de toda a base (motor e pipeline) e mede o tempo de cada uma."""
+    import joblib
+    from motor_pontuacao import MotorPontuacao
+    pipeline = joblib.load(armazenamento.MODELO_FILENAME)
+    motor = MotorPontuacao(pipeline)
+    motor.carregar_cache()
+    inicio = time.perf_counter()
+    indice = IndiceInvertido(motor).carregar()
+    tempo_indice = time.perf_counter() - inicio
+    todos = pd.DataFrame({'codigo_candidato': indice.codigos})
+
+    relatorio = {'candidatos': len(indice.codigos), 'tempo_carga_indice_s': tempo_indice, 'vagas': 0, 'divergencias': 0,
+                 'maior_diferenca_pipeline': 0.0, 'tempo_indice_s': [], 'tempo_forca_bruta_s': [], 'repontuados': [], 'fracao_postings_lidas': []}
+    for texto_vaga in armazenamento.carregar_vagas()['perfil_vaga_texto'].head(limite_vagas):
+        df, estatisticas = indice.buscar(texto_vaga, k)
+        inicio = time.perf_counter()
+        exaustivo = motor.predict_proba_vaga(texto_vaga, todos)
+        relatorio['tempo_forca_bruta_s'].append(time.perf_counter() - inicio)
+        # O k-ésimo melhor score exaustivo deve ser igual ao do índice (empates podem trocar os códigos)
+        esperado = np.sort(exaustivo)[::-1][:k]
+        if not np.allclose(esperado, df['probabilidade'].to_numpy(), rtol=0, atol=1e-12): relatorio['divergencias'] += 1
+        # Repontuação final pelo pipeline completo, a partir dos textos
+        _, do_pipeline = indice.buscar(texto_vaga, k, modelo=pipeline)
+        relatorio['maior_diferenca_pipeline'] = max(relatorio['maior_diferenca_pipeline'], do_pipeline['diferenca_modelo'] or 0.0)
+        relatorio['tempo_indice_s'].append(estatisticas['tempo_total_s'])
+        relatorio['repontuados'].append(estatisticas['repontuados'])
+        relatorio['fracao_postings_lidas'].append(estatisticas['postings_lidas'] / max(estatisticas['postings_total'], 1))
+        relatorio['vagas'] += 1
+    for chave in ('tempo_indice_s', 'tempo_forca_bruta_s', 'repontuados', 'fracao_postings_lidas'):
+        valores = relatorio[chave]
+        relatorio[chave] = {'media': float(np.mean(valores)), 'max': float(np.max(valores))} if valores else None
+    return relatorio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice invertido para buscar os melhores candidatos de toda a base para uma vaga.")
+    parser.add_argument('acao', choices=['construir', 'verificar'], help="'construir' gera o índice; 'verificar' compara com a pontuação exaustiva.")
+    parser.add_argument('--vagas', type=int, default=20, help="Número de vagas usadas na verificação.")
+    parser.add_argument('--k', type=int, default=20, help="Número de candidatos retornados por vaga.")
+    args = parser.parse_args()
+
+    if args.acao == 'construir':
+        import joblib
+        from motor_pontuacao import MotorPontuacao
+        motor = MotorPontuacao(joblib.load(armazenamento.MODELO_FILENAME))
+        motor.carregar_cache()
+        IndiceInvertido(motor).construir()
+        print(f"Índice invertido salvo em '{INDICE_INVERTIDO_FILENAME}'.")
+    else:
+        resultado = verificar_contra_forca_bruta(args.vagas, args.k)
+        print(json.dumps(resultado, indent=2))
+        if resultado['divergencias'] or resultado['maior_diferenca_pipeline'] > 1e-9:
+            raise SystemExit("ERRO: a busca pelo índice diverge da pontuação exaustiva.")
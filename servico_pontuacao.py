@@ -0,0 +1,370 @@
+import argparse
+import json
+import os
+import queue
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import instrumentacao
+import armazenamento
+from motor_pontuacao import carregar_modelo
+
+PORTA_PADRAO = 8600
+JANELA_LOTE_S = 0.005  # Espera máxima para juntar requisições concorrentes em um lote
+MAX_PARES_LOTE = 20_000
+TOP_K_PADRAO = 20
+
+
+class ErroRequisicao(Exception):
+    """Requisição inválida (vira uma resposta HTTP com o status indicado)."""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# --- MODELO E DADOS (carregados uma vez, antes do fork dos workers) ---
+class Pontuador:
+    """
+    Estado compartilhado do serviço: modelo, motor com o cache de contagens, explicador, vagas,
+    prospects e nomes dos candidatos. É criado no processo principal; os workers herdam as páginas
+    no fork (e os arrays do modelo compacto, mapeados do disco, são compartilhados pelo sistema).
+    Com o motor, os textos dos candidatos só são lidos para as atribuições ou para quem não está no cache.
+    """
+
+    def __init__(self, caminho_modelo=armazenamento.MODELO_FILENAME):
+        from motor_pontuacao import MotorPontuacao
+        self.modelo, self.versao_modelo = carregar_modelo(caminho_modelo)
+        try:
+            self.motor = MotorPontuacao(self.modelo)
+            self.motor.carregar_cache()
+        except ValueError:
+            self.motor = None
+        self.explicador = None
+        if os.path.exists(armazenamento.EXPLICADOR_FILENAME):
+            from atribuicao import ExplicadorLinear
+            explicador = ExplicadorLinear.carregar(armazenamento.EXPLICADOR_FILENAME)
+            if explicador.versao_modelo == self.versao_modelo: self.explicador = explicador
+        df_vagas = armazenamento.carregar_vagas()
+        self.vagas = dict(zip(df_vagas['codigo_vaga'].astype(str), df_vagas['perfil_vaga_texto']))
+        self.prospects = {str(codigo): [str(p['codigo']) for p in dados.get('prospects', [])] for codigo, dados in (armazenamento.carregar_json(armazenamento.PROSPECTS_FILENAME) or {}).items()}
+        nomes = pq.read_table(armazenamento.BASE_TEXTOS_FILENAME, columns=['codigo_candidato', 'nome_candidato']).to_pandas()
+        self.nomes = nomes.drop_duplicates('codigo_candidato').set_index('codigo_candidato')['nome_candidato']
+
+    def candidatos(self, ids):
+        """DataFrame (código, nome, texto) dos candidatos encontrados na base, sem repetições."""
+        ids = pd.Index(list(dict.fromkeys(str(i) for i in ids)), dtype=object)
+        if self.motor is None: return armazenamento.buscar_textos_candidatos(list(ids))
+        ids = ids[ids.isin(self.nomes.index)]
+        df = pd.DataFrame({'codigo_candidato': ids, 'nome_candidato': self.nomes.reindex(ids).to_numpy(), 'candidato_texto_completo': None})
+        fora_do_cache = ~self.motor.em_cache(df['codigo_candidato'])
+        if fora_do_cache.any(): df.loc[fora_do_cache, 'candidato_texto_completo'] = self.textos(df['codigo_candidato'][fora_do_cache]).to_numpy()
+        return df
+
+    def textos(self, ids):
+        """Textos completos dos candidatos, na ordem de `ids`."""
+        df = armazenamento.buscar_textos_candidatos(list(ids), colunas=('codigo_candidato', 'candidato_texto_completo'))
+        textos = df.set_index('codigo_candidato')['candidato_texto_completo'] if not df.empty else pd.Series(dtype=object)
+        return textos.reindex(list(ids)).fillna(armazenamento.TEXTO_CANDIDATO_VAZIO)
+
+    def predict_proba_lotes(self, lotes):
+        """Probabilidades de vários `(texto_vaga, df_candidatos)` em uma única chamada ao modelo."""
+        if self.motor is not None: return self.motor.predict_proba_lotes(lotes)
+        textos = pd.concat([texto_vaga + ' ' + df['candidato_texto_completo'] for texto_vaga, df in lotes], ignore_index=True)
+        probabilidades = self.modelo.predict_proba(pd.DataFrame({'texto_completo': textos}))[:, 1]
+        return np.split(probabilidades, np.cumsum([len(df) for _, df in lotes])[:-1])
+
+    def atribuicoes(self, textos, top_termos):
+        """Os `top_termos` termos de maior contribuição absoluta (log-odds) de cada texto."""
+        if hasattr(self.modelo, 'transformar'): X = self.modelo.transformar(textos)
+        else: X = self.modelo.named_steps['preprocessor'].transform(pd.DataFrame({'texto_completo': textos}))
+        nomes = self.explicador.feature_names
+        return [[{'termo': nomes[j].replace('tfidf__', ''), 'contribuicao': valor} for j, valor in linha]
+                for linha in self.explicador.maiores_contribuicoes(X, top_termos)]
+
+
+class AgrupadorLotes:
+    """
+    Junta as requisições que chegam dentro de `janela_s` (até `max_pares` pares vaga x candidato)
+    e as pontua em uma única chamada ao modelo, em uma thread dedicada. Com `janela_s=0` não há
+    espera: o lote tem só as requisições que já estavam na fila.
+    """
+
+    def __init__(self, pontuar_lotes, janela_s=JANELA_LOTE_S, max_pares=MAX_PARES_LOTE):
+        self._pontuar_lotes = pontuar_lotes
+        self.janela_s = janela_s
+        self.max_pares = max_pares
+        self._fila = queue.Queue()
+        threading.Thread(target=self._processar, daemon=True).start()
+
+    def pontuar(self, texto_vaga, df_candidatos):
+        """Bloqueia até o lote da requisição ser pontuado; retorna (probabilidades, tamanho do lote)."""
+        futuro = Future()
+        self._fila.put((texto_vaga, df_candidatos, futuro))
+        return futuro.result()
+
+    def _processar(self):
+        while True:
+            lote = [self._fila.get()]
+            pares = len(lote[0][1])
+            limite = time.monotonic() + self.janela_s
+            while pares < self.max_pares:
+                restante = limite - time.monotonic()
+                try:
+                    item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                lote.append(item)
+                pares += len(item[1])
+            try:
+                with instrumentacao.etapa('servico.lote', requisicoes=len(lote), pares=pares):
+                    resultados = self._pontuar_lotes([(texto_vaga, df) for texto_vaga, df, _ in lote])
+                for (_, _, futuro), probabilidades in zip(lote, resultados): futuro.set_result((probabilidades, len(lote)))
+            except Exception as e:
+                for _, _, futuro in lote: futuro.set_exception(e)
+
+
+def pontuar_requisicao(pontuador, agrupador, corpo):
+    """
+    Executa uma requisição `{"codigo_vaga" | "texto_vaga", "candidatos"?, "top_k"?, "atribuicoes"?}`.
+    Sem `candidatos`, são usados os prospects da vaga. `atribuicoes` é o número de termos por candidato.
+    """
+    inicio = time.perf_counter()
+    codigo_vaga = corpo.get('codigo_vaga')
+    codigo_vaga = None if codigo_vaga is None else str(codigo_vaga)
+    texto_vaga = corpo.get('texto_vaga')
+    if texto_vaga is None:
+        if codigo_vaga is None: raise ErroRequisicao("Informe 'codigo_vaga' ou 'texto_vaga'.")
+        if codigo_vaga not in pontuador.vagas: raise ErroRequisicao(f"Vaga '{codigo_vaga}' não encontrada.", 404)
+        texto_vaga = pontuador.vagas[codigo_vaga]
+    ids = corpo.get('candidatos')
+    if ids is None:
+        if codigo_vaga is None: raise ErroRequisicao("Informe 'candidatos' ao pontuar um texto de vaga.")
+        ids = pontuador.prospects.get(codigo_vaga, [])
+    if not isinstance(ids, list): raise ErroRequisicao("'candidatos' deve ser uma lista de códigos.")
+    try:
+        top_k = int(corpo.get('top_k', TOP_K_PADRAO))
+        top_termos = int(corpo.get('atribuicoes', 0))
+    except (TypeError, ValueError):
+        raise ErroRequisicao("'top_k' e 'atribuicoes' devem ser inteiros.")
+
+    df = pontuador.candidatos(ids) if ids else pd.DataFrame()
+    encontrados = set(df['codigo_candidato']) if not df.empty else set()
+    resposta = {'codigo_vaga': codigo_vaga, 'versao_modelo': pontuador.versao_modelo, 'candidatos': len(encontrados),
+                'nao_encontrados': [str(i) for i in ids if str(i) not in encontrados], 'lote': 0, 'resultados': []}
+    if not df.empty:
+        probabilidades, resposta['lote'] = agrupador.pontuar(texto_vaga, df)
+        ordem = np.argsort(-probabilidades, kind='stable')
+        if top_k > 0: ordem = ordem[:top_k]
+        resultados = [{'posicao': posicao, 'codigo_candidato': df['codigo_candidato'].iat[i], 'nome_candidato': df['nome_candidato'].iat[i],
+                       'probabilidade': float(probabilidades[i]), 'score': int(probabilidades[i] * 100)} for posicao, i in enumerate(ordem, start=1)]
+        if top_termos > 0:
+            if pontuador.explicador is None: raise ErroRequisicao("Explicador indisponível para a versão do modelo carregada.", 409)
+            with instrumentacao.etapa('servico.atribuicoes', candidatos=len(ordem)):
+                termos = pontuador.atribuicoes((texto_vaga + ' ' + pontuador.textos(df['codigo_candidato'].iloc[ordem])).tolist(), top_termos)
+            for resultado, termos_candidato in zip(resultados, termos): resultado['atribuicoes'] = termos_candidato
+        resposta['resultados'] = resultados
+    resposta['tempo_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+    return resposta
+
+
+# --- SERVIDOR HTTP ---
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Fila de conexões do socket compartilhado pelos workers (o padrão, 5, recusa rajadas)
+
+
+def _criar_handler(pontuador, agrupador):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responder(self, status, dados):
+            corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            if self.path == '/saude':
+                self._responder(200, {'status': 'ok', 'pid': os.getpid(), 'versao_modelo': pontuador.versao_modelo,
+                                      'modelo': type(pontuador.modelo).__name__, 'motor': pontuador.motor is not None})
+            elif self.path == '/metricas':
+                self._responder(200, {'pid': os.getpid(), 'etapas': instrumentacao.resumo_etapas()})
+            else:
+                self._responder(404, {'erro': f"Rota desconhecida: {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/pontuar':
+                self._responder(404, {'erro': f"Rota desconhecida: {self.path}"})
+                return
+            try:
+                corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not isinstance(corpo, dict): raise ErroRequisicao("O corpo deve ser um objeto JSON.")
+                self._responder(200, pontuar_requisicao(pontuador, agrupador, corpo))
+            except json.JSONDecodeError as e:
+                self._responder(400, {'erro': f"JSON inválido: {e}"})
+            except ErroRequisicao as e:
+                self._responder(e.status, {'erro': str(e)})
+            except Exception as e:
+                self._responder(500, {'erro': f"{type(e).__name__}: {e}"})
+
+        def log_message(self, formato, *args):
+            pass  # O acesso fica nas métricas e nos logs JSON das etapas
+
+    return Handler
+
+
+def servir(porta=PORTA_PADRAO, host='127.0.0.1', workers=None, janela_s=JANELA_LOTE_S, caminho_modelo=armazenamento.MODELO_FILENAME):
+    """
+    Carrega modelo e dados uma vez, abre o socket e cria `workers` processos por fork que aceitam
+    conexões no mesmo socket. Cada worker agrupa as requisições concorrentes que recebe em lotes.
+    Sem `os.fork` (Windows), atende em um único processo.
+    """
+    workers = workers or os.cpu_count() or 1
+    pontuador = Pontuador(caminho_modelo)
+    servidor = _Servidor((host, porta), None)
+    print(f"Serviço de pontuação em http://{host}:{servidor.server_address[1]} "
+          f"(modelo: {type(pontuador.modelo).__name__}, workers: {workers}, janela do lote: {janela_s * 1000:.1f} ms)", flush=True)
+
+    def atender():
+        servidor.RequestHandlerClass = _criar_handler(pontuador, AgrupadorLotes(pontuador.predict_proba_lotes, janela_s))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    if workers == 1 or not hasattr(os, 'fork'):
+        atender()
+        return
+    filhos = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            atender()
+            os._exit(0)
+        filhos.append(pid)
+
+    def encerrar(*_):
+        for pid in filhos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, encerrar)
+    try:
+        for pid in filhos: os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        encerrar()
+    servidor.server_close()
+
+
+# --- TESTE DE CARGA ---
+def _requisitar(url, corpo=None, timeout=60):
+    dados = None if corpo is None else json.dumps(corpo).encode('utf-8')
+    requisicao = urllib.request.Request(url, data=dados, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+        return json.loads(resposta.read())
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _aguardar_servidor(url, processo, timeout_s=300):
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite:
+        if processo.poll() is not None: raise RuntimeError("O servidor terminou antes de ficar pronto.")
+        try:
+            return _requisitar(f"{url}/saude", timeout=1)
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError("O servidor não respondeu a tempo.")
+
+
+def teste_de_carga(url=None, requisicoes=500, concorrencia=32, top_k=TOP_K_PADRAO, atribuicoes=0, workers=None, janela_s=JANELA_LOTE_S, semente=42):
+    """
+    Dispara `requisicoes` pontuações de vagas aleatórias (com prospects) com `concorrencia` clientes
+    simultâneos e mede vazão e latências. Sem `url`, sobe um servidor local para o teste e o encerra no fim.
+    """
+    processo = None
+    if url is None:
+        porta = _porta_livre()
+        url = f"http://127.0.0.1:{porta}"
+        processo = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'servir', '--porta', str(porta),
+                                     '--workers', str(workers or os.cpu_count() or 1), '--janela-ms', str(janela_s * 1000)])
+    try:
+        saude = _aguardar_servidor(url, processo) if processo else _requisitar(f"{url}/saude")
+        prospects = armazenamento.carregar_json(armazenamento.PROSPECTS_FILENAME) or {}
+        vagas = [codigo for codigo, dados in prospects.items() if dados.get('prospects')]
+        if not vagas: raise RuntimeError("Nenhuma vaga com prospects para o teste de carga.")
+        aleatorio = random.Random(semente)
+        corpos = [{'codigo_vaga': aleatorio.choice(vagas), 'top_k': top_k, 'atribuicoes': atribuicoes} for _ in range(requisicoes)]
+
+        def enviar(corpo):
+            inicio = time.perf_counter()
+            try:
+                resposta = _requisitar(f"{url}/pontuar", corpo)
+                return time.perf_counter() - inicio, resposta['candidatos'], resposta['lote'], None
+            except Exception as e:
+                return time.perf_counter() - inicio, 0, 0, f"{type(e).__name__}: {e}"
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            resultados = list(executor.map(enviar, corpos))
+        duracao = time.perf_counter() - inicio
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+    latencias = sorted(r[0] * 1000 for r in resultados if r[3] is None)
+    erros = [r[3] for r in resultados if r[3] is not None]
+    percentil = lambda p: round(latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))], 2) if latencias else None
+    return {'servidor': saude, 'requisicoes': requisicoes, 'concorrencia': concorrencia, 'erros': len(erros), 'exemplo_erro': erros[0] if erros else None,
+            'duracao_s': round(duracao, 3), 'requisicoes_por_s': round(requisicoes / duracao, 1), 'pares_por_s': round(sum(r[1] for r in resultados) / duracao, 1),
+            'latencia_p50_ms': percentil(50), 'latencia_p90_ms': percentil(90), 'latencia_p99_ms': percentil(99),
+            'latencia_media_ms': round(statistics.fmean(latencias), 2) if latencias else None,
+            'requisicoes_por_lote_media': round(statistics.fmean(r[2] for r in resultados if r[3] is None), 2) if latencias else None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço HTTP de pontuação de candidatos (sem a interface do Streamlit).")
+    subparsers = parser.add_subparsers(dest='acao', required=True)
+    p_servir = subparsers.add_parser('servir', help="Sobe o servidor HTTP (POST /pontuar, GET /saude, GET /metricas).")
+    p_servir.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    p_servir.add_argument('--host', default='127.0.0.1')
+    p_servir.add_argument('--workers', type=int, default=None, help="Processos que atendem o socket (padrão: número de CPUs).")
+    p_servir.add_argument('--janela-ms', type=float, default=JANELA_LOTE_S * 1000, help="Espera máxima para agrupar requisições em um lote (0: agrupa só as que já estão na fila).")
+    p_carga = subparsers.add_parser('carga', help="Teste de carga local (sobe um servidor próprio se --url não for informado).")
+    p_carga.add_argument('--url', default=None, help="URL de um servidor já em execução (ex.: http://127.0.0.1:8600).")
+    p_carga.add_argument('--requisicoes', type=int, default=500)
+    p_carga.add_argument('--concorrencia', type=int, default=32)
+    p_carga.add_argument('--top-k', type=int, default=TOP_K_PADRAO)
+    p_carga.add_argument('--atribuicoes', type=int, default=0, help="Termos de contribuição por candidato em cada resposta.")
+    p_carga.add_argument('--workers', type=int, default=None, help="Workers do servidor local.")
+    p_carga.add_argument('--janela-ms', type=float, default=JANELA_LOTE_S * 1000, help="Janela de agrupamento do servidor local.")
+    args = parser.parse_args()
+
+    if args.acao == 'servir':
+        servir(args.porta, args.host, args.workers, args.janela_ms / 1000)
+    else:
+        print(json.dumps(teste_de_carga(args.url, args.requisicoes, args.concorrencia, args.top_k, args.atribuicoes, args.workers, args.janela_ms / 1000), indent=2, ensure_ascii=False))
@@ -0,0 +1,278 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import armazenamento
+
+CANDIDATOS = {
+    '1': {'infos_basicas': {'nome': 'Ana'}, 'cv_pt': 'chaves } e { soltas, aspas " e \\"escapadas\\"'},
+    '22': {'infos_basicas': {'nome': 'João Conceição'}, 'cv_pt': 'ação, coração, 日本語 e emoji 🚀', 'numeros': [1, -2.5e3, 0]},
+    '333': {'infos_basicas': {}, 'cv_pt': '', 'vazio': {}, 'lista': [], 'nulo': None, 'booleano': True},
+    '4\\"}': {'cv_pt': 'chave com } e aspas'},
+}
+
+
+def _linhas_ndjson(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return [json.loads(linha) for linha in f]
+
+
+@pytest.fixture
+def origem(tmp_path):
+    caminho = tmp_path / 'applicants.json'
+    caminho.write_text(json.dumps(CANDIDATOS, ensure_ascii=False, indent=2), encoding='utf-8')
+    return caminho
+
+
+@pytest.mark.parametrize('tamanho_bloco', [1, 7, 1 << 20])
+def test_converter_json_para_ndjson_ida_e_volta(origem, tmp_path, tamanho_bloco):
+    # Blocos menores que um registro obrigam o leitor a juntar valores cortados em qualquer ponto
+    destino = tmp_path / 'applicants.nd.json'
+    assert armazenamento.converter_json_para_ndjson(origem, destino, tamanho_bloco=tamanho_bloco) == len(CANDIDATOS)
+    registros = {r.pop('codigo_candidato'): r for r in _linhas_ndjson(destino)}
+    with open(origem, 'r', encoding='utf-8') as f: assert registros == json.load(f)
+    assert list(registros) == list(CANDIDATOS)
+
+
+@pytest.mark.parametrize('corte', [1, 40, -2, -1])
+def test_converter_json_truncado_nao_deixa_destino(origem, tmp_path, corte):
+    conteudo = origem.read_bytes()
+    origem.write_bytes(conteudo[:corte])
+    destino = tmp_path / 'applicants.nd.json'
+    with pytest.raises(ValueError):
+        armazenamento.converter_json_para_ndjson(origem, destino, tamanho_bloco=5)
+    assert list(tmp_path.iterdir()) == [origem]
+
+
+# --- ÍNDICE DE BYTES DO NDJSON ---
+def _varredura_linear(caminho, ids):
+    ids, registros = {str(i) for i in ids}, []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            if str(registro.get('codigo_candidato')) in ids: registros.append(registro)
+    return registros
+
+
+@pytest.fixture
+def ndjson(tmp_path):
+    # Códigos de larguras diferentes (a chave do índice é preenchida até a maior), um código repetido,
+    # uma linha inválida e uma linha em branco
+    caminho = tmp_path / 'applicants.nd.json'
+    codigos = ['7', '10', '100', '2', '99999', '31415', '0', '10']
+    linhas = [json.dumps({'codigo_candidato': c, 'cv_pt': f'texto {i} ação'}) for i, c in enumerate(codigos)]
+    linhas[3:3] = ['{corrompida', '', json.dumps({'sem_codigo': 1})]
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    return caminho, tmp_path / 'applicants.nd.idx'
+
+
+@pytest.mark.parametrize('ids', [
+    ['7'],
+    ['10', '100', '1', '1000', '00'],        # prefixos e extensões de chaves existentes
+    ['2', '2', 2, '99999', 99999],           # IDs repetidos no pedido (e como inteiros)
+    ['inexistente', '123456789012', ''],      # ausentes, inclusive mais largos que a chave do índice
+    [],
+    ['0', '7', '10', '100', '2', '99999', '31415'],
+])
+def test_buscar_registros_por_id_igual_a_varredura(ndjson, ids):
+    caminho_ndjson, caminho_indice = ndjson
+    assert armazenamento.buscar_registros_por_id(ids, caminho_ndjson, caminho_indice) == _varredura_linear(caminho_ndjson, ids)
+
+
+def test_indice_desatualizado_e_reconstruido(ndjson):
+    caminho_ndjson, caminho_indice = ndjson
+    armazenamento.construir_indice_ndjson(caminho_ndjson, caminho_indice)
+    assert armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice)
+
+    # Mesmo tamanho, conteúdo e mtime diferentes: os offsets antigos apontariam para outros registros
+    conteudo = caminho_ndjson.read_text(encoding='utf-8').replace('"7"', '"8"')
+    caminho_ndjson.write_text(conteudo, encoding='utf-8')
+    stat = caminho_ndjson.stat()
+    os.utime(caminho_ndjson, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice)
+    assert armazenamento.buscar_registros_por_id(['7', '8'], caminho_ndjson, caminho_indice) == _varredura_linear(caminho_ndjson, ['8'])
+    assert armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice)
+
+    # Registro acrescentado: o tamanho muda
+    with open(caminho_ndjson, 'a', encoding='utf-8') as f: f.write(json.dumps({'codigo_candidato': '5', 'cv_pt': 'novo'}) + '\n')
+    assert not armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice)
+    assert armazenamento.buscar_registros_por_id(['5'], caminho_ndjson, caminho_indice) == [{'codigo_candidato': '5', 'cv_pt': 'novo'}]
+
+    assert not armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice.with_name('ausente.idx'))
+    caminho_indice.write_bytes(b'lixo')
+    assert not armazenamento.indice_ndjson_valido(caminho_ndjson, caminho_indice)
+
+
+# --- BASE COLUNAR DE TEXTOS DOS CANDIDATOS ---
+def _candidato(i):
+    candidato = {'codigo_candidato': str(1000 + i), 'informacoes_pessoais': {'dados_pessoais': {'nome_completo': f'Pessoa {i} Ção'}},
+                 'informacoes_profissionais': {'resumo_profissional': 'resumo ' * (i % 5), 'conhecimentos': f'python {i}'}, 'cv_pt': 'cv ' * (i % 11)}
+    if i % 7 == 0: candidato['cv_en'] = 'english cv'
+    if i % 9 == 0: del candidato['informacoes_pessoais']
+    return candidato
+
+
+@pytest.fixture(params=[True, False], ids=['com_quebra_final', 'sem_quebra_final'])
+def ndjson_candidatos(tmp_path, request):
+    caminho = tmp_path / 'applicants.nd.json'
+    linhas = [json.dumps(_candidato(i), ensure_ascii=i % 2 == 0) for i in range(60)]
+    linhas[10] = '{corrompida'
+    caminho.write_text('\n'.join(linhas) + ('\n' if request.param else ''), encoding='utf-8')
+    return caminho
+
+
+def _esperado_base_textos(caminho):
+    registros = []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                c = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            registros.append({'codigo_candidato': c['codigo_candidato'], 'nome_candidato': c.get('informacoes_pessoais', {}).get('dados_pessoais', {}).get('nome_completo'),
+                              'candidato_texto_completo': armazenamento.montar_texto_candidato(c)})
+    return pd.DataFrame(registros)
+
+
+@pytest.mark.parametrize('partes', [1, 2, 7, 500])
+def test_intervalos_de_linhas_alinhados(ndjson_candidatos, partes):
+    conteudo = ndjson_candidatos.read_bytes()
+    intervalos = armazenamento._intervalos_de_linhas(ndjson_candidatos, partes)
+    assert intervalos[0][0] == 0 and intervalos[-1][1] == len(conteudo)
+    assert all(fim == inicio for (_, fim), (inicio, _) in zip(intervalos, intervalos[1:]))
+    assert all(conteudo[inicio - 1:inicio] == b'\n' for inicio, _ in intervalos[1:])
+    # Os pontos de corte brutos caem no meio de linhas: o alinhamento é de fato exercitado
+    if partes > 1: assert any(conteudo[len(conteudo) * i // partes - 1:len(conteudo) * i // partes] != b'\n' for i in range(1, partes))
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_construir_base_textos_paralelo_igual_ao_sequencial(ndjson_candidatos, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(armazenamento, '_LINHAS_POR_GRUPO', 8)
+    sequencial, paralelo = tmp_path / 'sequencial.parquet', tmp_path / 'paralelo.parquet'
+    armazenamento.construir_base_textos(ndjson_candidatos, sequencial, workers=1)
+    armazenamento.construir_base_textos(ndjson_candidatos, paralelo, workers=workers)
+    assert pq.read_table(paralelo).equals(pq.read_table(sequencial))
+    pd.testing.assert_frame_equal(pd.read_parquet(sequencial), _esperado_base_textos(ndjson_candidatos))
+    assert armazenamento.base_textos_valida(ndjson_candidatos, paralelo)
+
+
+def test_buscar_textos_candidatos_em_varios_grupos(ndjson_candidatos, tmp_path, monkeypatch):
+    monkeypatch.setattr(armazenamento, '_LINHAS_POR_GRUPO', 7)
+    caminho_base = tmp_path / 'candidatos_texto.parquet'
+    armazenamento.construir_base_textos(ndjson_candidatos, caminho_base)
+    assert pq.ParquetFile(caminho_base).num_row_groups > 8
+    esperado = _esperado_base_textos(ndjson_candidatos)
+
+    ids = ['1059', 1000, '1013', '1014', '1033', 'inexistente', '1010', '1013', '99']  # 1010 é a linha corrompida
+    obtido = armazenamento.buscar_textos_candidatos(ids, caminho_base=caminho_base)
+    pd.testing.assert_frame_equal(obtido, esperado[esperado['codigo_candidato'].isin(['1000', '1013', '1014', '1033', '1059'])].reset_index(drop=True))
+
+    obtido = armazenamento.buscar_textos_candidatos(['1020'], colunas=('candidato_texto_completo',), caminho_base=caminho_base)
+    assert obtido.to_dict('records') == esperado.loc[esperado['codigo_candidato'] == '1020', ['codigo_candidato', 'candidato_texto_completo']].to_dict('records')
+    assert armazenamento.buscar_textos_candidatos(['inexistente'], caminho_base=caminho_base).empty
+
+
+# --- RANKINGS E CACHE DE RANKINGS ---
+def _ranking(n, **colunas):
+    return pd.DataFrame({'codigo_candidato': [str(i) for i in range(n)], 'nome_candidato': [f'Pessoa {i}' for i in range(n)], **colunas})
+
+
+def test_registros_ranking_tipados():
+    df = armazenamento.registros_ranking(_ranking(3, probabilidade=[0.9, 0.5, 0.123], texto='descartado'))
+    assert list(df.columns) == list(armazenamento.TIPOS_REGISTRO_RANKING)
+    assert df['score'].tolist() == [90, 50, 12] and df['posicao'].tolist() == [1, 2, 3]
+    assert df.dtypes.to_dict() == {c: np.dtype(t) for c, t in armazenamento.TIPOS_REGISTRO_RANKING.items()}
+    assert armazenamento.registros_ranking(None).empty
+
+
+@pytest.mark.parametrize('df', [_ranking(2), _ranking(2, texto=['a', 'b']), _ranking(2, probabilidade=[0.5, 0.4]).drop(columns='codigo_candidato')])
+def test_registros_ranking_sem_colunas_obrigatorias(df):
+    with pytest.raises(ValueError, match="'score' ou 'probabilidade'"):
+        armazenamento.registros_ranking(df)
+
+
+def _valor(tamanho_bytes):
+    # DataFrame de uma coluna float64 com aproximadamente `tamanho_bytes` (mais o índice)
+    return pd.DataFrame({'x': np.zeros(tamanho_bytes // 8)})
+
+
+def _tamanho(valor):
+    return int(valor.memory_usage(index=True, deep=True).sum())
+
+
+def test_cache_rankings_despejo_lru_por_entradas():
+    cache = armazenamento.CacheRankings(max_entradas=2, max_bytes=1 << 30)
+    a, b, c = _valor(80), _valor(80), _valor(80)
+    cache.obter('a', lambda: a)
+    cache.obter('b', lambda: b)
+    assert cache.obter('a', lambda: pytest.fail('recalculado')) is a  # 'a' passa a ser a mais recente
+    cache.obter('c', lambda: c)
+    assert cache.obter('a', lambda: pytest.fail('recalculado')) is a
+    assert cache.obter('c', lambda: pytest.fail('recalculado')) is c
+    novo_b = _valor(80)
+    assert cache.obter('b', lambda: novo_b) is novo_b  # 'b' foi despejada
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['entradas'], estatisticas['acertos'], estatisticas['faltas'], estatisticas['despejos']) == (2, 3, 4, 2)
+
+
+def test_cache_rankings_despejo_lru_por_bytes():
+    valores = {chave: _valor(800) for chave in 'abcd'}
+    tamanho = _tamanho(valores['a'])
+    cache = armazenamento.CacheRankings(max_entradas=100, max_bytes=3 * tamanho)
+    for chave in 'abc': cache.obter(chave, lambda chave=chave: valores[chave])
+    cache.obter('a', lambda: pytest.fail('recalculado'))
+    cache.obter('d', lambda: valores['d'])
+    assert cache.bytes == 3 * tamanho <= cache.max_bytes
+    for chave in 'acd': assert cache.obter(chave, lambda: pytest.fail('recalculado')) is valores[chave]
+    calculos = []
+    cache.obter('b', lambda: calculos.append('b') or valores['b'])
+    assert calculos == ['b']
+
+
+def test_cache_rankings_nao_guarda_valor_maior_que_o_limite():
+    pequeno, grande = _valor(80), _valor(8000)
+    cache = armazenamento.CacheRankings(max_entradas=10, max_bytes=_tamanho(grande) - 1)
+    cache.obter('pequeno', lambda: pequeno)
+    assert cache.obter('grande', lambda: grande) is grande  # devolvido, mas não guardado
+    assert cache.estatisticas()['entradas'] == 1 and cache.bytes == _tamanho(pequeno)
+    assert cache.obter('pequeno', lambda: pytest.fail('despejado pelo valor grande')) is pequeno
+    calculos = []
+    cache.obter('grande', lambda: calculos.append(1) or grande)
+    assert calculos == [1]
+
+
+def test_cache_rankings_calculo_unico_entre_sessoes():
+    cache = armazenamento.CacheRankings(max_entradas=10, max_bytes=1 << 30)
+    liberar, calculos, resultados = threading.Event(), [], []
+    valor = _valor(80)
+
+    def calcular():
+        calculos.append(threading.get_ident())
+        assert liberar.wait(5)
+        return valor
+
+    sessoes = [threading.Thread(target=lambda: resultados.append(cache.obter('vaga', calcular))) for _ in range(8)]
+    for sessao in sessoes: sessao.start()
+    while not calculos: time.sleep(0.001)
+    time.sleep(0.05)  # as demais sessões chegam enquanto o cálculo está em andamento
+    liberar.set()
+    for sessao in sessoes: sessao.join(5)
+    assert len(calculos) == 1
+    assert len(resultados) == 8 and all(r is valor for r in resultados)
+
+
+def test_cache_rankings_falha_no_calculo_libera_quem_espera():
+    cache = armazenamento.CacheRankings(max_entradas=10, max_bytes=1 << 30)
+    valor = _valor(80)
+    with pytest.raises(RuntimeError):
+        cache.obter('vaga', lambda: (_ for _ in ()).throw(RuntimeError('falhou')))
+    assert cache.obter('vaga', lambda: valor) is valor
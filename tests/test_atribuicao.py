@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+import shap
+
+from atribuicao import ExplicadorLinear
+from train import construir_pipeline
+
+TEXTOS = [
+    'python developer com django e flask',
+    'gestão de projetos e análise de requisitos',
+    'analista de dados sênior com python e sql',
+    'the data team leader',
+    'desenvolvedor java spring e microsserviços',
+    '',
+    'python sql django análise de dados',
+    'comunicação e liderança de equipes ágeis',
+]
+
+
+@pytest.fixture(scope='module')
+def ajustado():
+    X = pd.DataFrame({'texto_completo': TEXTOS * 3})
+    y = np.array([1, 0, 1, 0, 0, 0, 1, 0] * 3)
+    pipeline = construir_pipeline().fit(X, y)
+    X_fundo = pipeline.named_steps['preprocessor'].transform(X)
+    return pipeline, X_fundo, ExplicadorLinear.de_pipeline(pipeline, X_fundo)
+
+
+def _referencia_shap(pipeline, X_fundo, X):
+    masker = shap.maskers.Independent(X_fundo, max_samples=X_fundo.shape[0])
+    return shap.LinearExplainer(pipeline.named_steps['clf'], masker)(X)
+
+
+def test_explicar_igual_ao_shap(ajustado):
+    pipeline, X_fundo, explicador = ajustado
+    X = X_fundo[:len(TEXTOS)]
+    referencia = _referencia_shap(pipeline, X_fundo, X)
+    obtido = explicador.explicar(X)
+    np.testing.assert_allclose(obtido.values, np.asarray(referencia.values), rtol=0, atol=1e-10)
+    np.testing.assert_allclose(obtido.base_values, np.asarray(referencia.base_values), rtol=0, atol=1e-10)
+    np.testing.assert_array_equal(obtido.data, X.toarray())
+    # Valor base + contribuições = função de decisão do modelo
+    np.testing.assert_allclose(obtido.base_values + obtido.values.sum(axis=1), pipeline.named_steps['clf'].decision_function(X), rtol=0, atol=1e-10)
+
+
+def test_explicar_linhas_e_colunas_selecionadas(ajustado):
+    pipeline, X_fundo, explicador = ajustado
+    X = X_fundo[:len(TEXTOS)]
+    completo = explicador.explicar(X.toarray())
+    linhas, colunas = [6, 2], [0, 5, 3]
+    obtido = explicador.explicar(X, linhas=linhas, colunas=colunas)
+    np.testing.assert_array_equal(obtido.values, completo.values[np.ix_(linhas, colunas)])
+    np.testing.assert_array_equal(obtido.data, X.toarray()[np.ix_(linhas, colunas)])
+    assert obtido.feature_names == [explicador.feature_names[j] for j in colunas]
+
+    uma_linha = explicador.explicar(X, linhas=[3])
+    np.testing.assert_array_equal(uma_linha.values, completo.values[[3]])
+    assert uma_linha.explanation(0).values.shape == (len(explicador.feature_names),)
+
+
+def test_maiores_contribuicoes(ajustado):
+    pipeline, X_fundo, explicador = ajustado
+    X = sp.csr_matrix(X_fundo[:len(TEXTOS)])
+    valores = explicador.explicar(X).values
+    for quantidade in (1, 5, 30):
+        for linha, maiores in zip(valores, explicador.maiores_contribuicoes(X, quantidade)):
+            esperado = np.sort(np.abs(linha))[::-1][:quantidade]
+            np.testing.assert_allclose(sorted((abs(v) for _, v in maiores), reverse=True), esperado[esperado != 0], rtol=0, atol=1e-12)
+            for coluna, valor in maiores:
+                assert valor == pytest.approx(linha[coluna], abs=1e-12)
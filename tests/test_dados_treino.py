@@ -0,0 +1,62 @@
+import copy
+
+from dados_treino import filtrar_prospects_novos
+
+PROSPECTS = {
+    'v1': {'prospects': [
+        {'codigo': '1', 'situacao_candidado': 'Contratado', 'ultima_atualizacao': '10-03-2024'},
+        {'codigo': '2', 'situacao_candidado': 'Não Aprovado', 'ultima_atualizacao': '15-03-2024'},
+    ]},
+    'v2': {'prospects': [
+        {'codigo': '3', 'situacao_candidado': 'Encaminhado ao Requisitante', 'data_candidatura': '15-03-2024'},
+        {'codigo': '4', 'situacao_candidado': 'Prospect', 'ultima_atualizacao': ''},
+    ]},
+}
+
+
+def _chaves(prospects):
+    return sorted(f"{vaga_id}:{p['codigo']}" for vaga_id, dados in prospects.items() for p in dados['prospects'])
+
+
+def test_primeira_execucao_consome_tudo():
+    novos, marca = filtrar_prospects_novos(PROSPECTS, None)
+    assert _chaves(novos) == ['v1:1', 'v1:2', 'v2:3', 'v2:4']
+    assert marca['data'] == '2024-03-15'
+    assert sorted(marca['consumidos']) == _chaves(PROSPECTS)
+
+
+def test_segunda_execucao_sem_mudancas():
+    _, marca = filtrar_prospects_novos(PROSPECTS, None)
+    novos, nova_marca = filtrar_prospects_novos(PROSPECTS, marca)
+    assert novos == {}
+    assert nova_marca == marca
+
+
+def test_prospects_novos_antes_na_mesma_data_e_sem_data():
+    _, marca = filtrar_prospects_novos(PROSPECTS, None)
+    prospects = copy.deepcopy(PROSPECTS)
+    prospects['v1']['prospects'] += [
+        {'codigo': '5', 'situacao_candidado': 'Aprovado', 'ultima_atualizacao': '01-01-2023'},  # anterior à marca
+        {'codigo': '6', 'situacao_candidado': 'Prospect', 'ultima_atualizacao': '15-03-2024'},  # na data da marca
+    ]
+    prospects['v3'] = {'prospects': [{'codigo': '7', 'situacao_candidado': 'Prospect'}]}     # sem data
+    novos, nova_marca = filtrar_prospects_novos(prospects, marca)
+    assert _chaves(novos) == ['v1:5', 'v1:6', 'v3:7']
+    assert nova_marca['data'] == '2024-03-15'
+    assert filtrar_prospects_novos(prospects, nova_marca)[0] == {}
+
+
+def test_prospect_atualizado_volta_a_entrar():
+    _, marca = filtrar_prospects_novos(PROSPECTS, None)
+    prospects = copy.deepcopy(PROSPECTS)
+    prospects['v2']['prospects'][1]['situacao_candidado'] = 'Contratado'  # mesma data (ausente), situação nova
+    novos, _ = filtrar_prospects_novos(prospects, marca)
+    assert novos == {'v2': {'prospects': [prospects['v2']['prospects'][1]]}}
+
+
+def test_par_repetido_com_conteudos_diferentes():
+    prospects = copy.deepcopy(PROSPECTS)
+    prospects['v1']['prospects'].append({'codigo': '1', 'situacao_candidado': 'Desistiu', 'ultima_atualizacao': '12-03-2024'})
+    novos, marca = filtrar_prospects_novos(prospects, None)
+    assert len(novos['v1']['prospects']) == 3
+    assert filtrar_prospects_novos(prospects, marca)[0] == {}
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from downloader import ErroIntegridade, arquivo_integro, baixar, carregar_manifesto, sha256_arquivo
+
+TAMANHO_PARTE = 256 * 1024
+TAMANHO_ARQUIVO = 4 * 2**20
+
+
+class ServidorLocal:
+    """Servidor HTTP em thread com suporte a Range; `bytes_ate_falhar` derruba a conexão após N bytes totais enviados."""
+
+    def __init__(self, diretorio, bytes_ate_falhar=None, etag=None):
+        enviados, trava = [0], threading.Lock()
+
+        class Manipulador(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=str(diretorio), **kwargs)
+
+            def log_message(self, *args):
+                pass
+
+            def _enviar(self, cabeca):
+                caminho = self.translate_path(self.path)
+                if not os.path.isfile(caminho): return self.send_error(404)
+                tamanho = os.path.getsize(caminho)
+                intervalo = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                inicio, fim = (int(intervalo.group(1)), int(intervalo.group(2) or tamanho - 1)) if intervalo else (0, tamanho - 1)
+                self.send_response(206 if intervalo else 200)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(fim - inicio + 1))
+                if etag: self.send_header('ETag', f'"{etag}"')
+                if intervalo: self.send_header('Content-Range', f'bytes {inicio}-{fim}/{tamanho}')
+                self.end_headers()
+                if cabeca: return
+                with open(caminho, 'rb') as f:
+                    f.seek(inicio)
+                    restante = fim - inicio + 1
+                    while restante:
+                        bloco = f.read(min(65536, restante))
+                        with trava:
+                            enviados[0] += len(bloco)
+                            falhar = bytes_ate_falhar is not None and enviados[0] > bytes_ate_falhar
+                        if falhar: return self.connection.close()
+                        self.wfile.write(bloco)
+                        restante -= len(bloco)
+
+            def do_HEAD(self):
+                self._enviar(True)
+
+            def do_GET(self):
+                self._enviar(False)
+
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manipulador)
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._servidor.server_port}/dados.bin"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+@pytest.fixture
+def origem(tmp_path):
+    diretorio = tmp_path / 'origem'
+    diretorio.mkdir()
+    (diretorio / 'dados.bin').write_bytes(os.urandom(TAMANHO_ARQUIVO))
+    return diretorio
+
+
+@pytest.fixture
+def destino(tmp_path):
+    return tmp_path / 'destino' / 'dados.bin', tmp_path / 'manifesto.json'
+
+
+def test_download_completo_e_reaproveitado(origem, destino):
+    destino, manifesto = destino
+    esperado = sha256_arquivo(origem / 'dados.bin')
+    with ServidorLocal(origem) as servidor:
+        estatisticas = baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)
+        assert estatisticas['baixado'] and estatisticas['bytes'] == TAMANHO_ARQUIVO
+        assert sha256_arquivo(destino) == esperado == carregar_manifesto(manifesto)['dados.bin']['sha256']
+        assert not baixar(servidor.url, destino, manifesto, tamanho_parte=TAMANHO_PARTE)['baixado']
+    assert not destino.with_name('dados.bin.part').exists()
+
+
+def test_download_interrompido_e_retomado(origem, destino):
+    destino, manifesto = destino
+    esperado = sha256_arquivo(origem / 'dados.bin')
+    with ServidorLocal(origem, bytes_ate_falhar=TAMANHO_ARQUIVO // 2) as servidor:
+        # Poucas conexões e uma tentativa: algumas partes terminam antes da queda
+        with pytest.raises(requests.exceptions.RequestException):
+            baixar(servidor.url, destino, manifesto, workers=2, tentativas=1, tamanho_parte=TAMANHO_PARTE)
+    assert not destino.exists()
+    with ServidorLocal(origem) as servidor:
+        estatisticas = baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)
+    assert sha256_arquivo(destino) == esperado
+    assert estatisticas['retomados'] > 0
+    assert estatisticas['retomados'] + estatisticas['bytes'] == TAMANHO_ARQUIVO
+
+
+def test_arquivo_corrompido_baixado_novamente(origem, destino):
+    destino, manifesto = destino
+    esperado = sha256_arquivo(origem / 'dados.bin')
+    with ServidorLocal(origem) as servidor:
+        baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)
+        with open(destino, 'r+b') as f: f.write(b'\0' if f.read(1) != b'\0' else b'\1')
+        os.utime(destino)
+        assert not arquivo_integro(destino, carregar_manifesto(manifesto)['dados.bin'])
+        assert baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)['baixado']
+    assert sha256_arquivo(destino) == esperado
+
+
+def test_sha256_anunciado_prevalece_sobre_o_manifesto(origem, destino):
+    # O arquivo mudou na origem sem mudar de tamanho: o manifesto antigo não pode rejeitar o novo conteúdo
+    destino, manifesto = destino
+    esperado = sha256_arquivo(origem / 'dados.bin')
+    manifesto.write_text(json.dumps({'dados.bin': {'url': '', 'tamanho': TAMANHO_ARQUIVO, 'sha256': '0' * 64, 'mtime_ns': 0}}))
+    with ServidorLocal(origem, etag=esperado) as servidor:
+        assert baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)['baixado']
+    assert sha256_arquivo(destino) == esperado == carregar_manifesto(manifesto)['dados.bin']['sha256']
+
+
+def test_sha256_anunciado_divergente_rejeitado(origem, destino):
+    destino, manifesto = destino
+    with ServidorLocal(origem, etag='f' * 64) as servidor:
+        with pytest.raises(ErroIntegridade):
+            baixar(servidor.url, destino, manifesto, workers=4, tamanho_parte=TAMANHO_PARTE)
+    assert not destino.exists()
+    assert not destino.with_name('dados.bin.part').exists()
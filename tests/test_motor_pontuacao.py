@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from motor_pontuacao import MatrizVagas, MotorPontuacao
+from train import construir_pipeline
+
+TOLERANCIA = 1e-9
+
+# Vagas terminadas em termos que, com o começo dos candidatos, formam n-gramas do vocabulário
+# (inclusive através de stop words, que são removidas antes da montagem dos n-gramas).
+VAGAS = pd.DataFrame({
+    'codigo_vaga': ['v1', 'v2', 'v3', 'v4', 'v5'],
+    'perfil_vaga_texto': [
+        'Desenvolvedor backend com experiência em python',
+        'Gestão de projetos e análise de requisitos, atuação em São Paulo',
+        'Analista de dados sênior para the data team of',
+        '',
+        'python developer python developer',
+    ],
+})
+
+CANDIDATOS = pd.DataFrame({
+    'codigo_candidato': ['c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7'],
+    'candidato_texto_completo': [
+        'developer python com django e flask',
+        'análise de requisitos e gestão ágil em São Paulo',
+        'team leader with the python stack',
+        '',
+        'the and of',
+        'developer python developer python',
+        'Ação, atenção e coração: comunicação não-violenta',
+    ],
+})
+
+
+def _pares(vagas, candidatos):
+    textos, rotulos = [], []
+    for i, vaga in enumerate(vagas['perfil_vaga_texto']):
+        for j, candidato in enumerate(candidatos['candidato_texto_completo']):
+            textos.append(vaga + ' ' + candidato)
+            rotulos.append(int((i + j) % 3 == 0))
+    return pd.DataFrame({'texto_completo': textos}), np.array(rotulos)
+
+
+@pytest.fixture(scope='module', params=['padrao', 'acentos_trigramas'])
+def pipeline(request):
+    pipeline = construir_pipeline()
+    if request.param == 'acentos_trigramas':
+        pipeline.set_params(preprocessor__tfidf__strip_accents='unicode', preprocessor__tfidf__ngram_range=(1, 3))
+    X, y = _pares(VAGAS, CANDIDATOS)
+    return pipeline.fit(X, y)
+
+
+def _esperado(pipeline, texto_vaga, candidatos):
+    X = pd.DataFrame({'texto_completo': texto_vaga + ' ' + candidatos['candidato_texto_completo']})
+    return pipeline.predict_proba(X)[:, 1]
+
+
+def _cache(motor, tmp_path, candidatos):
+    caminho_base = tmp_path / 'candidatos_texto.parquet'
+    pq.write_table(pa.Table.from_pandas(candidatos, preserve_index=False), caminho_base)
+    motor.construir_cache(caminho_base, tmp_path / 'contagens.npz')
+    return motor
+
+
+def test_fronteira_gera_ngramas_do_vocabulario(pipeline):
+    # Garante que os dados sintéticos de fato exercitam os n-gramas que cruzam a fronteira
+    motor = MotorPontuacao(pipeline)
+    cauda = tuple(motor._tokens_filtrados(VAGAS['perfil_vaga_texto'][0])[-(motor.ngram_max - 1):])
+    cabeca = motor.cabecas([CANDIDATOS['candidato_texto_completo'][0]])[0]
+    termos = motor._termos_fronteira(cauda, cabeca)
+    assert 'python developer' in termos
+    assert (motor.modelo.indices(termos) >= 0).any()
+
+
+@pytest.mark.parametrize('usar_cache', [False, True])
+def test_motor_igual_ao_pipeline(pipeline, tmp_path, usar_cache):
+    motor = MotorPontuacao(pipeline)
+    if usar_cache: _cache(motor, tmp_path, CANDIDATOS)
+    for texto_vaga in VAGAS['perfil_vaga_texto']:
+        obtido = motor.predict_proba_vaga(texto_vaga, CANDIDATOS)
+        np.testing.assert_allclose(obtido, _esperado(pipeline, texto_vaga, CANDIDATOS), rtol=0, atol=TOLERANCIA)
+
+
+def test_motor_mistura_cache_e_texto(pipeline, tmp_path):
+    motor = _cache(MotorPontuacao(pipeline), tmp_path, CANDIDATOS.iloc[:4])
+    novos = pd.DataFrame({'codigo_candidato': ['n1', 'n2'], 'candidato_texto_completo': ['python developer em São Paulo', 'não']})
+    candidatos = pd.concat([CANDIDATOS, novos], ignore_index=True)
+    assert motor.em_cache(candidatos['codigo_candidato']).tolist() == [True] * 4 + [False] * 5
+    for texto_vaga in VAGAS['perfil_vaga_texto']:
+        obtido = motor.predict_proba_vaga(texto_vaga, candidatos)
+        np.testing.assert_allclose(obtido, _esperado(pipeline, texto_vaga, candidatos), rtol=0, atol=TOLERANCIA)
+
+
+def test_motor_decisoes_e_lotes(pipeline):
+    motor = MotorPontuacao(pipeline)
+    texto_vaga = VAGAS['perfil_vaga_texto'][0]
+    X = pd.DataFrame({'texto_completo': texto_vaga + ' ' + CANDIDATOS['candidato_texto_completo']})
+    np.testing.assert_allclose(motor.decisoes_vaga(texto_vaga, CANDIDATOS), pipeline.decision_function(X), rtol=0, atol=TOLERANCIA)
+    lotes = motor.predict_proba_lotes([(texto, CANDIDATOS) for texto in VAGAS['perfil_vaga_texto']])
+    for texto_vaga, obtido in zip(VAGAS['perfil_vaga_texto'], lotes):
+        np.testing.assert_allclose(obtido, _esperado(pipeline, texto_vaga, CANDIDATOS), rtol=0, atol=TOLERANCIA)
+    assert len(motor.predict_proba_vaga(texto_vaga, CANDIDATOS.iloc[:0])) == 0
+
+
+@pytest.mark.parametrize('usar_cache', [False, True])
+def test_matriz_vagas_igual_ao_pipeline(pipeline, tmp_path, usar_cache):
+    motor = MotorPontuacao(pipeline)
+    if usar_cache: _cache(motor, tmp_path, CANDIDATOS)
+    matriz = MatrizVagas(motor).construir(VAGAS, tmp_path / 'matriz_vagas.npz')
+    obtido = matriz.predict_proba(CANDIDATOS)
+    assert obtido.shape == (len(CANDIDATOS), len(VAGAS))
+    assert matriz.codigos_vagas.tolist() == VAGAS['codigo_vaga'].tolist()
+    for j, texto_vaga in enumerate(VAGAS['perfil_vaga_texto']):
+        np.testing.assert_allclose(obtido[:, j], _esperado(pipeline, texto_vaga, CANDIDATOS), rtol=0, atol=TOLERANCIA)
+
+
+def test_matriz_vagas_recarregada_do_disco(pipeline, tmp_path):
+    motor = MotorPontuacao(pipeline)
+    caminho = tmp_path / 'matriz_vagas.npz'
+    esperado = MatrizVagas(motor).construir(VAGAS, caminho).predict_proba(CANDIDATOS)
+    np.testing.assert_array_equal(MatrizVagas(motor).carregar(VAGAS, caminho).predict_proba(CANDIDATOS), esperado)
+    # Vagas alteradas invalidam a matriz gravada
+    alteradas = VAGAS.assign(perfil_vaga_texto=VAGAS['perfil_vaga_texto'].str.upper().str[::-1])
+    obtido = MatrizVagas(motor).carregar(alteradas, caminho).predict_proba(CANDIDATOS)
+    for j, texto_vaga in enumerate(alteradas['perfil_vaga_texto']):
+        np.testing.assert_allclose(obtido[:, j], _esperado(pipeline, texto_vaga, CANDIDATOS), rtol=0, atol=TOLERANCIA)
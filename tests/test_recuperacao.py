@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import armazenamento
+from motor_pontuacao import MotorPontuacao
+from recuperacao import FRACAO_MAXIMA_POSTINGS, IndiceInvertido
+from train import construir_pipeline
+
+TERMOS = ['java', 'spring', 'sql', 'django', 'flask', 'aws', 'docker', 'kubernetes', 'scrum', 'gestão', 'análise',
+          'dados', 'react', 'angular', 'node', 'linux', 'redes', 'suporte', 'vendas', 'financeiro', 'sap', 'excel']
+
+VAGAS = [
+    'desenvolvedor python com django e sql',          # 'python' está em mais de FRACAO_MAXIMA_POSTINGS da base
+    'analista de suporte linux e redes',
+    'gestão financeira com sap e excel python',
+    'xyzzy qwerty',                                    # sem termos do vocabulário: caminho `minima == 0`
+]
+
+
+def _pool(n=300, semente=7):
+    aleatorio = np.random.default_rng(semente)
+    textos = []
+    for i in range(n):
+        termos = list(aleatorio.choice(TERMOS, size=aleatorio.integers(2, 7), replace=False))
+        if aleatorio.random() < 0.6: termos.insert(aleatorio.integers(0, len(termos) + 1), 'python')
+        textos.append(' '.join(termos) + f' experiência {i % 13} anos')
+    textos[17] = 'zzz www'  # candidato sem nenhum termo do vocabulário
+    return pd.DataFrame({'codigo_candidato': [str(100_000 + i) for i in range(n)],
+                         'nome_candidato': [f'Pessoa {i}' for i in range(n)], 'candidato_texto_completo': textos})
+
+
+@pytest.fixture(scope='module', params=['l2', 'l1'])
+def pipeline(request):
+    candidatos = _pool()
+    aleatorio = np.random.default_rng(3)
+    textos = [vaga + ' ' + candidato for vaga in VAGAS[:3] for candidato in candidatos['candidato_texto_completo'].sample(60, random_state=1)]
+    pipeline = construir_pipeline().set_params(preprocessor__tfidf__norm=request.param)
+    return pipeline.fit(pd.DataFrame({'texto_completo': textos}), aleatorio.integers(0, 2, len(textos)))
+
+
+@pytest.fixture
+def indice(pipeline, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    armazenamento.DATA_DIR.mkdir()
+    pq.write_table(pa.Table.from_pandas(_pool(), preserve_index=False), armazenamento.BASE_TEXTOS_FILENAME)
+    motor = MotorPontuacao(pipeline)
+    motor.construir_cache(armazenamento.BASE_TEXTOS_FILENAME, tmp_path / 'contagens.npz')
+    indice = IndiceInvertido(motor)
+    indice.construir(tmp_path / 'indice.npz')
+    return indice
+
+
+def _forca_bruta(pipeline, texto_vaga, k):
+    candidatos = _pool()
+    probabilidades = pipeline.predict_proba(pd.DataFrame({'texto_completo': texto_vaga + ' ' + candidatos['candidato_texto_completo']}))[:, 1]
+    ordem = np.argsort(-probabilidades, kind='stable')[:k]
+    return candidatos['codigo_candidato'].to_numpy()[ordem], probabilidades[ordem]
+
+
+def test_postings_longas_e_candidato_sem_termos(indice):
+    coluna = indice.modelo.indice('python')
+    assert coluna >= 0 and indice.tamanho_postings[coluna] > FRACAO_MAXIMA_POSTINGS * len(indice.codigos)
+    if indice.modelo.meta['norm'] == 'l2':
+        assert indice.limites_superiores(VAGAS[0])[1] < indice.postings.nnz  # a lista longa não é lida
+    limites, _ = indice.limites_superiores(VAGAS[3])
+    assert np.isinf(limites[list(indice.codigos).index('100017')])
+
+
+@pytest.mark.parametrize('texto_vaga', VAGAS)
+@pytest.mark.parametrize('k', [1, 10, 400])
+@pytest.mark.parametrize('tamanho_bloco', [1, 128])
+def test_buscar_igual_a_forca_bruta(pipeline, indice, texto_vaga, k, tamanho_bloco):
+    # Com blocos de um candidato, a parada pelo limite é exercitada de fato (só parte da base é repontuada)
+    codigos, probabilidades = _forca_bruta(pipeline, texto_vaga, k)
+    df, estatisticas = indice.buscar(texto_vaga, k, tamanho_bloco=tamanho_bloco)
+    np.testing.assert_allclose(df['probabilidade'].to_numpy(), probabilidades, rtol=0, atol=1e-12)
+    if texto_vaga != VAGAS[3]:  # sem termos da vaga, vários candidatos empatam e a ordem entre eles é livre
+        assert df['codigo_candidato'].tolist() == codigos.tolist()
+    assert df['posicao'].tolist() == list(range(1, len(df) + 1))
+    if tamanho_bloco == 1 and k < len(indice.codigos): assert estatisticas['repontuados'] < len(indice.codigos)
+
+
+@pytest.mark.parametrize('texto_vaga', VAGAS[:3])
+def test_buscar_repontua_pelo_pipeline(pipeline, indice, texto_vaga):
+    codigos, probabilidades = _forca_bruta(pipeline, texto_vaga, 10)
+    df, estatisticas = indice.buscar(texto_vaga, 10, modelo=pipeline)
+    assert df['codigo_candidato'].tolist() == codigos.tolist()
+    np.testing.assert_array_equal(df['probabilidade'].to_numpy(), probabilidades)
+    assert estatisticas['diferenca_modelo'] < 1e-12
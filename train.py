@@ -1,21 +1,28 @@
+import argparse
+import time
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.utils.class_weight import compute_sample_weight
 import joblib
+from joblib import Memory, Parallel, delayed
 import json
 import os
 import requests
 from pathlib import Path
 import sklearn
-import utils
-import shap # <-- 1. Importação do SHAP
-
-print("Iniciando processo de treinamento do modelo e do explicador SHAP...")
-print(f"Versão do scikit-learn: {sklearn.__version__}")
-print(f"Versão do SHAP: {shap.__version__}")
+import armazenamento
+import dados_treino
+import downloader
+import avaliacao
+import shap # <-- 1. Importação do SHAP (usado apenas para validar o explicador linear)
+from atribuicao import ExplicadorLinear, verificar_paridade_shap
+from manifesto import MANIFESTO_FILENAME, Manifesto
+from modelo_compacto import MODELO_COMPACTO_DIR, ModeloCompacto
 
 
 # --- Constantes de Arquivos ---
@@ -28,114 +35,306 @@ NDJSON_FILENAME = DATA_DIR / "applicants.nd.json"
 VAGAS_FILENAME = DATA_DIR / "vagas.json"
 PROSPECTS_FILENAME = DATA_DIR / "prospects.json"
 MODELO_FILENAME = "modelo_recrutamento.joblib"
-EXPLAINER_FILENAME = "shap_explainer.joblib" # <-- 2. Novo arquivo para o explicador
+EXPLAINER_FILENAME = "explicador_linear.npz" # <-- 2. Coeficientes e médias de fundo para as atribuições
+RELATORIO_FILENAME = "relatorio_treino.json"
+MODELO_INCREMENTAL_FILENAME = armazenamento.MODELO_INCREMENTAL_FILENAME # Artefato próprio do modo --incremental (o modelo TF-IDF não é tocado)
+MARCA_INCREMENTAL_FILENAME = "modelo_recrutamento.marca.json" # <-- Prospects já consumidos (--incremental)
+CACHE_TRANSFORMACOES_DIR = DATA_DIR / "cache_transformacoes"
+MODELO_COMPACTO_META = Path(MODELO_COMPACTO_DIR) / "meta.json" # Registrado no manifesto como derivado do .joblib
+ENTRADAS_MODELO = list(armazenamento.ENTRADAS_MODELO) # Dados de origem registrados no manifesto junto com o modelo
+
+# Grade do modo de busca (--buscar). As combinações que mudam só o classificador reaproveitam
+# a transformação TF-IDF já ajustada, guardada no cache do Pipeline.
+GRADE_BUSCA = {
+    'preprocessor__tfidf__max_features': [2000, 5000],
+    'preprocessor__tfidf__ngram_range': [(1, 1), (1, 2)],
+    'clf__C': [0.3, 1.0, 3.0],
+}
 
 def baixar_arquivo(url, nome_arquivo, is_large=False):
-    if os.path.exists(nome_arquivo):
-        print(f"Arquivo '{nome_arquivo.name}' já existe.")
+    if armazenamento.arquivo_baixado_integro(nome_arquivo):
+        print(f"Arquivo '{nome_arquivo.name}' já existe e confere com o manifesto.")
         return True
     print(f"Baixando '{nome_arquivo.name}'...")
     try:
-        response = requests.get(url, stream=is_large)
-        response.raise_for_status()
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        with open(nome_arquivo, 'wb') as f:
-            if is_large:
-                for chunk in response.iter_content(chunk_size=8192): f.write(chunk)
-            else: f.write(response.content)
+        estatisticas = downloader.baixar(url, nome_arquivo, armazenamento.MANIFESTO_DOWNLOADS_FILENAME, workers=8 if is_large else 1)
+        if estatisticas['baixado']: print(f"'{nome_arquivo.name}': {estatisticas['bytes'] / 2**20:.1f} MB em {estatisticas['segundos']:.1f}s ({estatisticas['mb_por_s']:.1f} MB/s)")
         return True
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, downloader.ErroIntegridade) as e:
+        if not isinstance(e, downloader.ErroIntegridade) and armazenamento.arquivo_anterior_ao_manifesto(nome_arquivo):
+            # Sem acesso à origem e sem registro no manifesto: não há como conferir o arquivo local.
+            print(f"AVISO: não foi possível verificar '{nome_arquivo.name}' ({e}); usando o arquivo local existente.")
+            return True
         print(f"ERRO ao baixar '{nome_arquivo.name}': {e}")
         return False
 
-print("\n--- Etapa 0: Verificação e Download dos Dados ---")
-if not all([baixar_arquivo(VAGAS_JSON_URL, VAGAS_FILENAME),
-            baixar_arquivo(PROSPECTS_JSON_URL, PROSPECTS_FILENAME),
-            baixar_arquivo(APPLICANTS_JSON_URL, RAW_APPLICANTS_FILENAME, is_large=True)]):
-    exit("Falha no download dos arquivos. Abortando.")
-
-if not os.path.exists(NDJSON_FILENAME):
-    print(f"\nConvertendo '{RAW_APPLICANTS_FILENAME.name}' para NDJSON...")
-    with open(RAW_APPLICANTS_FILENAME, 'r', encoding='utf-8') as f_in: data = json.load(f_in)
-    with open(NDJSON_FILENAME, 'w', encoding='utf-8') as f_out:
-        for c, d in data.items(): d['codigo_candidato'] = c; json.dump(d, f_out); f_out.write('\n')
-
-print("\n--- Etapa 1: Preparando o DataFrame de Treinamento ---")
-# Carregando os dados
-with open(VAGAS_FILENAME, 'r', encoding='utf-8') as f: vagas_data = json.load(f)
-with open(PROSPECTS_FILENAME, 'r', encoding='utf-8') as f: prospects_data = json.load(f)
-
-# Lendo candidatos do arquivo NDJSON
-candidatos_lista = []
-with open(NDJSON_FILENAME, 'r', encoding='utf-8') as f:
-    for line in f:
-        candidatos_lista.append(json.loads(line))
-df_applicants = pd.json_normalize(candidatos_lista, sep='_')
-if 'informacoes_pessoais_dados_pessoais_nome_completo' in df_applicants.columns:
-    df_applicants.rename(columns={'informacoes_pessoais_dados_pessoais_nome_completo': 'nome_candidato'}, inplace=True)
-
-# Processando vagas e prospects
-lista_vagas = [{'codigo_vaga': k, **v} for k, v in vagas_data.items()]
-df_vagas = pd.json_normalize(lista_vagas, sep='_')
-lista_prospects = []
-for vaga_id, data in prospects_data.items():
-    for p in data.get('prospects', []): lista_prospects.append({'codigo_vaga': vaga_id, 'codigo_candidato': p.get('codigo'), 'status_final': p.get('situacao_candidado', 'N/A')})
-df_prospects = pd.DataFrame(lista_prospects)
-
-# Criando o DataFrame mestre
-df_prospects['codigo_candidato'] = df_prospects['codigo_candidato'].astype(str)
-df_applicants['codigo_candidato'] = df_applicants['codigo_candidato'].astype(str)
-df_mestre = pd.merge(df_prospects, df_vagas, on='codigo_vaga', how='left')
-df_mestre = pd.merge(df_mestre, df_applicants, on='codigo_candidato', how='left')
-
-# Engenharia de Features de Texto
-text_cols_vaga = [c for c in df_mestre.columns if c.startswith('perfil_vaga_')]
-for col in text_cols_vaga: df_mestre[col] = df_mestre[col].fillna('').astype(str)
-df_mestre['texto_vaga'] = df_mestre[text_cols_vaga].apply(lambda x: ' '.join(x), axis=1)
-
-text_cols_candidato = ['informacoes_profissionais_resumo_profissional', 'informacoes_profissionais_conhecimentos', 'cv_pt', 'cv_en']
-for col in text_cols_candidato:
-    if col not in df_mestre.columns: df_mestre[col] = ''
-df_mestre['candidato_texto_completo'] = df_mestre[text_cols_candidato].fillna('').astype(str).agg(' '.join, axis=1)
-
-df_mestre['texto_completo'] = df_mestre['texto_vaga'] + ' ' + df_mestre['candidato_texto_completo']
-
-# Criando a variável alvo (target)
-positivos_keywords = ['contratado', 'aprovado', 'documentação', 'encaminhado ao requisitante']
-df_mestre['status_final_lower'] = df_mestre['status_final'].astype(str).str.lower()
-df_mestre['target'] = df_mestre['status_final_lower'].apply(lambda x: 1 if any(k in x for k in positivos_keywords) else 0)
-df_treino = df_mestre[df_mestre['status_final'] != 'N/A'].dropna(subset=['texto_completo']).copy()
-print(f"Distribuição do Alvo: \n{df_treino['target'].value_counts(normalize=True)}")
-
-print("\n--- Etapa 2: Treinando o Modelo ---")
-X = df_treino[['texto_completo']]
-y = df_treino['target']
-X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-preprocessor = ColumnTransformer(transformers=[('tfidf', TfidfVectorizer(stop_words='english', max_features=2000, ngram_range=(1, 2)), 'texto_completo')], remainder='drop')
-pipeline = Pipeline([
-    ('preprocessor', preprocessor),
-    ('clf', LogisticRegression(random_state=42, class_weight='balanced', solver='liblinear'))
-])
-pipeline.fit(X_train, y_train)
-
-# --- ETAPA 3: CRIAÇÃO DO EXPLICADOR SHAP ---
-print("\n--- Etapa 3: Criando o Explicador SHAP ---")
-
-# 1. Transformar os dados de treino com o pré-processador do pipeline
-X_train_transformed = pipeline.named_steps['preprocessor'].transform(X_train)
-
-# 2. Criar o explicador SHAP usando o modelo treinado e os dados transformados
-explainer = shap.Explainer(pipeline.named_steps['clf'], X_train_transformed, feature_names=pipeline.named_steps['preprocessor'].get_feature_names_out())
-
-print("Explicador SHAP criado com sucesso.")
+def etapa_0_dados():
+    print("\n--- Etapa 0: Verificação e Download dos Dados ---")
+    if not all([baixar_arquivo(VAGAS_JSON_URL, VAGAS_FILENAME),
+                baixar_arquivo(PROSPECTS_JSON_URL, PROSPECTS_FILENAME),
+                baixar_arquivo(APPLICANTS_JSON_URL, RAW_APPLICANTS_FILENAME, is_large=True)]):
+        exit("Falha no download dos arquivos. Abortando.")
+
+    manifesto = Manifesto()
+    motivo = manifesto.motivo_reconstrucao(NDJSON_FILENAME, [RAW_APPLICANTS_FILENAME])
+    if motivo:
+        print(f"\nConvertendo '{RAW_APPLICANTS_FILENAME.name}' para NDJSON ({motivo})...")
+        armazenamento.converter_json_para_ndjson(RAW_APPLICANTS_FILENAME, NDJSON_FILENAME)
+        manifesto.registrar(NDJSON_FILENAME, [RAW_APPLICANTS_FILENAME])
+    manifesto.salvar()
+
+def etapa_1_preparar_df_treino():
+    print("\n--- Etapa 1: Preparando o DataFrame de Treinamento ---")
+    # Carregando os dados
+    with open(VAGAS_FILENAME, 'r', encoding='utf-8') as f: vagas_data = json.load(f)
+    with open(PROSPECTS_FILENAME, 'r', encoding='utf-8') as f: prospects_data = json.load(f)
+
+    # Apenas código e texto dos candidatos, extraídos em paralelo do NDJSON para a base colunar
+    df_applicants = dados_treino.carregar_candidatos(NDJSON_FILENAME, armazenamento.BASE_TEXTOS_FILENAME)
+
+    # Pares vaga x prospect com texto e alvo (target) montados de forma vetorizada
+    df_treino = dados_treino.montar_df_treino(vagas_data, prospects_data, df_applicants)
+    print(f"Distribuição do Alvo: \n{df_treino['target'].value_counts(normalize=True)}")
+    return df_treino
+
+def construir_pipeline(memoria=None):
+    preprocessor = ColumnTransformer(transformers=[('tfidf', TfidfVectorizer(stop_words='english', max_features=2000, ngram_range=(1, 2)), 'texto_completo')], remainder='drop')
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('clf', LogisticRegression(random_state=42, class_weight='balanced', solver='liblinear'))
+    ], memory=memoria)
+
+def dividir_treino_teste(df_treino):
+    X = df_treino[['texto_completo']]
+    y = df_treino['target']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    vagas_test = df_treino.loc[X_test.index, 'codigo_vaga']
+    return X_train, X_test, y_train, y_test, vagas_test
+
+def etapa_2_treinar(X_train, y_train):
+    print("\n--- Etapa 2: Treinando o Modelo ---")
+    pipeline = construir_pipeline()
+    inicio = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    return pipeline, time.perf_counter() - inicio
+
+def _avaliar_configuracao(pipeline_base, parametros, X_train, y_train, X_test, y_test, vagas_test):
+    pipeline = clone(pipeline_base).set_params(**parametros)
+    inicio = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    tempo_fit = time.perf_counter() - inicio
+    return {'parametros': parametros, 'tempo_fit_s': tempo_fit, **avaliacao.avaliar_holdout(pipeline, X_test, y_test, vagas_test)}
+
+def etapa_2_buscar(X_train, y_train, X_test, y_test, vagas_test, n_jobs=-1, folds=3):
+    print("\n--- Etapa 2: Busca de Hiperparâmetros com Validação Cruzada ---")
+    memoria = Memory(CACHE_TRANSFORMACOES_DIR, verbose=0)
+    busca = GridSearchCV(construir_pipeline(memoria), GRADE_BUSCA, scoring='roc_auc', n_jobs=n_jobs,
+                         cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42), refit=True)
+    try:
+        busca.fit(X_train, y_train)
+
+        # Avaliação de cada configuração no conjunto de teste, também em paralelo e com o mesmo cache
+        holdout = Parallel(n_jobs=n_jobs)(delayed(_avaliar_configuracao)(busca.estimator, p, X_train, y_train, X_test, y_test, vagas_test) for p in busca.cv_results_['params'])
+    finally:
+        # O cache só vale para esta busca; sem a limpeza, cada execução deixaria no disco as transformações de todas as combinações
+        memoria.clear(warn=False)
+    configuracoes = []
+    for i, resultado in enumerate(holdout):
+        configuracoes.append({
+            'parametros': {k: list(v) if isinstance(v, tuple) else v for k, v in resultado.pop('parametros').items()},
+            'cv_auc_media': float(busca.cv_results_['mean_test_score'][i]),
+            'cv_auc_desvio': float(busca.cv_results_['std_test_score'][i]),
+            'cv_tempo_fit_s': float(busca.cv_results_['mean_fit_time'][i]),
+            'cv_tempo_predicao_s': float(busca.cv_results_['mean_score_time'][i]),
+            'holdout': resultado,
+        })
+        print(f"{configuracoes[-1]['parametros']}: AUC CV={configuracoes[-1]['cv_auc_media']:.4f} | AUC teste={resultado['auc']:.4f} | P@20={resultado['precisao_em_20_por_vaga']:.4f} | fit={resultado['tempo_fit_s']:.1f}s")
+
+    melhor = busca.best_estimator_.set_params(memory=None)
+    print(f"Melhor configuração (AUC CV): {busca.best_params_}")
+    return melhor, configuracoes
+
+# --- MODO INCREMENTAL ---
+def construir_pipeline_incremental():
+    """Representação por hashing (sem vocabulário a ajustar) + classificador com `partial_fit`."""
+    preprocessor = ColumnTransformer(transformers=[('hash', HashingVectorizer(stop_words='english', ngram_range=(1, 2), n_features=2**18, alternate_sign=False), 'texto_completo')], remainder='drop')
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('clf', SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42))
+    ])
+
+def _carregar_modelo_incremental():
+    """
+    Retorna (pipeline, marca) para continuar o treino, ou (None, None) se o modelo incremental salvo não for o
+    da marca ou se a marca não registra os prospects consumidos (formato antigo, só com a data).
+    """
+    if not (os.path.exists(MARCA_INCREMENTAL_FILENAME) and os.path.exists(MODELO_INCREMENTAL_FILENAME)): return None, None
+    with open(MARCA_INCREMENTAL_FILENAME, 'r', encoding='utf-8') as f: marca = json.load(f)
+    if 'consumidos' not in marca or marca.get('versao_modelo') != armazenamento.versao_arquivo(MODELO_INCREMENTAL_FILENAME): return None, None
+    return joblib.load(MODELO_INCREMENTAL_FILENAME), marca
+
+def etapa_incremental(tamanho_lote=10000):
+    print("\n--- Treinamento Incremental ---")
+    pipeline, marca = _carregar_modelo_incremental()
+    continuar = pipeline is not None
+    if not continuar:
+        print("Nenhum modelo incremental compatível encontrado: iniciando um novo a partir de todos os prospects.")
+        pipeline = construir_pipeline_incremental()
+        pipeline.named_steps['preprocessor'].fit(pd.DataFrame({'texto_completo': ['']}))  # o hashing não aprende nada no fit
 
+    with open(VAGAS_FILENAME, 'r', encoding='utf-8') as f: vagas_data = json.load(f)
+    with open(PROSPECTS_FILENAME, 'r', encoding='utf-8') as f: prospects_data = json.load(f)
+    novos_prospects, nova_marca = dados_treino.filtrar_prospects_novos(prospects_data, marca)
+    ids = {str(p.get('codigo')) for dados in novos_prospects.values() for p in dados['prospects']}
+    if not ids:
+        print("Nenhum prospect novo desde a última execução. Modelo mantido.")
+        return
+
+    # Só os textos dos candidatos dos prospects novos são lidos da base colunar
+    if not armazenamento.base_textos_valida(NDJSON_FILENAME, armazenamento.BASE_TEXTOS_FILENAME):
+        armazenamento.construir_base_textos(NDJSON_FILENAME, armazenamento.BASE_TEXTOS_FILENAME, workers=None)
+    df_applicants = armazenamento.buscar_textos_candidatos(list(ids), colunas=('codigo_candidato', 'candidato_texto_completo'))
+    if df_applicants.empty: df_applicants = pd.DataFrame(columns=['codigo_candidato', 'candidato_texto_completo'])
+    df_novos = dados_treino.montar_df_treino(vagas_data, novos_prospects, df_applicants)
+    print(f"Prospects novos: {len(df_novos)} (marca anterior: {(marca or {}).get('data')}, nova marca: {nova_marca['data']})")
+
+    relatorio = {'modo': 'incremental', 'amostras_novas': int(len(df_novos)), 'marca': nova_marca['data']}
+    if continuar and df_novos['target'].nunique() > 1:
+        # Validação progressiva: o modelo anterior é avaliado nos dados novos antes de aprender com eles
+        relatorio['holdout'] = avaliacao.avaliar_holdout(pipeline, df_novos[['texto_completo']], df_novos['target'], df_novos['codigo_vaga'])
+        print(f"Avaliação progressiva (modelo anterior nos dados novos): {relatorio['holdout']}")
+
+    preprocessor, clf = pipeline.named_steps['preprocessor'], pipeline.named_steps['clf']
+    inicio = time.perf_counter()
+    for i in range(0, len(df_novos), tamanho_lote):
+        lote = df_novos.iloc[i:i + tamanho_lote]
+        pesos = compute_sample_weight('balanced', lote['target']) if lote['target'].nunique() > 1 else None
+        clf.partial_fit(preprocessor.transform(lote[['texto_completo']]), lote['target'], classes=[0, 1], sample_weight=pesos)
+    relatorio['tempo_fit_s'] = time.perf_counter() - inicio
+
+    # Atualiza o modelo incremental (escrita atômica) e registra os prospects consumidos; o modelo TF-IDF e seus derivados não mudam
+    caminho_tmp = f"{MODELO_INCREMENTAL_FILENAME}.tmp"
+    joblib.dump(pipeline, caminho_tmp)
+    os.replace(caminho_tmp, MODELO_INCREMENTAL_FILENAME)
+    nova_marca['versao_modelo'] = relatorio['versao_modelo'] = armazenamento.versao_arquivo(MODELO_INCREMENTAL_FILENAME)
+    with open(MARCA_INCREMENTAL_FILENAME, 'w', encoding='utf-8') as f: json.dump(nova_marca, f, indent=2)
+    manifesto = Manifesto()
+    manifesto.registrar(MODELO_INCREMENTAL_FILENAME, ENTRADAS_MODELO, {'modo': 'incremental', 'sklearn': sklearn.__version__, 'marca': nova_marca['data']})
+    manifesto.salvar()
+    with open(RELATORIO_FILENAME, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Modelo incremental atualizado em '{MODELO_INCREMENTAL_FILENAME}' ('{MODELO_FILENAME}' não foi alterado).")
+    print("Observação: o motor rápido, a busca em toda a base e a explicação por palavras-chave exigem o modelo TF-IDF; no app, o modelo incremental é opcional.")
+
+# --- ETAPA 3: CRIAÇÃO DO EXPLICADOR LINEAR ---
+def etapa_3_explicador(pipeline, X_train):
+    print("\n--- Etapa 3: Criando o Explicador Linear (equivalente ao SHAP) ---")
+
+    # 1. Transformar os dados de treino com o pré-processador do pipeline
+    X_train_transformed = pipeline.named_steps['preprocessor'].transform(X_train)
+
+    # 2. Guardar apenas coeficientes e médias do fundo: as contribuições têm forma fechada para o modelo linear
+    explicador = ExplicadorLinear.de_pipeline(pipeline, X_train_transformed)
+
+    # 3. Conferir contra o SHAP com o mesmo conjunto de fundo, em uma amostra do treino
+    amostra = X_train_transformed[:200]
+    diferenca = verificar_paridade_shap(explicador, pipeline.named_steps['clf'], X_train_transformed, amostra)
+    print(f"Maior diferença em relação ao SHAP: {diferenca:.2e}")
+    if diferenca > 1e-8:
+        exit("O explicador linear diverge do SHAP. Abortando.")
+
+    print("Explicador linear criado com sucesso.")
+    return explicador
 
 # --- ETAPA 4: SALVANDO O MODELO E O EXPLICADOR ---
-print("\n--- Etapa 4: Salvando os Artefatos ---")
-joblib.dump(pipeline, MODELO_FILENAME)
-joblib.dump(explainer, EXPLAINER_FILENAME) # <-- Salvando o explicador
-print(f"\nTreinamento concluído!")
-print(f"Modelo salvo como: '{MODELO_FILENAME}'")
-print(f"Explicador SHAP salvo como: '{EXPLAINER_FILENAME}'")
-print("\nIMPORTANTE: Faça o upload de AMBOS os arquivos para o seu repositório no GitHub.")
+def etapa_4_salvar(pipeline, explicador, relatorio, parametros):
+    print("\n--- Etapa 4: Salvando os Artefatos ---")
+    # Gravação atômica: uma interrupção não deixa um .joblib truncado no lugar do modelo anterior
+    caminho_tmp = f"{MODELO_FILENAME}.tmp"
+    joblib.dump(pipeline, caminho_tmp)
+    os.replace(caminho_tmp, MODELO_FILENAME)
+    explicador.versao_modelo = armazenamento.versao_arquivo(MODELO_FILENAME)
+    explicador.salvar(EXPLAINER_FILENAME)
+    relatorio['versao_modelo'] = explicador.versao_modelo
+    with open(RELATORIO_FILENAME, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    # Hashes dos dados e parâmetros usados, para detectar modelo desatualizado (no treino e no app)
+    manifesto = Manifesto()
+    manifesto.registrar(MODELO_FILENAME, ENTRADAS_MODELO, parametros)
+    manifesto.registrar(EXPLAINER_FILENAME, [MODELO_FILENAME])
+    manifesto.salvar()
+    print(f"\nTreinamento concluído!")
+    print(f"Modelo salvo como: '{MODELO_FILENAME}'")
+    print(f"Explicador salvo como: '{EXPLAINER_FILENAME}'")
+    print(f"Relatório de avaliação salvo como: '{RELATORIO_FILENAME}'")
+    print(f"Manifesto dos artefatos atualizado em: '{MANIFESTO_FILENAME}'")
+    print("\nIMPORTANTE: Faça o upload do modelo, do modelo compacto, do explicador e do manifesto para o seu repositório no GitHub.")
+
+# --- ETAPA 5: EXPORTANDO O MODELO COMPACTO ---
+def etapa_5_exportar_compacto(pipeline, X_amostra=None):
+    print("\n--- Etapa 5: Exportando o Modelo Compacto (inferência sem scikit-learn) ---")
+    try:
+        compacto = ModeloCompacto.de_pipeline(pipeline, armazenamento.versao_arquivo(MODELO_FILENAME))
+    except ValueError as e:
+        print(f"Modelo compacto não gerado: {e}")
+        return
+    if X_amostra is not None:
+        diferenca = float(abs(pipeline.predict_proba(X_amostra) - compacto.predict_proba(X_amostra)).max())
+        print(f"Maior diferença em relação ao predict_proba do pipeline: {diferenca:.2e}")
+        if diferenca > 1e-12:
+            exit("O modelo compacto diverge do pipeline. Abortando.")
+    compacto.salvar(MODELO_COMPACTO_DIR)
+    manifesto = Manifesto()
+    manifesto.registrar(MODELO_COMPACTO_META, [MODELO_FILENAME])
+    manifesto.salvar()
+    print(f"Modelo compacto salvo em: '{MODELO_COMPACTO_DIR}' (publique-o junto com o modelo)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o modelo de matching e o explicador linear.")
+    parser.add_argument('--buscar', action='store_true', help="Busca hiperparâmetros com validação cruzada em paralelo antes de salvar o melhor modelo.")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Processos usados na busca (padrão: todos os núcleos).")
+    parser.add_argument('--folds', type=int, default=3, help="Número de folds da validação cruzada na busca.")
+    parser.add_argument('--incremental', action='store_true', help=f"Atualiza o modelo incremental ('{MODELO_INCREMENTAL_FILENAME}') apenas com os prospects novos desde a última execução.")
+    parser.add_argument('--forcar', action='store_true', help="Treina mesmo que o manifesto indique que o modelo e o explicador estão atualizados.")
+    args = parser.parse_args()
+
+    print("Iniciando processo de treinamento do modelo e do explicador SHAP...")
+    print(f"Versão do scikit-learn: {sklearn.__version__}")
+    print(f"Versão do SHAP: {shap.__version__}")
+
+    etapa_0_dados()
+    if args.incremental:
+        etapa_incremental()
+        return
+
+    parametros = {'modo': 'busca' if args.buscar else 'padrao', 'sklearn': sklearn.__version__}
+    if args.buscar: parametros.update(folds=args.folds, grade={k: [list(v) if isinstance(v, tuple) else v for v in valores] for k, valores in GRADE_BUSCA.items()})
+    manifesto = Manifesto()
+    motivos = {arquivo: manifesto.motivo_reconstrucao(arquivo, entradas, params) for arquivo, entradas, params in [(MODELO_FILENAME, ENTRADAS_MODELO, parametros), (EXPLAINER_FILENAME, [MODELO_FILENAME], None)]}
+    manifesto.salvar()
+    if not args.forcar and not any(motivos.values()):
+        print("\nModelo e explicador estão atualizados em relação aos dados e parâmetros (use --forcar para treinar mesmo assim).")
+        motivo_compacto = manifesto.motivo_reconstrucao(MODELO_COMPACTO_META, [MODELO_FILENAME])
+        if motivo_compacto:
+            print(f"'{MODELO_COMPACTO_DIR}' será exportado novamente: {motivo_compacto}.")
+            etapa_5_exportar_compacto(joblib.load(MODELO_FILENAME))
+        return
+    for arquivo, motivo in motivos.items():
+        if motivo: print(f"'{arquivo}' será reconstruído: {motivo}.")
+
+    df_treino = etapa_1_preparar_df_treino()
+    X_train, X_test, y_train, y_test, vagas_test = dividir_treino_teste(df_treino)
+    if args.buscar:
+        pipeline, configuracoes = etapa_2_buscar(X_train, y_train, X_test, y_test, vagas_test, args.n_jobs, args.folds)
+        relatorio = {'modo': 'busca', 'configuracoes': configuracoes}
+    else:
+        pipeline, tempo_fit = etapa_2_treinar(X_train, y_train)
+        relatorio = {'modo': 'padrao', 'tempo_fit_s': tempo_fit}
+    relatorio['holdout'] = avaliacao.avaliar_holdout(pipeline, X_test, y_test, vagas_test)
+    print(f"Avaliação no conjunto de teste: {relatorio['holdout']}")
+
+    explicador = etapa_3_explicador(pipeline, X_train)
+    etapa_4_salvar(pipeline, explicador, relatorio, parametros)
+    etapa_5_exportar_compacto(pipeline, X_test)
 
+# O guarda é necessário: os workers que leem o NDJSON em paralelo não podem reexecutar o treino.
+if __name__ == "__main__":
+    main()
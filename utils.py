@@ -1,22 +1,30 @@
 import streamlit as st
-import pandas as pd
-import json
 import os
 import requests
-from pathlib import Path
+import armazenamento
+import downloader
+from armazenamento import *  # Constantes e funções de dados (sem Streamlit), reexportadas para o app
+from manifesto import MANIFESTO_FILENAME, Manifesto
 
-# --- Constantes de Arquivos e URLs ---
-DATA_DIR = Path("./data")
-APPLICANTS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/applicants.json"
-VAGAS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/vagas.json"
-PROSPECTS_JSON_URL = "https://huggingface.co/datasets/Postech7/datathon-fiap/resolve/main/prospects.json"
-RAW_APPLICANTS_FILENAME = DATA_DIR / "applicants.raw.json"
-NDJSON_FILENAME = DATA_DIR / "applicants.nd.json"
-VAGAS_FILENAME = DATA_DIR / "vagas.json"
-PROSPECTS_FILENAME = DATA_DIR / "prospects.json"
+# --- PREPARAÇÃO DOS DADOS NO APP ---
+# Arquivos lidos pelas verificações de `preparar_dados_candidatos`: enquanto a assinatura (tamanho, mtime)
+# deles não muda, o resultado anterior do processo é reaproveitado e os reruns do Streamlit não relêem
+# manifestos, esquemas Parquet nem recalculam hashes.
+ARQUIVOS_PREPARACAO = (VAGAS_FILENAME, PROSPECTS_FILENAME, RAW_APPLICANTS_FILENAME, NDJSON_FILENAME, INDICE_NDJSON_FILENAME,
+                       BASE_TEXTOS_FILENAME, MANIFESTO_DOWNLOADS_FILENAME, MANIFESTO_FILENAME)
+_verificacoes = {}
 
 def preparar_dados_candidatos():
-    """Garante que todos os arquivos de dados necessários estejam disponíveis."""
+    """Garante que todos os arquivos de dados necessários estejam disponíveis (verificação refeita só quando algum deles muda)."""
+    chave = ('preparar_dados_candidatos', os.getcwd())
+    assinatura = assinatura_arquivos(ARQUIVOS_PREPARACAO)
+    if _verificacoes.get(chave) == assinatura: return True
+    if not _preparar_dados_candidatos(): return False
+    # A assinatura é tirada depois da verificação, que pode ter baixado arquivos ou gravado os manifestos
+    _verificacoes[chave] = assinatura_arquivos(ARQUIVOS_PREPARACAO)
+    return True
+
+def _preparar_dados_candidatos():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     baixar_arquivo_se_nao_existir(VAGAS_JSON_URL, VAGAS_FILENAME)
     baixar_arquivo_se_nao_existir(PROSPECTS_JSON_URL, PROSPECTS_FILENAME)
@@ -24,88 +32,70 @@ def preparar_dados_candidatos():
         st.error("Não foi possível baixar o arquivo principal de candidatos.")
         return False
 
-    if not os.path.exists(NDJSON_FILENAME):
-        st.info(f"Primeiro uso: Convertendo '{RAW_APPLICANTS_FILENAME.name}' para um formato otimizado...")
+    manifesto = Manifesto()
+    motivo = manifesto.motivo_reconstrucao(NDJSON_FILENAME, [RAW_APPLICANTS_FILENAME])
+    if motivo:
+        st.info(f"Convertendo '{RAW_APPLICANTS_FILENAME.name}' para um formato otimizado ({NDJSON_FILENAME.name}: {motivo})...")
         with st.spinner("Isso pode levar um momento..."):
             try:
-                with open(RAW_APPLICANTS_FILENAME, 'r', encoding='utf-8') as f_in: data = json.load(f_in)
-                with open(NDJSON_FILENAME, 'w', encoding='utf-8') as f_out:
-                    for codigo, candidato_data in data.items():
-                        candidato_data['codigo_candidato'] = codigo
-                        json.dump(candidato_data, f_out)
-                        f_out.write('\n')
+                converter_json_para_ndjson(RAW_APPLICANTS_FILENAME, NDJSON_FILENAME)
+                manifesto.registrar(NDJSON_FILENAME, [RAW_APPLICANTS_FILENAME])
                 st.success("Arquivo de dados otimizado!")
             except Exception as e:
                 st.error(f"Falha ao converter o arquivo JSON: {e}")
                 return False
+    manifesto.salvar()
+
+    if not indice_ndjson_valido():
+        with st.spinner("Indexando o arquivo de candidatos..."):
+            try:
+                construir_indice_ndjson()
+            except Exception as e:
+                st.error(f"Falha ao indexar o arquivo de candidatos: {e}")
+                return False
+
+    if not base_textos_valida():
+        with st.spinner("Gerando a base colunar de textos dos candidatos..."):
+            try:
+                construir_base_textos()
+            except Exception as e:
+                st.error(f"Falha ao gerar a base de textos dos candidatos: {e}")
+                return False
     return True
 
 def baixar_arquivo_se_nao_existir(url, nome_arquivo, is_large=False):
-    """Baixa um arquivo da URL se ele não existir."""
-    if os.path.exists(nome_arquivo): return True
-    st.info(f"Arquivo '{nome_arquivo.name}' não encontrado. Baixando...")
+    """Baixa o arquivo se ele não existir ou não conferir com o manifesto (downloads paralelos e retomáveis)."""
+    if arquivo_baixado_integro(nome_arquivo): return True
+    st.info(f"Arquivo '{nome_arquivo.name}' ausente ou incompleto. Baixando...")
     try:
         with st.spinner(f"Baixando {nome_arquivo.name}..."):
-            response = requests.get(url, stream=is_large)
-            response.raise_for_status()
-            with open(nome_arquivo, 'wb') as f:
-                if is_large:
-                    for chunk in response.iter_content(chunk_size=8192): f.write(chunk)
-                else: f.write(response.content)
-            st.success(f"Arquivo '{nome_arquivo.name}' baixado!")
+            estatisticas = downloader.baixar(url, nome_arquivo, MANIFESTO_DOWNLOADS_FILENAME, workers=8 if is_large else 1)
+        if estatisticas['baixado']: st.success(f"Arquivo '{nome_arquivo.name}' baixado! ({estatisticas['bytes'] / 2**20:.1f} MB a {estatisticas['mb_por_s']:.1f} MB/s)")
+        return True
+    except (requests.exceptions.RequestException, downloader.ErroIntegridade) as e:
+        if not isinstance(e, downloader.ErroIntegridade) and arquivo_anterior_ao_manifesto(nome_arquivo):
+            # Sem acesso à origem e sem registro no manifesto: não há como conferir o arquivo local.
+            st.warning(f"Não foi possível verificar '{nome_arquivo.name}' ({e}); usando o arquivo local existente.")
             return True
-    except requests.exceptions.RequestException as e:
         st.error(f"Erro ao baixar o arquivo '{nome_arquivo.name}': {e}.")
         return False
 
-@st.cache_data
 def carregar_json(caminho_arquivo):
-    """Carrega um arquivo JSON de forma segura."""
-    try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as f: return json.load(f)
-    except: return None
+    """Carrega um arquivo JSON de forma segura (em cache até o arquivo mudar)."""
+    return _carregar_json(caminho_arquivo, assinatura_arquivos([caminho_arquivo]))
 
-@st.cache_data
-def carregar_vagas():
-    """Carrega e padroniza os dados das vagas."""
-    vagas_data = carregar_json(VAGAS_FILENAME)
-    if vagas_data is None: return pd.DataFrame()
-    vagas_lista = []
-    for codigo, dados in vagas_data.items():
-        info_basicas = dados.get('informacoes_basicas', {})
-        vaga_info = {'codigo_vaga': codigo, 'titulo_vaga': info_basicas.get('titulo_vaga', 'N/A'), 'cliente': info_basicas.get('cliente', 'N/A'), 'perfil_vaga_texto': json.dumps(dados.get('perfil_vaga', {}))}
-        vagas_lista.append(vaga_info)
-    return pd.DataFrame(vagas_lista)
+@st.cache_data(max_entries=8)
+def _carregar_json(caminho_arquivo, assinatura):
+    return armazenamento.carregar_json(caminho_arquivo)
 
-# --- NOVA FUNÇÃO OTIMIZADA ---
-def buscar_detalhes_candidatos_por_id(ids_necessarios: list):
-    """
-    Busca detalhes de candidatos específicos no arquivo NDJSON,
-    carregando apenas os registros necessários para economizar memória.
-    """
-    if not os.path.exists(NDJSON_FILENAME):
-        return pd.DataFrame()
+def carregar_vagas():
+    """Carrega e padroniza os dados das vagas (em cache até o arquivo mudar)."""
+    return _carregar_vagas(versao_vagas())
 
-    ids_necessarios_set = set(ids_necessarios)
-    candidatos_encontrados = []
-    
-    with open(NDJSON_FILENAME, 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                candidato = json.loads(line)
-                if candidato.get('codigo_candidato') in ids_necessarios_set:
-                    candidatos_encontrados.append(candidato)
-            except json.JSONDecodeError:
-                continue
-    
-    if not candidatos_encontrados:
-        return pd.DataFrame()
+@st.cache_data(max_entries=2)
+def _carregar_vagas(versao):
+    return armazenamento.carregar_vagas()
 
-    df = pd.json_normalize(candidatos_encontrados, sep='_')
-    coluna_nome = 'informacoes_pessoais_dados_pessoais_nome_completo'
-    if coluna_nome in df.columns:
-        df.rename(columns={coluna_nome: 'nome_candidato'}, inplace=True)
-    else:
-        df['nome_candidato'] = 'Nome não encontrado'
-    df['codigo_candidato'] = df['codigo_candidato'].astype(str)
-    return df
+def versao_vagas():
+    """Assinatura (tamanho, mtime) do arquivo de vagas: chave dos caches derivados das vagas."""
+    return assinatura_arquivos([VAGAS_FILENAME])